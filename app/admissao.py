@@ -0,0 +1,407 @@
+# app/admissao.py
+#
+# Controle de admissão: limita quantas requisições de cada classe (upload,
+# lote, download, busca, autenticação) rodam ao mesmo tempo, antes que elas
+# peguem uma sessão do banco ou comecem a transferir o PDF. Cada classe tem uma fila
+# de espera limitada; com a fila cheia, ou se a vaga não abrir em
+# ADMISSAO_ESPERA segundos, a requisição recebe 503 com Retry-After na hora,
+# em vez de ficar presa no pool até estourar o timeout.
+#
+# Além disso:
+#   - um orçamento global de bytes em trânsito, reservado por bloco: cada
+#     bloco do corpo de um upload até a aplicação consumi-lo e cada bloco de
+#     um download enquanto é enviado (importações em lote ficam de fora);
+#   - um balde de tokens por cliente (IP), em memória, que responde 429.
+
+import asyncio
+import math
+import re
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict, deque
+
+from . import config, monitoramento
+
+UPLOAD = "upload"
+LOTE = "lote"
+DOWNLOAD = "download"
+BUSCA = "busca"
+AUTH = "auth"
+
+# (classe, método, caminho); a primeira regra que casa vale
+REGRAS = [
+    (UPLOAD, "POST", re.compile(r"^/documentos/upload$")),
+    (LOTE, "POST", re.compile(r"^/documentos/lote$")),
+    (DOWNLOAD, "GET", re.compile(r"^/documentos/\d+/download$")),
+    (DOWNLOAD, "GET", re.compile(r"^/documentos/export$")),
+    (BUSCA, "GET", re.compile(r"^/documentos/(buscar|facetas)$")),
+    (AUTH, "POST", re.compile(r"^/usuarios/(login)?$")),
+]
+
+# monitoramento autorizado (app.monitoramento) não passa pelo limite de taxa
+ISENTOS = monitoramento.ROTAS
+
+
+class Sobrecarga(Exception):
+    def __init__(self, motivo: str, retry_after: float = 1):
+        super().__init__(motivo)
+        self.motivo = motivo
+        self.retry_after = retry_after
+
+
+def classificar(metodo: str, caminho: str) -> str | None:
+    for classe, metodo_regra, padrao in REGRAS:
+        if metodo == metodo_regra and padrao.match(caminho):
+            return classe
+    return None
+
+
+async def _aguardar(futuro: asyncio.Future, espera: float) -> bool:
+    # True se o futuro foi resolvido (a vaga/reserva agora é de quem esperava)
+    try:
+        await asyncio.wait_for(futuro, espera)
+        return True
+    except asyncio.TimeoutError:
+        return futuro.done() and not futuro.cancelled()
+    except asyncio.CancelledError:
+        if futuro.done() and not futuro.cancelled():
+            # recebeu a vaga no mesmo instante em que foi cancelado
+            raise _CanceladoComVaga()
+        raise
+
+
+class _CanceladoComVaga(asyncio.CancelledError):
+    pass
+
+
+class Limitador:
+    # Semáforo com fila FIFO limitada. Ao sair, a vaga passa direto para o
+    # primeiro da fila, então quem chega depois não fura a fila.
+
+    def __init__(self, nome: str, limite: int, fila: int):
+        self.nome = nome
+        self.limite = limite
+        self.fila_maxima = fila
+        self.em_uso = 0
+        self.admitidos = 0
+        self.recusados = 0
+        self.espera_total = 0.0
+        self._fila: deque[asyncio.Future] = deque()
+
+    @property
+    def na_fila(self) -> int:
+        return sum(not f.done() for f in self._fila)
+
+    async def entrar(self, espera: float) -> None:
+        # quem desistiu por tempo continua na fila até ser descartado aqui ou em sair()
+        while self._fila and self._fila[0].done():
+            self._fila.popleft()
+        if self.em_uso < self.limite and not self.na_fila:
+            self.em_uso += 1
+            self.admitidos += 1
+            return
+        if self.na_fila >= self.fila_maxima:
+            self.recusados += 1
+            raise Sobrecarga(f"{self.nome}: fila cheia")
+        futuro = asyncio.get_running_loop().create_future()
+        self._fila.append(futuro)
+        inicio = time.perf_counter()
+        try:
+            conseguiu = await _aguardar(futuro, espera)
+        except _CanceladoComVaga:
+            self.sair()
+            raise
+        finally:
+            self.espera_total += time.perf_counter() - inicio
+        if not conseguiu:
+            self.recusados += 1
+            raise Sobrecarga(f"{self.nome}: tempo de espera esgotado")
+        self.admitidos += 1
+
+    def sair(self) -> None:
+        while self._fila:
+            futuro = self._fila.popleft()
+            if not futuro.done():
+                futuro.set_result(None)
+                return
+        self.em_uso -= 1
+
+    def resumo(self) -> dict:
+        return {
+            "limite": self.limite,
+            "fila_maxima": self.fila_maxima,
+            "em_uso": self.em_uso,
+            "na_fila": self.na_fila,
+            "admitidos": self.admitidos,
+            "recusados": self.recusados,
+            "espera_total_s": round(self.espera_total, 6),
+        }
+
+
+class OrcamentoBytes:
+    # Bytes em trânsito (uploads sendo recebidos, downloads sendo enviados)
+    # somados entre todas as requisições. Uma reserva maior que o orçamento
+    # inteiro é reduzida a ele: passa sozinha, em vez de nunca passar.
+
+    def __init__(self, maximo: int):
+        self.maximo = maximo
+        self.em_uso = 0
+        self.recusados = 0
+        self._fila: deque[tuple[int, asyncio.Future]] = deque()
+
+    def _cabe(self, quantidade: int) -> bool:
+        return self.em_uso + quantidade <= self.maximo
+
+    async def reservar(self, quantidade: int, espera: float | None) -> int:
+        quantidade = min(quantidade, self.maximo)
+        if not self._fila and self._cabe(quantidade):
+            self.em_uso += quantidade
+            return quantidade
+        futuro = asyncio.get_running_loop().create_future()
+        self._fila.append((quantidade, futuro))
+        try:
+            conseguiu = await _aguardar(futuro, espera)
+        except _CanceladoComVaga:
+            self.liberar(quantidade)
+            raise
+        finally:
+            self._acordar()
+        if not conseguiu:
+            self.recusados += 1
+            raise Sobrecarga("bytes em trânsito acima do orçamento")
+        return quantidade
+
+    def liberar(self, quantidade: int) -> None:
+        self.em_uso -= quantidade
+        self._acordar()
+
+    def _acordar(self) -> None:
+        # atende em ordem de chegada enquanto couber; quem desistiu sai da fila
+        while self._fila:
+            quantidade, futuro = self._fila[0]
+            if futuro.done():
+                self._fila.popleft()
+            elif self._cabe(quantidade):
+                self._fila.popleft()
+                self.em_uso += quantidade
+                futuro.set_result(None)
+            else:
+                return
+
+    def resumo(self) -> dict:
+        return {
+            "maximo": self.maximo,
+            "em_uso": self.em_uso,
+            "na_fila": sum(not f.done() for _, f in self._fila),
+            "recusados": self.recusados,
+        }
+
+
+# ------------------------
+# Limite de taxa por cliente
+# ------------------------
+
+class BackendTaxa(ABC):
+    @abstractmethod
+    def consumir(self, cliente: str) -> float:
+        # 0 se o pedido pode seguir; senão, segundos até haver um token
+        ...
+
+
+class BaldesMemoria(BackendTaxa):
+    # Um balde de tokens por cliente: `taxa` tokens por segundo até `rajada`.
+    # Só os `maximo` clientes mais recentes são lembrados (LRU); um cliente
+    # esquecido volta com o balde cheio.
+
+    def __init__(self, taxa: float, rajada: float, maximo: int):
+        self.taxa = taxa
+        self.rajada = rajada
+        self.maximo = maximo
+        self._baldes: OrderedDict[str, tuple[float, float]] = OrderedDict()
+
+    def consumir(self, cliente: str) -> float:
+        agora = time.monotonic()
+        tokens, atualizado_em = self._baldes.get(cliente, (self.rajada, agora))
+        tokens = min(self.rajada, tokens + (agora - atualizado_em) * self.taxa)
+        if tokens >= 1:
+            tokens -= 1
+            espera = 0.0
+        else:
+            espera = (1 - tokens) / self.taxa
+        self._baldes[cliente] = (tokens, agora)
+        self._baldes.move_to_end(cliente)
+        while len(self._baldes) > self.maximo:
+            self._baldes.popitem(last=False)
+        return espera
+
+    def __len__(self) -> int:
+        return len(self._baldes)
+
+
+# ------------------------
+# Governador
+# ------------------------
+
+class Governador:
+    def __init__(self, limites: dict[str, tuple[int, int]], espera: float, bytes_maximo: int,
+                 taxa: BackendTaxa | None):
+        self.limitadores = {nome: Limitador(nome, limite, fila) for nome, (limite, fila) in limites.items()}
+        self.espera = espera
+        self.bytes = OrcamentoBytes(bytes_maximo)
+        self.taxa = taxa
+        self.limitados = 0
+
+    def verificar_taxa(self, cliente: str) -> None:
+        if self.taxa is None:
+            return
+        espera = self.taxa.consumir(cliente)
+        if espera > 0:
+            self.limitados += 1
+            raise Sobrecarga("limite de requisições do cliente", retry_after=espera)
+
+    def resumo(self) -> dict:
+        return {
+            "classes": {nome: limitador.resumo() for nome, limitador in self.limitadores.items()},
+            "bytes": self.bytes.resumo(),
+            "limitados_por_taxa": self.limitados,
+            "clientes_lembrados": len(self.taxa) if isinstance(self.taxa, BaldesMemoria) else None,
+        }
+
+
+governador = Governador(
+    {
+        UPLOAD: (config.ADMISSAO_UPLOAD_LIMITE, config.ADMISSAO_UPLOAD_FILA),
+        LOTE: (config.ADMISSAO_LOTE_LIMITE, config.ADMISSAO_LOTE_FILA),
+        DOWNLOAD: (config.ADMISSAO_DOWNLOAD_LIMITE, config.ADMISSAO_DOWNLOAD_FILA),
+        BUSCA: (config.ADMISSAO_BUSCA_LIMITE, config.ADMISSAO_BUSCA_FILA),
+        AUTH: (config.ADMISSAO_AUTH_LIMITE, config.ADMISSAO_AUTH_FILA),
+    },
+    espera=config.ADMISSAO_ESPERA,
+    bytes_maximo=config.ADMISSAO_BYTES_MAXIMO,
+    taxa=BaldesMemoria(config.ADMISSAO_TAXA, config.ADMISSAO_RAJADA, config.ADMISSAO_CLIENTES_MAXIMO)
+    if config.ADMISSAO_TAXA > 0 else None,
+)
+
+
+def _cabecalho(scope, nome: bytes) -> bytes | None:
+    for chave, valor in scope["headers"]:
+        if chave == nome:
+            return valor
+    return None
+
+
+def _cliente(scope) -> str:
+    if config.ADMISSAO_CONFIAR_PROXY:
+        encaminhado = _cabecalho(scope, b"x-forwarded-for")
+        if encaminhado:
+            return encaminhado.split(b",")[0].strip().decode("latin-1")
+    cliente = scope.get("client")
+    return cliente[0] if cliente else "?"
+
+
+class AdmissaoMiddleware:
+    # ASGI puro, depois das métricas (as recusas aparecem nelas) e antes de
+    # qualquer leitura do corpo ou sessão do banco.
+
+    def __init__(self, app, governador: Governador = governador):
+        self.app = app
+        self.governador = governador
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        if scope["path"] in ISENTOS:
+            cabecalho = _cabecalho(scope, b"authorization")
+            if monitoramento.autorizado(cabecalho.decode("latin-1") if cabecalho else None):
+                return await self.app(scope, receive, send)
+
+        gov = self.governador
+        try:
+            gov.verificar_taxa(_cliente(scope))
+        except Sobrecarga as exc:
+            return await self._recusar(send, 429, exc)
+
+        classe = classificar(scope["method"], scope["path"])
+        if classe is None:
+            return await self.app(scope, receive, send)
+
+        limitador = gov.limitadores[classe]
+        try:
+            await limitador.entrar(gov.espera)
+        except Sobrecarga as exc:
+            return await self._recusar(send, 503, exc)
+
+        reservado = 0
+        iniciada = False
+        inicio_retido = None
+
+        async def receber():
+            # uploads: reserva cada bloco do corpo recebido até a aplicação
+            # pedir o próximo (ela já consumiu este). Enquanto a reserva
+            # espera, o servidor para de ler o socket: o cliente sente a
+            # contrapressão; esgotado ADMISSAO_ESPERA, a resposta é 503.
+            nonlocal reservado
+            if reservado:
+                gov.bytes.liberar(reservado)
+                reservado = 0
+            mensagem = await receive()
+            corpo = mensagem.get("body", b"") if mensagem["type"] == "http.request" else b""
+            if corpo:
+                reservado = await gov.bytes.reservar(len(corpo), gov.espera)
+            return mensagem
+
+        async def enviar(mensagem):
+            # downloads: reserva cada bloco enquanto ele é entregue ao servidor.
+            # O início da resposta fica retido até o primeiro bloco ter espaço,
+            # para que um orçamento esgotado ainda vire 503; depois dele, a
+            # espera não tem prazo (a resposta já começou). O envio zerocopy
+            # não passa pela memória do processo e não reserva nada.
+            nonlocal iniciada, inicio_retido
+            tipo = mensagem["type"]
+            if classe == DOWNLOAD and tipo == "http.response.start":
+                inicio_retido = mensagem
+                return
+            bloco = 0
+            if classe == DOWNLOAD and tipo == "http.response.body":
+                bloco = await gov.bytes.reservar(
+                    len(mensagem.get("body", b"")), None if iniciada else gov.espera
+                )
+            try:
+                if inicio_retido is not None:
+                    iniciada = True
+                    await send(inicio_retido)
+                    inicio_retido = None
+                if tipo == "http.response.start":
+                    iniciada = True
+                await send(mensagem)
+            finally:
+                if bloco:
+                    gov.bytes.liberar(bloco)
+
+        try:
+            # lotes (pacotes de até TAMANHO_MAXIMO_LOTE, gravados em disco
+            # antes da importação) ficam fora do orçamento de bytes
+            await self.app(scope, receber if classe == UPLOAD else receive, enviar)
+        except Sobrecarga as exc:
+            if iniciada:
+                raise
+            await self._recusar(send, 503, exc)
+        finally:
+            if reservado:
+                gov.bytes.liberar(reservado)
+            limitador.sair()
+
+    @staticmethod
+    async def _recusar(send, status: int, exc: Sobrecarga) -> None:
+        corpo = ('{"detail":"Servidor ocupado, tente novamente em instantes"}' if status == 503
+                 else '{"detail":"Muitas requisições, tente novamente em instantes"}').encode()
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(corpo)).encode()),
+                (b"retry-after", str(max(1, math.ceil(exc.retry_after))).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": corpo})
@@ -0,0 +1,159 @@
+# app/auth.py
+#
+# Tokens de acesso assinados com HMAC-SHA256, sem estado no servidor: a
+# senha (bcrypt) é verificada uma única vez no login e as rotas protegidas só
+# conferem a assinatura e a validade do token, sem banco e sem bcrypt.
+# Alterar ou excluir um usuário invalida os tokens emitidos antes disso por
+# meio de um registro de revogações com TTL em memória e no backend
+# compartilhado (app.cache), para valer em todos os workers. Como os instantes
+# vêm de relógios de workers diferentes, a comparação tem uma folga
+# (REVOGACAO_FOLGA).
+#
+# Vários workers só aceitam os tokens uns dos outros com o mesmo AUTH_SECRET
+# e só veem as revogações uns dos outros com CACHE_BACKEND=redis, por isso
+# os dois são obrigatórios fora de AMBIENTE=dev (app.config); em dev, sem
+# eles, a chave é aleatória e as revogações valem só no próprio processo.
+
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import secrets
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from fastapi import Depends, HTTPException
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+
+from . import cache, config
+
+logger = logging.getLogger(__name__)
+
+if config.AUTH_SECRET:
+    _chave = config.AUTH_SECRET.encode()
+else:
+    logger.warning("AUTH_SECRET vazio: tokens assinados com chave aleatória, válidos só neste processo")
+    _chave = secrets.token_bytes(32)
+
+
+class TokenInvalido(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class UsuarioToken:
+    id: int
+    tipo: str
+    emitido_em: int
+
+
+def _b64(dados: bytes) -> str:
+    return base64.urlsafe_b64encode(dados).decode().rstrip("=")
+
+
+def _unb64(texto: str) -> bytes:
+    return base64.urlsafe_b64decode(texto + "=" * (-len(texto) % 4))
+
+
+def _assinar(corpo: str) -> str:
+    return _b64(hmac.new(_chave, corpo.encode(), hashlib.sha256).digest())
+
+
+def _agora_ms() -> int:
+    return time.time_ns() // 1_000_000
+
+
+def emitir_token(usuario_id: int, tipo: str, ttl: int = config.TOKEN_TTL) -> str:
+    agora = _agora_ms()
+    payload = {"sub": usuario_id, "tipo": tipo, "iat": agora, "exp": agora + ttl * 1000}
+    corpo = _b64(json.dumps(payload, separators=(",", ":")).encode())
+    return f"{corpo}.{_assinar(corpo)}"
+
+
+async def validar_token(token: str) -> UsuarioToken:
+    corpo, _, assinatura = token.partition(".")
+    if not assinatura or not hmac.compare_digest(assinatura, _assinar(corpo)):
+        raise TokenInvalido("assinatura")
+    try:
+        payload = json.loads(_unb64(corpo))
+        usuario = UsuarioToken(id=int(payload["sub"]), tipo=payload["tipo"], emitido_em=int(payload["iat"]))
+        expira_em = int(payload["exp"])
+    except (ValueError, KeyError, TypeError) as exc:
+        raise TokenInvalido("payload") from exc
+    if expira_em <= _agora_ms():
+        raise TokenInvalido("expirado")
+    if await revogacoes.revogado(usuario.id, usuario.emitido_em):
+        raise TokenInvalido("revogado")
+    return usuario
+
+
+class Revogacoes:
+    # usuario_id -> instante (ms) da última alteração, em ordem de revogação.
+    # Uma entrada mais velha que o TTL do token não invalida mais nada e pode
+    # ser descartada. Se o limite de entradas for atingido com revogações
+    # ainda válidas, a mais antiga sai, mas o instante dela vira um piso: todo
+    # token emitido antes dele passa a ser recusado (falha fechada), em vez
+    # de o token revogado voltar a valer.
+
+    PREFIXO = "tcc:revogado:"
+
+    def __init__(self, ttl: int, maximo: int, compartilhado: cache.BackendCompartilhado | None = None,
+                 folga: float = config.REVOGACAO_FOLGA):
+        self.ttl_ms = ttl * 1000
+        self.maximo = maximo
+        self.folga_ms = int(folga * 1000)
+        self.compartilhado = compartilhado
+        self.piso = 0
+        self._entradas: OrderedDict[int, int] = OrderedDict()
+
+    async def revogar(self, usuario_id: int) -> None:
+        agora = _agora_ms()
+        self._entradas[usuario_id] = agora
+        self._entradas.move_to_end(usuario_id)
+        self._descartar_expiradas(agora)
+        while len(self._entradas) > self.maximo:
+            _, revogado_em = self._entradas.popitem(last=False)
+            self.piso = max(self.piso, revogado_em)
+        if self.compartilhado is not None:
+            await self.compartilhado.set(f"{self.PREFIXO}{usuario_id}", str(agora).encode(), self.ttl_ms / 1000)
+
+    def _descartar_expiradas(self, agora: int) -> None:
+        while self._entradas:
+            usuario_id, revogado_em = next(iter(self._entradas.items()))
+            if revogado_em + self.ttl_ms >= agora:
+                break
+            del self._entradas[usuario_id]
+
+    async def revogado(self, usuario_id: int, emitido_em: int) -> bool:
+        # um token emitido pouco antes da revogação por um worker de relógio
+        # adiantado parece posterior a ela; com a folga, também é recusado
+        emitido_em -= self.folga_ms
+        if emitido_em < self.piso:
+            return True
+        revogado_em = self._entradas.get(usuario_id)
+        if revogado_em is not None and emitido_em < revogado_em:
+            return True
+        if self.compartilhado is not None:
+            bruto = await self.compartilhado.get(f"{self.PREFIXO}{usuario_id}")
+            if bruto is not None and emitido_em < int(bruto):
+                return True
+        return False
+
+
+revogacoes = Revogacoes(config.TOKEN_TTL, config.REVOGACOES_MAXIMO, cache.documentos.compartilhado)
+
+_bearer = HTTPBearer(auto_error=False)
+
+
+async def usuario_atual(
+    credenciais: HTTPAuthorizationCredentials | None = Depends(_bearer),
+) -> UsuarioToken:
+    # dependência para rotas protegidas
+    if credenciais is None:
+        raise HTTPException(status_code=401, detail="Não autenticado", headers={"WWW-Authenticate": "Bearer"})
+    try:
+        return await validar_token(credenciais.credentials)
+    except TokenInvalido:
+        raise HTTPException(status_code=401, detail="Token inválido ou expirado", headers={"WWW-Authenticate": "Bearer"})
@@ -0,0 +1,345 @@
+# app/busca.py
+#
+# Busca textual nos metadados dos documentos.
+#
+# No Postgres, documentos.busca é uma coluna tsvector gerada (configuração
+# portuguese + unaccent) com índice GIN, e os filtros por campo usam índices
+# pg_trgm (ver app/migracoes.py). No SQLite, usado em testes e benchmarks
+# locais, um índice invertido em memória faz o papel do tsvector, com a mesma
+# sintaxe de consulta do websearch_to_tsquery (frase, OR e -exclusão).
+
+import asyncio
+import re
+import unicodedata
+from bisect import bisect_left
+from dataclasses import dataclass
+
+from sqlalchemy import func, literal_column
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from .models import Documento
+
+# ------------------------
+# Postgres: tsvector + GIN
+# ------------------------
+
+CONFIG_TEXTO = "portuguese"
+
+# coluna gerada só existe no banco; fica fora do modelo para o create_all do SQLite
+coluna_busca = literal_column("documentos.busca", type_=TSVECTOR)
+
+
+def consulta_texto(q: str):
+    return func.websearch_to_tsquery(literal_column(f"'{CONFIG_TEXTO}'::regconfig"), func.f_unaccent(q))
+
+
+def filtro_texto(q: str):
+    return coluna_busca.op("@@")(consulta_texto(q))
+
+
+def rank_texto(q: str):
+    return func.ts_rank_cd(coluna_busca, consulta_texto(q))
+
+
+# conteúdo dos PDFs: documento_texto.busca, também gerada com GIN
+coluna_busca_conteudo = literal_column("documento_texto.busca", type_=TSVECTOR)
+
+OPCOES_TRECHO = "StartSel=<mark>, StopSel=</mark>, MaxWords=35, MinWords=15, MaxFragments=2, FragmentDelimiter=\" … \""
+
+
+def filtro_conteudo(q: str):
+    return coluna_busca_conteudo.op("@@")(consulta_texto(q))
+
+
+def rank_conteudo(q: str):
+    return func.ts_rank_cd(coluna_busca_conteudo, consulta_texto(q))
+
+
+def trecho_conteudo(texto, q: str):
+    # o destaque usa a consulta sem unaccent para o trecho manter os acentos
+    return func.ts_headline(
+        literal_column(f"'{CONFIG_TEXTO}'::regconfig"),
+        texto,
+        func.websearch_to_tsquery(literal_column(f"'{CONFIG_TEXTO}'::regconfig"), q),
+        OPCOES_TRECHO,
+    )
+
+
+# ------------------------
+# Fallback: tokens
+# ------------------------
+
+# os mesmos campos e pesos dos setweight A/B/C/D da coluna gerada (app.migracoes)
+PESOS_CAMPOS = {
+    "titulo_principal": 1.0,
+    "subtitulo": 0.4,
+    "autor_nome_completo": 0.2,
+    "autor_nome_curto": 0.2,
+    "orientador": 0.2,
+    "departamento": 0.1,
+}
+
+STOPWORDS = {
+    "a", "o", "as", "os", "de", "da", "do", "das", "dos", "e", "em", "no", "na",
+    "nos", "nas", "um", "uma", "para", "por", "com", "sem", "ao", "aos", "se",
+}
+
+_RE_TOKEN = re.compile(r"\w+")
+
+
+def normalizar(texto: str) -> str:
+    sem_acento = unicodedata.normalize("NFKD", texto).encode("ascii", "ignore").decode()
+    return sem_acento.lower()
+
+
+def _palavras(texto: str | None) -> list[str]:
+    return _RE_TOKEN.findall(normalizar(texto)) if texto else []
+
+
+def tokenizar(texto: str | None) -> list[str]:
+    return [t for t in _palavras(texto) if t not in STOPWORDS]
+
+
+# ------------------------
+# Sintaxe do websearch_to_tsquery
+# ------------------------
+
+# "frase exata", -exclusão (de termo ou de frase) e OR entre grupos; dentro de
+# um grupo, tudo precisa aparecer. Como no tsquery, OR separa conjunções:
+# "a b or c" é (a E b) OU c.
+_RE_CONSULTA = re.compile(r'(-?)"([^"]*)"?|(\S+)')
+
+
+@dataclass(frozen=True)
+class ItemConsulta:
+    # termos com a posição relativa ao primeiro: uma palavra solta tem um só;
+    # numa frase, as stopwords contam posição sem virar termo, como no
+    # Postgres ("sistema de informação" é sistema <2> informacao)
+    termos: tuple[tuple[str, int], ...]
+    negado: bool
+
+
+def _termos_com_posicao(texto: str) -> tuple[tuple[str, int], ...]:
+    termos = [(palavra, i) for i, palavra in enumerate(_palavras(texto)) if palavra not in STOPWORDS]
+    return tuple((termo, i - termos[0][1]) for termo, i in termos)
+
+
+def analisar_consulta(q: str) -> list[list[ItemConsulta]]:
+    grupos: list[list[ItemConsulta]] = [[]]
+    for m in _RE_CONSULTA.finditer(q):
+        negado, frase, palavra = m.group(1) == "-", m.group(2), m.group(3)
+        if palavra is not None:
+            if palavra.lower() == "or":
+                if grupos[-1]:
+                    grupos.append([])
+                continue
+            negado = palavra.startswith("-")
+            frase = palavra.lstrip("-")
+        termos = _termos_com_posicao(frase)
+        if termos:
+            grupos[-1].append(ItemConsulta(termos, negado))
+    return [grupo for grupo in grupos if grupo]
+
+
+# ------------------------
+# Fallback: índice invertido em memória
+# ------------------------
+
+class IndiceInvertido:
+    # Termo -> {documento_id: peso}, mais as posições de cada termo no
+    # documento (os campos em sequência, como na coluna gerada) para as
+    # frases. Carregado do banco na primeira busca e mantido pelos caminhos de
+    # escrita do crud. Cada processo tem o seu, o que basta para implantações
+    # de teste com SQLite.
+
+    def __init__(self):
+        self._postings: dict[str, dict[int, float]] = {}
+        self._posicoes: dict[int, dict[str, set[int]]] = {}
+        self._vocabulario: list[str] = []
+        self._vocabulario_sujo = False
+        self.carregado = False
+        self._lock = asyncio.Lock()
+
+    def indexar(self, documento_id: int, campos: dict) -> None:
+        self.remover(documento_id)
+        termos: dict[str, float] = {}
+        posicoes: dict[str, set[int]] = {}
+        posicao = 0
+        for campo, peso in PESOS_CAMPOS.items():
+            for palavra in _palavras(campos.get(campo)):
+                if palavra not in STOPWORDS:
+                    termos[palavra] = termos.get(palavra, 0.0) + peso
+                    posicoes.setdefault(palavra, set()).add(posicao)
+                posicao += 1
+        for termo, peso in termos.items():
+            if termo not in self._postings:
+                self._postings[termo] = {}
+                self._vocabulario_sujo = True
+            self._postings[termo][documento_id] = peso
+        self._posicoes[documento_id] = posicoes
+
+    def remover(self, documento_id: int) -> None:
+        for termo in self._posicoes.pop(documento_id, ()):
+            docs = self._postings.get(termo)
+            if docs is not None:
+                docs.pop(documento_id, None)
+                if not docs:
+                    del self._postings[termo]
+                    self._vocabulario_sujo = True
+
+    def _expandir(self, termo: str) -> list[str]:
+        # sem stemmer: o termo casa também como prefixo ("educa" -> "educacao")
+        if self._vocabulario_sujo:
+            self._vocabulario = sorted(self._postings)
+            self._vocabulario_sujo = False
+        i = bisect_left(self._vocabulario, termo)
+        encontrados = []
+        while i < len(self._vocabulario) and self._vocabulario[i].startswith(termo):
+            encontrados.append(self._vocabulario[i])
+            i += 1
+        return encontrados
+
+    def _documentos_termo(self, termo: str) -> dict[int, float]:
+        docs: dict[int, float] = {}
+        for variante in self._expandir(termo):
+            exato = 1.0 if variante == termo else 0.5
+            for documento_id, peso in self._postings[variante].items():
+                docs[documento_id] = max(docs.get(documento_id, 0.0), peso * exato)
+        return docs
+
+    def _documentos_item(self, item: ItemConsulta) -> dict[int, float]:
+        docs: dict[int, float] | None = None
+        for termo, _ in item.termos:
+            docs_termo = self._documentos_termo(termo)
+            docs = docs_termo if docs is None else {d: p + docs_termo[d] for d, p in docs.items() if d in docs_termo}
+            if not docs:
+                return {}
+        if len(item.termos) == 1:
+            return docs
+        # frase: os termos nas posições relativas certas, a partir de alguma
+        # ocorrência do primeiro
+        variantes = [(self._expandir(termo), deslocamento) for termo, deslocamento in item.termos]
+        return {d: p for d, p in docs.items() if self._tem_frase(self._posicoes[d], variantes)}
+
+    @staticmethod
+    def _tem_frase(posicoes: dict[str, set[int]], variantes: list[tuple[list[str], int]]) -> bool:
+        def em(termos: list[str], posicao: int) -> bool:
+            return any(posicao in posicoes.get(termo, ()) for termo in termos)
+
+        primeiros, _ = variantes[0]
+        inicios = set().union(*(posicoes.get(termo, ()) for termo in primeiros))
+        return any(all(em(termos, inicio + deslocamento) for termos, deslocamento in variantes[1:])
+                   for inicio in inicios)
+
+    def _buscar_grupo(self, grupo: list[ItemConsulta]) -> dict[int, float]:
+        incluir = [item for item in grupo if not item.negado]
+        pontuacao: dict[int, float] | None = None
+        if not incluir:
+            # só exclusões: como no Postgres ("!termo"), vale todo documento sem o termo
+            pontuacao = dict.fromkeys(self._posicoes, 0.0)
+        for item in incluir:
+            docs_item = self._documentos_item(item)
+            pontuacao = docs_item if pontuacao is None else {
+                d: p + docs_item[d] for d, p in pontuacao.items() if d in docs_item
+            }
+            if not pontuacao:
+                return {}
+        for item in grupo:
+            if item.negado:
+                for documento_id in self._documentos_item(item):
+                    pontuacao.pop(documento_id, None)
+        return pontuacao
+
+    def buscar(self, q: str) -> dict[int, float]:
+        # mesma sintaxe do websearch_to_tsquery (analisar_consulta); um
+        # documento que casa com mais de um grupo do OR soma as pontuações
+        pontuacao: dict[int, float] = {}
+        for grupo in analisar_consulta(q):
+            for documento_id, pontos in self._buscar_grupo(grupo).items():
+                pontuacao[documento_id] = pontuacao.get(documento_id, 0.0) + pontos
+        return pontuacao
+
+    async def garantir_carregado(self, db: AsyncSession) -> None:
+        if self.carregado:
+            return
+        async with self._lock:
+            if self.carregado:
+                return
+            colunas = [getattr(Documento, campo) for campo in PESOS_CAMPOS]
+            result = await db.stream(select(Documento.id, *colunas))
+            async for linha in result.mappings():
+                self.indexar(linha["id"], linha)
+            self.carregado = True
+
+    def atualizar(self, documento_id: int, campos: dict) -> None:
+        # chamado pelo crud; antes da primeira carga não há o que manter
+        if self.carregado:
+            self.indexar(documento_id, campos)
+
+    def descartar(self, documento_id: int) -> None:
+        if self.carregado:
+            self.remover(documento_id)
+
+
+indice = IndiceInvertido()
+
+
+def _padrao_item(item: ItemConsulta) -> re.Pattern:
+    # cada termo também como prefixo, como no índice invertido; numa frase,
+    # entre dois termos vêm exatamente as palavras (stopwords) da consulta
+    partes, anterior = [], 0
+    for termo, deslocamento in item.termos:
+        if partes:
+            partes.append(r"\W+(?:\w+\W+)" + f"{{{deslocamento - anterior - 1}}}")
+        partes.append(rf"\b{re.escape(termo)}\w*")
+        anterior = deslocamento
+    return re.compile("".join(partes))
+
+
+def pontuar_conteudo(texto: str | None, q: str, raio: int = 120) -> tuple[int, str | None]:
+    # Fallback de busca no conteúdo sem Postgres, com a sintaxe de
+    # analisar_consulta: conta as ocorrências dos termos e frases dos grupos
+    # que casam e monta um trecho em volta da primeira, com <mark> como o
+    # ts_headline. Percorre o texto inteiro; serve para testes e bases pequenas.
+    if not texto:
+        return 0, None
+    # normalizado caractere a caractere, para as posições valerem no original
+    alinhado = "".join((normalizar(c) or " ")[:1] for c in texto)
+    ocorrencias, casou = [], False
+    for grupo in analisar_consulta(q):
+        if any(_padrao_item(item).search(alinhado) for item in grupo if item.negado):
+            continue
+        achados_grupo = []
+        for item in grupo:
+            if item.negado:
+                continue
+            achados = [m.span() for m in _padrao_item(item).finditer(alinhado)]
+            if not achados:
+                break
+            achados_grupo.extend(achados)
+        else:
+            casou = True
+            ocorrencias.extend(achados_grupo)
+    if not casou:
+        return 0, None
+    if not ocorrencias:
+        # só exclusões: o texto casa, e o trecho é o começo dele (como o ts_headline)
+        return 1, " ".join(texto[:2 * raio].split())
+    ocorrencias = sorted(set(ocorrencias))
+    inicio = max(0, ocorrencias[0][0] - raio)
+    fim = min(len(texto), ocorrencias[0][1] + raio)
+    partes, posicao = [], inicio
+    for a, b in ocorrencias:
+        if a < posicao or b > fim:
+            continue
+        partes += [texto[posicao:a], "<mark>", texto[a:b], "</mark>"]
+        posicao = b
+    partes.append(texto[posicao:fim])
+    trecho = " ".join("".join(partes).split())
+    return len(ocorrencias), trecho
+
+
+def usa_postgres(db: AsyncSession) -> bool:
+    return db.bind.dialect.name == "postgresql"
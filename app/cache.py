@@ -0,0 +1,290 @@
+# app/cache.py
+#
+# Cache read-through dos metadados mais acessados (/documentos/{id},
+# /recentes e as primeiras páginas de /documentos/).
+#
+# Camada 1: LRU com TTL em memória, por processo.
+# Camada 2 (opcional): backend compartilhado entre workers (Redis), com um
+# substituto em memória para testes.
+#
+# Toda escrita em documentos incrementa uma "geração" que faz parte de todas
+# as chaves; com o backend compartilhado a geração também fica lá, então a
+# invalidação vale para todos os workers. Misses simultâneos da mesma chave
+# são agrupados (single-flight): só um deles consulta o banco.
+#
+# Escritas que só tocam parte do cache (o worker mudando o status de um
+# documento) invalidam escopos: chaves lidas com `escopo=` levam também a
+# versão do escopo, e invalidar("documento:42", "listagens") troca só essas
+# versões. Cada versão é um valor novo e único, nunca um contador que volta
+# a zero, então pode expirar (depois de 2x o TTL do cache, quando nenhuma
+# entrada antiga sobrou) sem ressuscitar dados velhos. Como nas gerações,
+# uma carga em andamento durante a invalidação grava sob a versão antiga e
+# não é lida de novo.
+#
+# A geração e as versões lidas do backend compartilhado ficam guardadas no
+# processo por CACHE_VERSOES_TTL: um hit no LRU local não paga uma ida ao
+# backend, ao custo de uma invalidação feita em outro worker só valer aqui
+# depois desse prazo (as feitas neste processo valem na hora).
+
+import asyncio
+import os
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable
+
+from pydantic import TypeAdapter
+
+from . import config
+
+
+class LRUComTTL:
+    def __init__(self, maximo: int, ttl: float):
+        self.maximo = maximo
+        self.ttl = ttl
+        self._itens: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+
+    def get(self, chave: str) -> Any | None:
+        item = self._itens.get(chave)
+        if item is None:
+            return None
+        expira_em, valor = item
+        if expira_em < time.monotonic():
+            del self._itens[chave]
+            return None
+        self._itens.move_to_end(chave)
+        return valor
+
+    def set(self, chave: str, valor: Any) -> None:
+        self._itens[chave] = (time.monotonic() + self.ttl, valor)
+        self._itens.move_to_end(chave)
+        while len(self._itens) > self.maximo:
+            self._itens.popitem(last=False)
+
+    def limpar(self) -> None:
+        self._itens.clear()
+
+    def __len__(self) -> int:
+        return len(self._itens)
+
+
+# ------------------------
+# Backends compartilhados
+# ------------------------
+
+class BackendCompartilhado(ABC):
+    @abstractmethod
+    async def get(self, chave: str) -> bytes | None: ...
+
+    @abstractmethod
+    async def set(self, chave: str, valor: bytes, ttl: float) -> None: ...
+
+    @abstractmethod
+    async def incr(self, chave: str) -> int: ...
+
+    async def get_muitos(self, chaves: list[str]) -> list[bytes | None]:
+        return [await self.get(chave) for chave in chaves]
+
+
+class BackendMemoria(BackendCompartilhado):
+    # substituto local do Redis, com a mesma semântica de TTL e INCR
+    def __init__(self):
+        self._dados: dict[str, tuple[float | None, bytes]] = {}
+
+    async def get(self, chave: str) -> bytes | None:
+        item = self._dados.get(chave)
+        if item is None:
+            return None
+        expira_em, valor = item
+        if expira_em is not None and expira_em < time.monotonic():
+            del self._dados[chave]
+            return None
+        return valor
+
+    async def set(self, chave: str, valor: bytes, ttl: float) -> None:
+        self._dados[chave] = (time.monotonic() + ttl, valor)
+
+    async def incr(self, chave: str) -> int:
+        atual = int(await self.get(chave) or 0) + 1
+        self._dados[chave] = (None, str(atual).encode())
+        return atual
+
+
+class BackendRedis(BackendCompartilhado):
+    def __init__(self, url: str):
+        try:
+            from redis import asyncio as redis_asyncio
+        except ImportError as exc:
+            raise RuntimeError("CACHE_BACKEND=redis requer o pacote redis (requirements-extras.txt)") from exc
+        self._redis = redis_asyncio.from_url(url)
+
+    async def get(self, chave: str) -> bytes | None:
+        return await self._redis.get(chave)
+
+    async def set(self, chave: str, valor: bytes, ttl: float) -> None:
+        await self._redis.set(chave, valor, px=int(ttl * 1000))
+
+    async def incr(self, chave: str) -> int:
+        return await self._redis.incr(chave)
+
+    async def get_muitos(self, chaves: list[str]) -> list[bytes | None]:
+        return await self._redis.mget(chaves)
+
+
+# ------------------------
+# Cache
+# ------------------------
+
+@dataclass
+class Metricas:
+    hits_local: int = 0
+    hits_compartilhado: int = 0
+    misses: int = 0
+    coalescidos: int = 0
+    invalidacoes: int = 0
+
+
+class _LiderCancelado(Exception):
+    pass
+
+
+class Cache:
+    CHAVE_GERACAO = "tcc:geracao"
+    PREFIXO_ESCOPO = "tcc:escopo:"
+
+    def __init__(self, local: LRUComTTL, compartilhado: BackendCompartilhado | None = None, ttl: float = 30,
+                 ttl_versoes: float = config.CACHE_VERSOES_TTL):
+        self.local = local
+        self.compartilhado = compartilhado
+        self.ttl = ttl
+        self.ttl_versoes = ttl_versoes
+        self.metricas = Metricas()
+        self._geracao = 0
+        # versões dos escopos sem backend compartilhado; zeradas a cada nova
+        # geração, que já muda todas as chaves
+        self._escopos: dict[str, str] = {}
+        # com backend compartilhado: geração e versões lidas dele há menos de
+        # ttl_versoes, para um hit local não custar uma ida ao backend
+        self._versoes: dict[str, tuple[float, bytes | None]] = {}
+        self._em_voo: dict[str, asyncio.Future] = {}
+
+    async def _prefixo(self, escopo: str | None) -> str:
+        # "tcc:<geração>" ou, com escopo, "tcc:<geração>.<versão do escopo>"
+        if self.compartilhado is None:
+            versao = self._escopos.get(escopo, "0") if escopo else None
+        else:
+            chaves = [self.CHAVE_GERACAO] + ([self.PREFIXO_ESCOPO + escopo] if escopo else [])
+            agora = time.monotonic()
+            vencidas = [chave for chave in chaves if self._versoes.get(chave, (0, None))[0] <= agora]
+            if vencidas:
+                for chave, valor in zip(vencidas, await self.compartilhado.get_muitos(vencidas)):
+                    self._lembrar_versao(chave, valor, agora)
+            geracao, *versao = (self._versoes[chave][1] for chave in chaves)
+            self._geracao = int(geracao or 0)
+            versao = (versao[0] or b"0").decode() if escopo else None
+        return f"tcc:{self._geracao}" if versao is None else f"tcc:{self._geracao}.{versao}"
+
+    def _lembrar_versao(self, chave: str, valor: bytes | None, agora: float | None = None) -> None:
+        agora = time.monotonic() if agora is None else agora
+        self._versoes[chave] = (agora + self.ttl_versoes, valor)
+
+    async def invalidar(self, *escopos: str) -> None:
+        # sem argumentos: todo o cache; com escopos: só as chaves lidas com eles
+        self.metricas.invalidacoes += 1
+        if escopos:
+            for escopo in escopos:
+                versao = os.urandom(8).hex()
+                if self.compartilhado is None:
+                    self._escopos[escopo] = versao
+                else:
+                    await self.compartilhado.set(self.PREFIXO_ESCOPO + escopo, versao.encode(), 2 * self.ttl)
+                    self._lembrar_versao(self.PREFIXO_ESCOPO + escopo, versao.encode())
+            return
+        self._geracao += 1
+        self._escopos.clear()
+        self.local.limpar()
+        if self.compartilhado is not None:
+            self._geracao = await self.compartilhado.incr(self.CHAVE_GERACAO)
+            self._lembrar_versao(self.CHAVE_GERACAO, str(self._geracao).encode())
+
+    async def obter(
+        self, nome: str, carregar: Callable[[], Awaitable[Any]], adaptador: TypeAdapter, escopo: str | None = None
+    ) -> Any:
+        chave = f"{await self._prefixo(escopo)}:{nome}"
+
+        valor = self.local.get(chave)
+        if valor is not None:
+            self.metricas.hits_local += 1
+            return valor
+
+        if self.compartilhado is not None:
+            bruto = await self.compartilhado.get(chave)
+            if bruto is not None:
+                self.metricas.hits_compartilhado += 1
+                valor = adaptador.validate_json(bruto)
+                self.local.set(chave, valor)
+                return valor
+
+        return await self._carregar_uma_vez(chave, carregar, adaptador)
+
+    async def _carregar_uma_vez(self, chave: str, carregar, adaptador: TypeAdapter) -> Any:
+        em_voo = self._em_voo.get(chave)
+        if em_voo is not None:
+            self.metricas.coalescidos += 1
+            try:
+                return await asyncio.shield(em_voo)
+            except _LiderCancelado:
+                # quem estava carregando foi cancelado; carrega por conta própria
+                return await carregar()
+
+        self.metricas.misses += 1
+        futuro = asyncio.get_running_loop().create_future()
+        self._em_voo[chave] = futuro
+        try:
+            valor = await carregar()
+        except asyncio.CancelledError:
+            futuro.set_exception(_LiderCancelado())
+            futuro.exception()  # marca como lida: pode não haver ninguém esperando
+            raise
+        except BaseException as exc:
+            futuro.set_exception(exc)
+            futuro.exception()
+            raise
+        finally:
+            del self._em_voo[chave]
+
+        futuro.set_result(valor)
+        if valor is not None:
+            self.local.set(chave, valor)
+            if self.compartilhado is not None:
+                await self.compartilhado.set(chave, adaptador.dump_json(valor), self.ttl)
+        return valor
+
+    def resumo(self) -> dict:
+        m = self.metricas
+        consultas = m.hits_local + m.hits_compartilhado + m.misses + m.coalescidos
+        return {
+            "entradas_local": len(self.local),
+            "hits_local": m.hits_local,
+            "hits_compartilhado": m.hits_compartilhado,
+            "misses": m.misses,
+            "coalescidos": m.coalescidos,
+            "invalidacoes": m.invalidacoes,
+            "taxa_acerto": round((consultas - m.misses) / consultas, 4) if consultas else None,
+        }
+
+
+def _criar_backend() -> BackendCompartilhado | None:
+    if config.CACHE_BACKEND == "redis":
+        return BackendRedis(config.REDIS_URL)
+    if config.CACHE_BACKEND == "memoria":
+        return BackendMemoria()
+    return None
+
+
+documentos = Cache(
+    LRUComTTL(config.CACHE_MAXIMO, config.CACHE_TTL),
+    _criar_backend(),
+    ttl=config.CACHE_TTL,
+)
@@ -0,0 +1,161 @@
+# app/cache_blobs.py
+#
+# PDFs "quentes" em memória para /documentos/{id}/download. Quando um TCC é
+# divulgado, centenas de downloads do mesmo arquivo chegam juntos; sem isso,
+# cada um lê o PDF inteiro da origem (S3 ou, nas linhas legadas, arquivo_tcc
+# no banco).
+#
+#   - downloads simultâneos do mesmo blob compartilham uma única leitura
+#     (single-flight), feita numa tarefa própria: o cliente que começou a
+#     leitura pode desistir sem derrubar os outros;
+#   - o conteúdo fica num LRU limitado por bytes, como memoryview somente
+#     leitura; os blocos enviados são fatias dele, sem cópia;
+#   - só um GET do arquivo inteiro carrega o cache. Um Range num blob frio
+#     (leitores de PDF pedem pedaços) lê da origem só o intervalo pedido; com
+#     o blob no cache ou já sendo carregado, sai da memória como os outros.
+#
+# BlobStore local fica de fora: o arquivo já está no page cache e é enviado
+# com zero-copy (app.download). PDFs acima de BLOBS_CACHE_ITEM_MAXIMO não
+# entram no cache e são lidos da origem como antes.
+#
+# O cache é por processo. As chaves são o blob_key (o SHA-256 do conteúdo) ou
+# o id das linhas legadas, que não mudam de conteúdo; update e delete
+# descartam as entradas do documento mesmo assim.
+
+import asyncio
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import AsyncIterator, Callable
+
+from . import config
+
+# lê o intervalo [inicio, fim] (inclusivo) da origem
+LeitorOrigem = Callable[[int, int], AsyncIterator[bytes]]
+
+
+@dataclass
+class Metricas:
+    hits: int = 0
+    misses: int = 0
+    coalescidos: int = 0
+    ignorados: int = 0
+    parciais: int = 0
+    bytes_origem: int = 0
+    bytes_economizados: int = 0
+    descartes: int = 0
+    invalidacoes: int = 0
+
+
+class CacheBlobs:
+    def __init__(self, maximo_bytes: int, item_maximo: int):
+        self.maximo_bytes = maximo_bytes
+        self.item_maximo = item_maximo
+        self.bytes_em_uso = 0
+        self.metricas = Metricas()
+        self._itens: OrderedDict[str, memoryview] = OrderedDict()
+        self._em_voo: dict[str, asyncio.Task] = {}
+
+    def cabe(self, tamanho: int) -> bool:
+        return 0 < tamanho <= min(self.item_maximo, self.maximo_bytes)
+
+    async def obter(self, chave: str, tamanho: int, ler: LeitorOrigem) -> tuple[memoryview, bool]:
+        # (conteúdo, se esta chamada leu da origem)
+        conteudo = self._itens.get(chave)
+        if conteudo is not None:
+            self._itens.move_to_end(chave)
+            self.metricas.hits += 1
+            return conteudo, False
+
+        tarefa = self._em_voo.get(chave)
+        if tarefa is not None:
+            self.metricas.coalescidos += 1
+            return await asyncio.shield(tarefa), False
+
+        self.metricas.misses += 1
+        tarefa = asyncio.create_task(self._carregar(chave, tamanho, ler))
+        self._em_voo[chave] = tarefa
+        tarefa.add_done_callback(lambda t: self._concluido(chave, t))
+        return await asyncio.shield(tarefa), True
+
+    def _concluido(self, chave: str, tarefa: asyncio.Task) -> None:
+        self._em_voo.pop(chave, None)
+        if not tarefa.cancelled():
+            tarefa.exception()  # marca como lida: todos que esperavam podem ter desistido
+
+    async def _carregar(self, chave: str, tamanho: int, ler: LeitorOrigem) -> memoryview:
+        buffer = bytearray(tamanho)
+        posicao = 0
+        async for bloco in ler(0, tamanho - 1):
+            buffer[posicao:posicao + len(bloco)] = bloco
+            posicao += len(bloco)
+        self.metricas.bytes_origem += posicao
+        if posicao != tamanho:
+            raise IOError(f"blob {chave}: lidos {posicao} de {tamanho} bytes")
+        # somente leitura: as fatias entregues às respostas não podem alterá-lo
+        conteudo = memoryview(buffer).toreadonly()
+        self._guardar(chave, conteudo)
+        return conteudo
+
+    def _guardar(self, chave: str, conteudo: memoryview) -> None:
+        anterior = self._itens.pop(chave, None)
+        if anterior is not None:
+            self.bytes_em_uso -= len(anterior)
+        self._itens[chave] = conteudo
+        self.bytes_em_uso += len(conteudo)
+        while self.bytes_em_uso > self.maximo_bytes:
+            _, descartado = self._itens.popitem(last=False)
+            self.bytes_em_uso -= len(descartado)
+            self.metricas.descartes += 1
+
+    def invalidar(self, *chaves: str) -> None:
+        for chave in chaves:
+            conteudo = self._itens.pop(chave, None)
+            if conteudo is not None:
+                self.bytes_em_uso -= len(conteudo)
+                self.metricas.invalidacoes += 1
+
+    def leitor(self, chave: str, tamanho: int, ler: LeitorOrigem, tamanho_bloco: int) -> LeitorOrigem:
+        # LeitorArquivo de app.download que passa pelo cache quando o blob cabe
+        if not self.cabe(tamanho):
+            self.metricas.ignorados += 1
+            return ler
+
+        async def ler_do_cache(inicio: int, fim: int) -> AsyncIterator[memoryview]:
+            if (inicio, fim) != (0, tamanho - 1) and chave not in self._itens and chave not in self._em_voo:
+                self.metricas.parciais += 1
+                async for bloco in ler(inicio, fim):
+                    yield bloco
+                return
+            conteudo, lido = await self.obter(chave, tamanho, ler)
+            if not lido:
+                self.metricas.bytes_economizados += fim - inicio + 1
+            for posicao in range(inicio, fim + 1, tamanho_bloco):
+                yield conteudo[posicao:min(posicao + tamanho_bloco, fim + 1)]
+
+        return ler_do_cache
+
+    def resumo(self) -> dict:
+        m = self.metricas
+        consultas = m.hits + m.misses + m.coalescidos
+        return {
+            "entradas": len(self._itens),
+            "bytes_em_uso": self.bytes_em_uso,
+            "maximo_bytes": self.maximo_bytes,
+            "hits": m.hits,
+            "misses": m.misses,
+            "coalescidos": m.coalescidos,
+            "ignorados": m.ignorados,
+            "parciais": m.parciais,
+            "bytes_origem": m.bytes_origem,
+            "bytes_economizados": m.bytes_economizados,
+            "descartes": m.descartes,
+            "invalidacoes": m.invalidacoes,
+            "taxa_acerto": round((m.hits + m.coalescidos) / consultas, 4) if consultas else None,
+        }
+
+
+def chave_legado(documento_id: int) -> str:
+    return f"legado:{documento_id}"
+
+
+blobs = CacheBlobs(config.BLOBS_CACHE_BYTES, config.BLOBS_CACHE_ITEM_MAXIMO)
@@ -0,0 +1,201 @@
+# app/config.py
+#
+# Configurações da aplicação, lidas de variáveis de ambiente.
+
+import os
+
+
+def _bool(nome: str, padrao: bool) -> bool:
+    valor = os.getenv(nome)
+    if valor is None:
+        return padrao
+    return valor.strip().lower() in ("1", "true", "sim", "yes", "on")
+
+
+# "dev" permite padrões que só servem para um processo local (ex.: sem
+# AUTH_SECRET, banco SQLite em arquivo)
+AMBIENTE = os.getenv("AMBIENTE", "dev")
+
+# ------------------------
+# Banco de dados
+# ------------------------
+
+# em dev, sem DATABASE_URL, um SQLite local (tabelas com python -m app.migracoes)
+DATABASE_URL = os.getenv("DATABASE_URL", "")
+if not DATABASE_URL:
+    if AMBIENTE != "dev":
+        raise RuntimeError(f"DATABASE_URL é obrigatório com AMBIENTE={AMBIENTE}")
+    DATABASE_URL = "sqlite+aiosqlite:///./dev.sqlite"
+# log de todo SQL executado; só para depuração, custa caro sob carga
+DB_ECHO = _bool("DB_ECHO", False)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 10))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 10))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 30))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))
+DB_POOL_PRE_PING = _bool("DB_POOL_PRE_PING", True)
+# cache de prepared statements do asyncpg por conexão (0 desliga, ex.: atrás do pgbouncer)
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", 100))
+# conexões abertas no startup, antes da primeira requisição
+DB_POOL_PREAQUECER = int(os.getenv("DB_POOL_PREAQUECER", 2))
+
+# ------------------------
+# Upload / armazenamento
+# ------------------------
+
+# tamanho máximo aceito para o PDF em /documentos/upload (bytes)
+TAMANHO_MAXIMO_UPLOAD = int(os.getenv("TAMANHO_MAXIMO_UPLOAD", 50 * 1024 * 1024))
+# tamanho máximo do pacote ZIP/TAR em /documentos/lote (bytes)
+TAMANHO_MAXIMO_LOTE = int(os.getenv("TAMANHO_MAXIMO_LOTE", 2 * 1024 * 1024 * 1024))
+
+# tamanho de cada leitura do UploadFile
+TAMANHO_BLOCO_UPLOAD = int(os.getenv("TAMANHO_BLOCO_UPLOAD", 1024 * 1024))
+
+# armazenamento dos PDFs: "local" (disco) ou "s3"
+ARMAZENAMENTO = os.getenv("ARMAZENAMENTO", "local")
+ARMAZENAMENTO_DIR = os.getenv("ARMAZENAMENTO_DIR", "armazenamento")
+S3_BUCKET = os.getenv("S3_BUCKET", "tccs")
+S3_PREFIXO = os.getenv("S3_PREFIXO", "")
+# aponta para um S3 local (MinIO, moto_server...) em desenvolvimento
+S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL") or None
+
+# custo do bcrypt (log2 das rodadas) e pool dedicado para hash/verificação de senha
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", 12))
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", min(4, os.cpu_count() or 1)))
+# pedidos aguardando um worker livre; além disso a API responde 503
+HASH_FILA_MAXIMA = int(os.getenv("HASH_FILA_MAXIMA", 32))
+
+# chave HMAC dos tokens de acesso, a mesma em todos os workers; obrigatória
+# fora de dev (em dev, sem ela, uma chave aleatória por processo: tokens
+# deixam de valer ao reiniciar e não são aceitos entre workers)
+AUTH_SECRET = os.getenv("AUTH_SECRET", "")
+if not AUTH_SECRET and AMBIENTE != "dev":
+    raise RuntimeError(f"AUTH_SECRET é obrigatório com AMBIENTE={AMBIENTE}")
+TOKEN_TTL = int(os.getenv("TOKEN_TTL", 3600))
+# usuários alterados/excluídos lembrados para invalidar tokens já emitidos; com
+# CACHE_BACKEND (obrigatório fora de dev), as revogações também vão para o
+# backend compartilhado e valem em todos os workers. Além deste limite, tokens emitidos antes da revogação
+# mais antiga descartada são recusados.
+REVOGACOES_MAXIMO = int(os.getenv("REVOGACOES_MAXIMO", 10000))
+# relógios de workers diferentes não batem ao milissegundo: um token emitido
+# até esta folga (s) depois de uma revogação também é recusado
+REVOGACAO_FOLGA = float(os.getenv("REVOGACAO_FOLGA", 1))
+
+# ------------------------
+# Cache de metadados
+# ------------------------
+
+# validade (s) e número máximo de entradas do LRU em memória
+CACHE_TTL = float(os.getenv("CACHE_TTL", 30))
+CACHE_MAXIMO = int(os.getenv("CACHE_MAXIMO", 1024))
+# só as primeiras páginas (skip + limit até este valor) de /documentos/ vão para o cache
+CACHE_LISTA_MAXIMO = int(os.getenv("CACHE_LISTA_MAXIMO", 100))
+# backend compartilhado entre workers: "" (nenhum), "memoria" (substituto local) ou "redis"
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "")
+# por quanto tempo (s) cada worker reaproveita a geração e as versões de escopo
+# lidas do backend compartilhado; é o atraso máximo para uma invalidação feita
+# em outro worker valer neste (0: consulta o backend a cada leitura)
+CACHE_VERSOES_TTL = float(os.getenv("CACHE_VERSOES_TTL", 1))
+# as revogações de token (app.auth) só valem entre workers pelo redis; fora de
+# dev, sem ele, um token revogado continuaria aceito nos outros processos
+if CACHE_BACKEND != "redis" and AMBIENTE != "dev":
+    raise RuntimeError(f"CACHE_BACKEND=redis é obrigatório com AMBIENTE={AMBIENTE}")
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+# ------------------------
+# Cache de PDFs
+# ------------------------
+
+# memória para os PDFs mais baixados vindos do S3 ou de arquivo_tcc (app.cache_blobs);
+# PDFs maiores que o item máximo não entram (0 desliga o cache)
+BLOBS_CACHE_BYTES = int(os.getenv("BLOBS_CACHE_BYTES", 256 * 1024 * 1024))
+BLOBS_CACHE_ITEM_MAXIMO = int(os.getenv("BLOBS_CACHE_ITEM_MAXIMO", 32 * 1024 * 1024))
+
+# ------------------------
+# Importação em lote
+# ------------------------
+
+# documentos por transação (INSERT executemany) em /documentos/lote e python -m app.lote
+LOTE_TAMANHO_TRANSACAO = int(os.getenv("LOTE_TAMANHO_TRANSACAO", 200))
+
+# ------------------------
+# Processamento em segundo plano
+# ------------------------
+
+# roda os workers de app.worker dentro da API; desligue para usar só python -m app.worker
+JOBS_NA_APP = _bool("JOBS_NA_APP", True)
+# jobs executando ao mesmo tempo por processo e processos para as etapas de CPU
+JOBS_CONCORRENCIA = int(os.getenv("JOBS_CONCORRENCIA", 4))
+JOBS_PROCESSOS = int(os.getenv("JOBS_PROCESSOS", min(2, os.cpu_count() or 1)))
+# tentativas por job, com espera exponencial (s) entre elas
+JOBS_TENTATIVAS = int(os.getenv("JOBS_TENTATIVAS", 5))
+JOBS_BACKOFF_BASE = float(os.getenv("JOBS_BACKOFF_BASE", 2))
+JOBS_BACKOFF_MAXIMO = float(os.getenv("JOBS_BACKOFF_MAXIMO", 300))
+# espera (s) entre consultas à fila quando ela está vazia
+JOBS_INTERVALO = float(os.getenv("JOBS_INTERVALO", 1))
+# tempo (s) que um job fica reservado; se o worker morrer, volta à fila depois disso
+JOBS_PRAZO = float(os.getenv("JOBS_PRAZO", 300))
+# jobs terminados (concluídos ou que esgotaram as tentativas) ficam na tabela
+# por JOBS_RETENCAO_DIAS (0 guarda todos); o worker apaga os mais antigos a
+# cada JOBS_LIMPEZA_INTERVALO segundos, em lotes de JOBS_LIMPEZA_LOTE
+JOBS_RETENCAO_DIAS = float(os.getenv("JOBS_RETENCAO_DIAS", 7))
+JOBS_LIMPEZA_INTERVALO = float(os.getenv("JOBS_LIMPEZA_INTERVALO", 3600))
+JOBS_LIMPEZA_LOTE = int(os.getenv("JOBS_LIMPEZA_LOTE", 1000))
+
+# caracteres do texto extraído de cada PDF guardados em documento_texto
+# (o tsvector do Postgres tem limite de 1 MB)
+TEXTO_MAXIMO = int(os.getenv("TEXTO_MAXIMO", 500_000))
+
+# ------------------------
+# Partida
+# ------------------------
+
+# routers pouco usados (/usuarios) importados só na primeira requisição
+ROTAS_PREGUICOSAS = _bool("ROTAS_PREGUICOSAS", True)
+# schema OpenAPI gerado no build (python -m app.openapi --saida openapi.json);
+# vazio = gerado no primeiro acesso a /openapi.json
+OPENAPI_PRECOMPUTADO = os.getenv("OPENAPI_PRECOMPUTADO", "")
+
+# ------------------------
+# Controle de admissão
+# ------------------------
+
+# requisições simultâneas e fila de espera por classe (app.admissao); além da
+# fila, ou após ADMISSAO_ESPERA segundos nela, a resposta é 503 com Retry-After
+ADMISSAO_UPLOAD_LIMITE = int(os.getenv("ADMISSAO_UPLOAD_LIMITE", 4))
+ADMISSAO_UPLOAD_FILA = int(os.getenv("ADMISSAO_UPLOAD_FILA", 16))
+# importações em lote são longas e gravam muito: poucas por vez
+ADMISSAO_LOTE_LIMITE = int(os.getenv("ADMISSAO_LOTE_LIMITE", 1))
+ADMISSAO_LOTE_FILA = int(os.getenv("ADMISSAO_LOTE_FILA", 2))
+ADMISSAO_DOWNLOAD_LIMITE = int(os.getenv("ADMISSAO_DOWNLOAD_LIMITE", 32))
+ADMISSAO_DOWNLOAD_FILA = int(os.getenv("ADMISSAO_DOWNLOAD_FILA", 64))
+ADMISSAO_BUSCA_LIMITE = int(os.getenv("ADMISSAO_BUSCA_LIMITE", 8))
+ADMISSAO_BUSCA_FILA = int(os.getenv("ADMISSAO_BUSCA_FILA", 32))
+ADMISSAO_AUTH_LIMITE = int(os.getenv("ADMISSAO_AUTH_LIMITE", HASH_WORKERS))
+ADMISSAO_AUTH_FILA = int(os.getenv("ADMISSAO_AUTH_FILA", HASH_FILA_MAXIMA))
+ADMISSAO_ESPERA = float(os.getenv("ADMISSAO_ESPERA", 2))
+# bytes em trânsito somando os blocos de upload ainda não consumidos e os de
+# download sendo enviados (lotes e envios zerocopy ficam de fora)
+ADMISSAO_BYTES_MAXIMO = int(os.getenv("ADMISSAO_BYTES_MAXIMO", 512 * 1024 * 1024))
+# balde de tokens por cliente: requisições por segundo e rajada (0 desliga)
+ADMISSAO_TAXA = float(os.getenv("ADMISSAO_TAXA", 50))
+ADMISSAO_RAJADA = float(os.getenv("ADMISSAO_RAJADA", 100))
+ADMISSAO_CLIENTES_MAXIMO = int(os.getenv("ADMISSAO_CLIENTES_MAXIMO", 10000))
+# identifica o cliente pelo X-Forwarded-For (só atrás de um proxy confiável)
+ADMISSAO_CONFIAR_PROXY = _bool("ADMISSAO_CONFIAR_PROXY", False)
+
+# ------------------------
+# Métricas
+# ------------------------
+
+# /metrics, /metrics/perfis, /pool, /cache, /cache/blobs, /jobs e /admissao
+# exigem "Authorization: Bearer <token>" (app.monitoramento). Sem token, ficam
+# abertos só em dev; nos outros ambientes, desligados (404).
+MONITORAMENTO_TOKEN = os.getenv("MONITORAMENTO_TOKEN", "")
+
+# perfil por amostragem das requisições (app.metricas.Amostrador); desligado por padrão
+METRICAS_PERFIL = _bool("METRICAS_PERFIL", False)
+# requisições acima deste tempo (s) têm as pilhas registradas no log e em /metrics/perfis
+METRICAS_PERFIL_LIMIAR = float(os.getenv("METRICAS_PERFIL_LIMIAR", 1.0))
+# intervalo (s) entre amostras e quantas das requisições mais lentas ficam guardadas
+METRICAS_PERFIL_INTERVALO = float(os.getenv("METRICAS_PERFIL_INTERVALO", 0.01))
+METRICAS_PERFIL_GUARDADOS = int(os.getenv("METRICAS_PERFIL_GUARDADOS", 10))
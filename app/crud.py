@@ -1,59 +1,214 @@
 # app/crud.py
 
+import asyncio
+from contextlib import nullcontext
+from dataclasses import dataclass
 from datetime import datetime
+from types import SimpleNamespace
+from typing import AsyncIterator
 
 from sqlalchemy.future import select
-from sqlalchemy import desc, and_
+from sqlalchemy import String, bindparam, desc, and_, func, insert, literal, null, update, delete
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Row
+from sqlalchemy.orm import aliased
 from sqlalchemy.ext.asyncio import AsyncSession
+from pydantic import TypeAdapter
 
-from passlib.context import CryptContext
+from . import busca, cache, cache_blobs, config, facetas, jobs
+from .database import AsyncSessionLocal
+from .download import TAMANHO_BLOCO
+from .models import Documento, DocumentoTexto, Usuario
+from .paginacao import ORDEM_DOCUMENTOS, filtro_cursor, filtro_posterior
+from .respostas import como_dicts
+from .schemas import DocumentoCreate, DocumentoResponse, FacetasResponse, UsuarioCreate, UsuarioUpdate
+from .auth import revogacoes
+from .seguranca import gerar_hash, verificar_senha
+from .storage import BlobInfo, get_blob_store
 
-from .models import Documento, Usuario
-from .schemas import DocumentoCreate, UsuarioCreate, UsuarioUpdate
+# As escritas usam um único INSERT/UPDATE/DELETE ... RETURNING com as colunas
+# de metadados: sem SELECT antes e sem refresh depois (o banco fica em outra
+# região, cada ida e volta conta). Devolvem Row, lido pelos schemas de resposta
+# como atributos.
 
-# contexto de hashing de senha
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+COLUNAS_METADADOS = (
+    Documento.id,
+    Documento.titulo_principal,
+    Documento.subtitulo,
+    Documento.ano,
+    Documento.departamento,
+    Documento.data_defesa,
+    Documento.orientador,
+    Documento.grupo_instrucao,
+    Documento.contagem_passagens,
+    Documento.published_at,
+    Documento.status,
+    Documento.autor_nome_curto,
+    Documento.autor_nome_completo,
+)
+
+# job de pós-processamento de cada documento novo (app.worker) e os valores
+# de Documento.status que ele percorre
+PROCESSAR_DOCUMENTO = "processar_documento"
+STATUS_PENDENTE, STATUS_PROCESSANDO, STATUS_PRONTO, STATUS_FALHOU = "pendente", "processando", "pronto", "falhou"
+
+# buscas sem `conteudo` trazem a coluna `trecho` vazia, para todas as linhas
+# de search_documentos terem o mesmo formato
+_SEM_TRECHO = null().label("trecho")
+
+COLUNAS_USUARIO = (Usuario.id, Usuario.nome, Usuario.email, Usuario.tipo, Usuario.datacad)
 
 # ------------------------
 # CRUD de Documento
 # ------------------------
 
-async def create_documento(db: AsyncSession, content: bytes, doc_in: DocumentoCreate) -> Documento:
-    new = Documento(
-        titulo_principal   = doc_in.titulo_principal,
-        subtitulo          = doc_in.subtitulo,
-        ano                = doc_in.ano,
-        departamento       = doc_in.departamento,
-        data_defesa        = doc_in.data_defesa,
-        orientador         = doc_in.orientador,
-        grupo_instrucao    = doc_in.grupo_instrucao,
-        contagem_passagens = doc_in.contagem_passagens,
-        arquivo_tcc        = content,
-        published_at       = datetime.utcnow(),
-        autor_nome_curto   = doc_in.autor_nome_curto,
-        autor_nome_completo= doc_in.autor_nome_completo,
-    )
-    db.add(new)
-    await db.commit()
-    await db.refresh(new)
+async def create_documento(db: AsyncSession, blob: BlobInfo, doc_in: DocumentoCreate) -> Row:
+    valores = {
+        **doc_in.model_dump(),
+        "blob_key":     blob.chave,
+        "tamanho":      blob.tamanho,
+        "sha256":       blob.sha256,
+        "published_at": datetime.utcnow(),
+        "status":       STATUS_PENDENTE,
+    }
+    # contagem de páginas e verificação do blob ficam para o app.worker
+    async with blobs_serializados(db):
+        if busca.usa_postgres(db):
+            # um statement só: a trava do blob, as contagens das facetas e o
+            # job são CTEs
+            trava = _trava_blobs([blob.chave]).cte("trava_blob")
+            colunas = Documento.__table__.c
+            q = insert(Documento).from_select(
+                list(valores),
+                select(*(literal(v, colunas[k].type) for k, v in valores.items())).select_from(trava),
+            ).returning(*COLUNAS_METADADOS)
+            novo = q.cte("novo")
+            new = (await db.execute(select(*novo.c).add_cte(
+                facetas.ajuste_em_cte(adicionados=novo).cte("ajuste_facetas"),
+                jobs.enfileirar_em_cte(PROCESSAR_DOCUMENTO, novo).cte("novo_job"),
+            ))).one()
+        else:
+            new = (await db.execute(insert(Documento).values(**valores).returning(*COLUNAS_METADADOS))).one()
+            await facetas.ajustar(db, adicionados=[new])
+            await jobs.enfileirar(db, PROCESSAR_DOCUMENTO, [new.id])
+        if not await get_blob_store().existe(blob.chave):
+            await db.rollback()
+            raise BlobRemovido(blob.chave)
+        await db.commit()
+    jobs.avisar()
+    busca.indice.atualizar(new.id, new._mapping)
+    await cache.documentos.invalidar()
     return new
 
+# As consultas de Documento abaixo trazem só os metadados: a coluna arquivo_tcc
+# é "deferred" no modelo e nunca vem junto. Os PDFs novos ficam no BlobStore
+# (blob_key); arquivo_tcc só existe em linhas antigas ainda não migradas e é
+# lido apenas por get_documento_arquivo / iter_documento_arquivo.
+
 async def get_documento(db: AsyncSession, documento_id: int) -> Documento | None:
     result = await db.execute(select(Documento).where(Documento.id == documento_id))
     return result.scalars().first()
 
-async def list_documentos(db: AsyncSession, skip: int, limit: int) -> list[Documento]:
-    q = select(Documento).order_by(desc(Documento.published_at)).offset(skip).limit(limit)
+async def get_documento_arquivo(db: AsyncSession, documento_id: int) -> bytes | None:
+    result = await db.execute(select(Documento.arquivo_tcc).where(Documento.id == documento_id))
+    return result.scalars().first()
+
+async def get_documento_download(db: AsyncSession, documento_id: int):
+    # dados necessários para montar os cabeçalhos do download, sem ler o PDF
+    q = select(
+        Documento.id,
+        Documento.blob_key,
+        func.coalesce(Documento.tamanho, func.length(Documento.arquivo_tcc)).label("tamanho"),
+        Documento.sha256,
+        Documento.published_at,
+    ).where(Documento.id == documento_id)
     result = await db.execute(q)
-    return result.scalars().all()
+    return result.first()
+
+async def iter_documento_arquivo(
+    documento_id: int, inicio: int, fim: int, tamanho_bloco: int = TAMANHO_BLOCO
+) -> AsyncIterator[bytes]:
+    # Lê o PDF legado em blocos com substr(), um bloco por consulta, sem nunca
+    # ter o arquivo inteiro em memória. Abre a própria sessão porque roda depois que
+    # a rota já retornou (dentro do StreamingResponse).
+    async with AsyncSessionLocal() as db:
+        posicao = inicio
+        while posicao <= fim:
+            tamanho = min(tamanho_bloco, fim - posicao + 1)
+            result = await db.execute(
+                select(func.substr(Documento.arquivo_tcc, posicao + 1, tamanho))
+                .where(Documento.id == documento_id)
+            )
+            bloco = result.scalar()
+            if not bloco:
+                break
+            yield bytes(bloco)
+            posicao += len(bloco)
+
+async def origem_pdf(info) -> str | bytes:
+    # Entrada de app.processamento.analisar_pdf para uma linha de
+    # get_documento_download: o caminho no disco quando o BlobStore é local
+    # (o processo filho lê o arquivo), senão o conteúdo inteiro.
+    store = get_blob_store()
+    if info.blob_key:
+        caminho = store.caminho_local(info.blob_key)
+        if caminho:
+            return caminho
+        blocos = store.ler(info.blob_key, 0, info.tamanho - 1, TAMANHO_BLOCO)
+    else:
+        blocos = iter_documento_arquivo(info.id, 0, info.tamanho - 1)
+    return b"".join([bloco async for bloco in blocos])
+
+async def salvar_texto_documento(db: AsyncSession, documento_id: int, analise: dict) -> None:
+    # grava (ou substitui) o texto extraído; o commit fica com quem chama
+    valores = {
+        "texto": analise["texto"],
+        "paginas": analise["paginas"],
+        "erro": analise["erro"],
+        "extraido_em": datetime.utcnow(),
+    }
+    q = _insert(db, DocumentoTexto).values(documento_id=documento_id, **valores)
+    q = q.on_conflict_do_update(index_elements=[DocumentoTexto.documento_id], set_=valores)
+    await db.execute(q)
+
+async def stream_metadados(
+    since: datetime | None = None, tamanho_particao: int = 1000, since_id: int | None = None
+) -> AsyncIterator[list[Row]]:
+    # Percorre os metadados em ordem de publicação com cursor no servidor,
+    # entregando `tamanho_particao` linhas por vez. Abre a própria sessão
+    # porque é consumido dentro do StreamingResponse. (since, since_id) é a
+    # última linha já exportada: a sincronização continua dela sem perder os
+    # documentos com o mesmo published_at.
+    q = select(*COLUNAS_METADADOS).order_by(Documento.published_at, Documento.id)
+    if since is not None:
+        q = q.where(filtro_posterior(since, since_id))
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(q.execution_options(yield_per=tamanho_particao))
+        async for particao in result.partitions():
+            yield particao
+
+# As listagens e buscas devolvem Row (tuplas) com COLUNAS_METADADOS em vez de
+# objetos do ORM: nada de identity map nem instrumentação por atributo, e as
+# rotas serializam direto (app.respostas).
 
-async def list_recent(db: AsyncSession, limit: int) -> list[Documento]:
-    q = select(Documento).order_by(desc(Documento.published_at)).limit(limit)
+async def list_documentos(
+    db: AsyncSession, skip: int, limit: int, cursor: str | None = None
+) -> list[Row]:
+    # com cursor, a página começa direto no índice (published_at, id) em vez de
+    # percorrer e descartar `skip` linhas
+    q = select(*COLUNAS_METADADOS)
+    if cursor:
+        q = q.where(filtro_cursor(cursor))
+    q = q.order_by(*ORDEM_DOCUMENTOS).offset(skip).limit(limit)
     result = await db.execute(q)
-    return result.scalars().all()
+    return result.all()
 
-async def search_documentos(
-    db: AsyncSession,
+async def list_recent(db: AsyncSession, limit: int) -> list[Row]:
+    q = select(*COLUNAS_METADADOS).order_by(*ORDEM_DOCUMENTOS).limit(limit)
+    result = await db.execute(q)
+    return result.all()
+
+def _filtros_busca(
     titprinc: str | None = None,
     subtitu: str | None = None,
     ano: int | None = None,
@@ -64,9 +219,7 @@ async def search_documentos(
     contpass: int | None = None,
     autor_nome_curto: str | None = None,
     autor_nome_completo: str | None = None,
-    skip: int = 0,
-    limit: int = 10
-) -> list[Documento]:
+) -> list:
     filters = []
     if titprinc:          filters.append(Documento.titulo_principal.ilike(f"%{titprinc}%"))
     if subtitu:           filters.append(Documento.subtitulo.ilike(f"%{subtitu}%"))
@@ -80,33 +233,390 @@ async def search_documentos(
     if autor_nome_curto:  filters.append(Documento.autor_nome_curto.ilike(f"%{autor_nome_curto}%"))
     if autor_nome_completo:
                           filters.append(Documento.autor_nome_completo.ilike(f"%{autor_nome_completo}%"))
+    return filters
+
+async def search_documentos(
+    db: AsyncSession,
+    titprinc: str | None = None,
+    subtitu: str | None = None,
+    ano: int | None = None,
+    arcurdepto: str | None = None,
+    dtdefesa: datetime | None = None,
+    nomorienta: str | None = None,
+    grintruc: str | None = None,
+    contpass: int | None = None,
+    autor_nome_curto: str | None = None,
+    autor_nome_completo: str | None = None,
+    skip: int = 0,
+    limit: int = 10,
+    q: str | None = None,
+    cursor: str | None = None,
+    conteudo: str | None = None,
+) -> list[Row] | list[dict]:
+    # Linhas com COLUNAS_METADADOS e `trecho` (só preenchido na busca por conteúdo)
+    filters = _filtros_busca(
+        titprinc, subtitu, ano, arcurdepto, dtdefesa, nomorienta, grintruc, contpass,
+        autor_nome_curto, autor_nome_completo,
+    )
+
+    if conteudo:
+        return await _search_conteudo(db, conteudo, filters, q, skip, limit)
+    if q and not busca.usa_postgres(db):
+        return await _search_documentos_indice(db, q, filters, skip, limit)
+    if cursor:
+        # o cursor segue a ordem por data; com q a ordem é por relevância
+        filters.append(filtro_cursor(cursor))
 
-    q = select(Documento)
+    stmt = select(*COLUNAS_METADADOS, _SEM_TRECHO)
+    if q:
+        # texto livre ranqueado pelo tsvector (índice GIN)
+        filters.append(busca.filtro_texto(q))
     if filters:
-        q = q.where(and_(*filters))
-    q = q.order_by(desc(Documento.published_at)).offset(skip).limit(limit)
+        stmt = stmt.where(and_(*filters))
+    if q:
+        stmt = stmt.order_by(desc(busca.rank_texto(q)), *ORDEM_DOCUMENTOS)
+    else:
+        stmt = stmt.order_by(*ORDEM_DOCUMENTOS)
+    stmt = stmt.offset(skip).limit(limit)
 
-    result = await db.execute(q)
-    return result.scalars().all()
+    result = await db.execute(stmt)
+    return result.all()
+
+async def _search_conteudo(
+    db: AsyncSession, conteudo: str, filters: list, q: str | None, skip: int, limit: int
+) -> list[Row] | list[dict]:
+    # Busca no texto dos PDFs, ordenada por relevância. Devolve linhas com os
+    # metadados e `trecho`, um pedaço do texto com os termos entre <mark>.
+    if not busca.usa_postgres(db):
+        return (await _search_conteudo_local(db, conteudo, filters, q))[skip:skip + limit]
+    if q:
+        filters.append(busca.filtro_texto(q))
+    rank = busca.rank_conteudo(conteudo).label("rank")
+    # o ts_headline relê o texto inteiro: roda só nas linhas da página
+    pagina = (
+        select(Documento.id, rank)
+        .join(DocumentoTexto, DocumentoTexto.documento_id == Documento.id)
+        .where(busca.filtro_conteudo(conteudo), *filters)
+        .order_by(desc(rank), *ORDEM_DOCUMENTOS)
+        .offset(skip)
+        .limit(limit)
+        .subquery()
+    )
+    stmt = (
+        select(*COLUNAS_METADADOS, busca.trecho_conteudo(DocumentoTexto.texto, conteudo).label("trecho"))
+        .join(pagina, pagina.c.id == Documento.id)
+        .join(DocumentoTexto, DocumentoTexto.documento_id == Documento.id)
+        .order_by(desc(pagina.c.rank), *ORDEM_DOCUMENTOS)
+    )
+    result = await db.execute(stmt)
+    return result.all()
+
+async def _search_conteudo_local(
+    db: AsyncSession, conteudo: str, filters: list, q: str | None
+) -> list[dict]:
+    # fallback sem Postgres: percorre os textos em Python (app.busca.pontuar_conteudo)
+    if q:
+        await busca.indice.garantir_carregado(db)
+        filters.append(Documento.id.in_(busca.indice.buscar(q)))
+    trecho = DocumentoTexto.texto.label("trecho")
+    stmt = (
+        select(*COLUNAS_METADADOS, trecho)
+        .join(DocumentoTexto, DocumentoTexto.documento_id == Documento.id)
+        .where(DocumentoTexto.texto.is_not(None), *filters)
+    )
+    encontrados = []
+    result = await db.stream(stmt)
+    async for linha in result:
+        pontuacao, texto = busca.pontuar_conteudo(linha.trecho, conteudo)
+        if pontuacao:
+            encontrados.append((pontuacao, {**linha._mapping, "trecho": texto}))
+    encontrados.sort(key=lambda par: (par[0], par[1]["published_at"], par[1]["id"]), reverse=True)
+    return [linha for _, linha in encontrados]
+
+async def contar_documentos(
+    db: AsyncSession,
+    titprinc: str | None = None,
+    subtitu: str | None = None,
+    ano: int | None = None,
+    arcurdepto: str | None = None,
+    dtdefesa: datetime | None = None,
+    nomorienta: str | None = None,
+    grintruc: str | None = None,
+    contpass: int | None = None,
+    autor_nome_curto: str | None = None,
+    autor_nome_completo: str | None = None,
+    q: str | None = None,
+    conteudo: str | None = None,
+) -> int:
+    # Total para X-Total-Count com os mesmos filtros de search_documentos.
+    # Sem filtros ou só com `ano`, vem das contagens pré-agregadas (app.facetas)
+    # em vez de um count(*) sobre a tabela.
+    filters = _filtros_busca(
+        titprinc, subtitu, ano, arcurdepto, dtdefesa, nomorienta, grintruc, contpass,
+        autor_nome_curto, autor_nome_completo,
+    )
+    if conteudo and not busca.usa_postgres(db):
+        return len(await _search_conteudo_local(db, conteudo, filters, q))
+    if conteudo:
+        filters.append(Documento.id.in_(
+            select(DocumentoTexto.documento_id).where(busca.filtro_conteudo(conteudo))
+        ))
+    if not q and not filters:
+        return await total_documentos_cacheado(db)
+    if not q and len(filters) == 1 and ano is not None:
+        return await facetas.contar_valor(db, "ano", ano)
+
+    stmt = select(func.count()).select_from(Documento)
+    if q and busca.usa_postgres(db):
+        filters.append(busca.filtro_texto(q))
+    elif q:
+        await busca.indice.garantir_carregado(db)
+        filters.append(Documento.id.in_(busca.indice.buscar(q)))
+    if filters:
+        stmt = stmt.where(and_(*filters))
+    result = await db.execute(stmt)
+    return result.scalar()
+
+async def _search_documentos_indice(
+    db: AsyncSession, q: str, filters: list, skip: int, limit: int
+) -> list[Row]:
+    # fallback sem Postgres: candidatos e pontuação vêm do índice em memória
+    await busca.indice.garantir_carregado(db)
+    pontuacao = busca.indice.buscar(q)
+    if not pontuacao:
+        return []
+    stmt = select(*COLUNAS_METADADOS, _SEM_TRECHO).where(Documento.id.in_(pontuacao), *filters)
+    result = await db.execute(stmt)
+    docs = sorted(
+        result.all(),
+        key=lambda d: (pontuacao[d.id], d.published_at, d.id),
+        reverse=True,
+    )
+    return docs[skip:skip + limit]
+
+# Versões com cache (app.cache) das consultas que a página inicial do portal
+# repete o tempo todo. Guardam DocumentoResponse, que pode ser compartilhado
+# entre requisições e é serializado sem nova validação.
+
+_ADAPTADOR_DOCUMENTO = TypeAdapter(DocumentoResponse)
+_ADAPTADOR_LISTA = TypeAdapter(list[DocumentoResponse])
+_ADAPTADOR_TOTAL = TypeAdapter(int)
+_ADAPTADOR_FACETAS = TypeAdapter(FacetasResponse)
+
+@dataclass(frozen=True)
+class InfoDownload:
+    id: int
+    blob_key: str | None
+    tamanho: int | None
+    sha256: str | None
+    published_at: datetime | None
+
+_ADAPTADOR_DOWNLOAD = TypeAdapter(InfoDownload)
+
+async def get_documento_cacheado(db: AsyncSession, documento_id: int) -> DocumentoResponse | None:
+    async def carregar():
+        doc = await get_documento(db, documento_id)
+        return DocumentoResponse.model_validate(doc) if doc else None
+    return await cache.documentos.obter(
+        f"doc:{documento_id}", carregar, _ADAPTADOR_DOCUMENTO, escopo=f"documento:{documento_id}"
+    )
+
+async def get_documento_download_cacheado(db: AsyncSession, documento_id: int) -> InfoDownload | None:
+    # downloads simultâneos do mesmo documento fazem uma única consulta; o PDF
+    # em si fica em app.cache_blobs
+    async def carregar():
+        info = await get_documento_download(db, documento_id)
+        return _ADAPTADOR_DOWNLOAD.validate_python(dict(info._mapping)) if info else None
+    return await cache.documentos.obter(
+        f"download:{documento_id}", carregar, _ADAPTADOR_DOWNLOAD, escopo=f"documento:{documento_id}"
+    )
 
-async def update_documento(db: AsyncSession, documento_id: int, doc_in: DocumentoCreate) -> Documento | None:
-    doc = await get_documento(db, documento_id)
+async def list_recent_cacheado(db: AsyncSession, limit: int) -> list[DocumentoResponse]:
+    async def carregar():
+        return _ADAPTADOR_LISTA.validate_python(como_dicts(await list_recent(db, limit)))
+    return await cache.documentos.obter(f"recentes:{limit}", carregar, _ADAPTADOR_LISTA, escopo="listagens")
+
+async def list_documentos_cacheado(
+    db: AsyncSession, skip: int, limit: int, cursor: str | None = None
+) -> list[DocumentoResponse] | list[Row]:
+    # só as primeiras páginas; crawlers paginando o acervo não poluem o cache
+    if cursor or skip + limit > config.CACHE_LISTA_MAXIMO:
+        return await list_documentos(db, skip, limit, cursor)
+    async def carregar():
+        return _ADAPTADOR_LISTA.validate_python(como_dicts(await list_documentos(db, skip, limit)))
+    return await cache.documentos.obter(f"lista:{skip}:{limit}", carregar, _ADAPTADOR_LISTA, escopo="listagens")
+
+async def total_documentos_cacheado(db: AsyncSession) -> int:
+    return await cache.documentos.obter("total", lambda: facetas.total_documentos(db), _ADAPTADOR_TOTAL)
+
+async def contar_facetas_cacheado(db: AsyncSession, nomes: tuple[str, ...], limite: int) -> FacetasResponse:
+    async def carregar():
+        contagens = await facetas.contar(db, nomes, limite)
+        return FacetasResponse(
+            total=await facetas.total_documentos(db),
+            facetas={
+                nome: [{"valor": valor, "total": total} for valor, total in valores]
+                for nome, valores in contagens.items()
+            },
+        )
+    chave = f"facetas:{','.join(nomes)}:{limite}"
+    return await cache.documentos.obter(chave, carregar, _ADAPTADOR_FACETAS)
+
+async def update_documento(db: AsyncSession, documento_id: int, doc_in: DocumentoCreate) -> Row | None:
+    # A CTE lê os valores antigos das facetas travando a linha (FOR UPDATE no
+    # Postgres), para o ajuste das contagens corresponder exatamente ao que o
+    # UPDATE trocou.
+    antigo = (
+        select(Documento.id, *facetas.COLUNAS)
+        .where(Documento.id == documento_id)
+        .with_for_update()
+        .cte("antigo")
+        .prefix_with("MATERIALIZED")
+    )
+    q = (
+        update(Documento)
+        .where(Documento.id.in_(select(antigo.c.id)))
+        .values(**doc_in.model_dump())
+        .execution_options(synchronize_session=False)
+    )
+    if busca.usa_postgres(db):
+        # um statement só: o UPDATE e o ajuste das facetas são CTEs de escrita
+        novo = q.returning(*COLUNAS_METADADOS).cte("novo")
+        doc = (await db.execute(select(*novo.c).add_cte(
+            antigo, facetas.ajuste_em_cte(removidos=antigo, adicionados=novo).cte("ajuste_facetas"),
+        ))).first()
+    else:
+        # O SQLite não tem CTEs de escrita: o RETURNING devolve antigos e
+        # novos e o ajuste vai à parte. A CTE é MATERIALIZED e usada no WHERE,
+        # então é avaliada antes da escrita e lê-la no RETURNING dá os valores
+        # de antes (as tabelas de UPDATE ... FROM não podem ir no RETURNING).
+        q = q.add_cte(antigo).returning(*COLUNAS_METADADOS, *(
+            select(antigo.c[faceta]).scalar_subquery().label(f"antigo_{faceta}") for faceta in facetas.FACETAS
+        ))
+        doc = (await db.execute(q)).first()
+        if doc:
+            removido = SimpleNamespace(**{faceta: getattr(doc, f"antigo_{faceta}") for faceta in facetas.FACETAS})
+            await facetas.ajustar(db, removidos=[removido], adicionados=[doc])
+    await db.commit()
     if not doc:
         return None
-    for field, value in doc_in.model_dump(by_alias=True).items():
-        setattr(doc, field, value)
-    await db.commit()
-    await db.refresh(doc)
+    busca.indice.atualizar(doc.id, doc._mapping)
+    await cache.documentos.invalidar()
+    cache_blobs.blobs.invalidar(cache_blobs.chave_legado(documento_id))
     return doc
 
-async def delete_documento(db: AsyncSession, documento_id: int) -> Documento | None:
-    doc = await get_documento(db, documento_id)
+async def delete_documento(db: AsyncSession, documento_id: int) -> Row | None:
+    retorno = [*COLUNAS_METADADOS, Documento.blob_key]
+    if busca.usa_postgres(db):
+        # o próprio DELETE informa se outro documento ainda usa o mesmo blob
+        # (o SQLite não aceita a subconsulta correlacionada no RETURNING)
+        outro = aliased(Documento)
+        retorno.append(
+            select(func.count())
+            .where(outro.blob_key == Documento.blob_key, outro.id != Documento.id)
+            .scalar_subquery()
+            .label("outras_referencias")
+        )
+    q = (
+        delete(Documento)
+        .where(Documento.id == documento_id)
+        .returning(*retorno)
+        .execution_options(synchronize_session=False)
+    )
+    # documento_texto sai pelo ON DELETE CASCADE
+    if busca.usa_postgres(db):
+        # um statement só: o ajuste das facetas é uma CTE de escrita
+        removido = q.cte("removido")
+        doc = (await db.execute(select(*removido.c).add_cte(
+            facetas.ajuste_em_cte(removidos=removido).cte("ajuste_facetas"),
+        ))).first()
+    else:
+        doc = (await db.execute(q)).first()
+        if doc:
+            await facetas.ajustar(db, removidos=[doc])
+    await db.commit()
     if not doc:
         return None
-    await db.delete(doc)
-    await db.commit()
+    busca.indice.descartar(doc.id)
+    await cache.documentos.invalidar()
+    cache_blobs.blobs.invalidar(cache_blobs.chave_legado(doc.id))
+    if doc.blob_key:
+        cache_blobs.blobs.invalidar(doc.blob_key)
+        # com outra referência já no RETURNING do DELETE não há o que apagar;
+        # sem ela, a contagem é refeita com a trava do blob
+        if not getattr(doc, "outras_referencias", 0):
+            await remover_blob_sem_referencia(db, doc.blob_key)
     return doc
 
+async def atualizar_processamento(
+    db: AsyncSession, documento_id: int, status: str, contagem_passagens: int | None = None
+) -> None:
+    # usado pelo app.worker; a contagem de páginas só preenche o campo se o
+    # documento ainda não tem uma informada no upload
+    valores = {"status": status}
+    if contagem_passagens is not None:
+        valores["contagem_passagens"] = func.coalesce(Documento.contagem_passagens, contagem_passagens)
+    await db.execute(
+        update(Documento)
+        .where(Documento.id == documento_id)
+        .values(**valores)
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    # status e contagem de páginas não mudam facetas nem o total: só o
+    # próprio documento e as listagens que o mostram
+    await cache.documentos.invalidar(f"documento:{documento_id}", "listagens")
+
+# ------------------------
+# Travas por blob
+# ------------------------
+
+# Blobs são deduplicados e apagados quando sai o último documento que os usa:
+# um upload que achou o blob já gravado (e descartou a própria cópia) não pode
+# gravar a linha entre a contagem de referências de uma remoção e o unlink.
+# Os dois lados se serializam pela chave do blob: no Postgres com
+# pg_advisory_xact_lock, solta no commit/rollback; no SQLite, um processo só,
+# com uma trava do processo. Com a trava, quem grava confere que o blob ainda
+# existe antes do commit, e quem remove conta as referências e apaga.
+
+_trava_sqlite = asyncio.Lock()
+
+
+class BlobRemovido(Exception):
+    # o blob foi apagado por uma remoção concorrente depois de o upload
+    # deduplicar contra ele: o conteúdo precisa ser enviado de novo
+    pass
+
+
+def blobs_serializados(db: AsyncSession):
+    return nullcontext() if busca.usa_postgres(db) else _trava_sqlite
+
+
+def _trava_blobs(chaves: list[str]):
+    # uma trava por chave, sempre na mesma ordem (dois lotes com chaves em
+    # comum não se travam mutuamente)
+    chave = func.unnest(
+        bindparam("chaves_trava", sorted(set(chaves)), type_=postgresql.ARRAY(String))
+    ).column_valued("chave")
+    return select(func.pg_advisory_xact_lock(func.hashtext(chave)).label("trava"))
+
+
+async def travar_blobs(db: AsyncSession, chaves: list[str]) -> None:
+    # no Postgres, trava as chaves até o fim da transação; no SQLite quem
+    # chama já está dentro de blobs_serializados
+    if busca.usa_postgres(db) and chaves:
+        await db.execute(_trava_blobs(chaves))
+
+
+async def remover_blob_sem_referencia(db: AsyncSession, blob_key: str) -> None:
+    # blobs são deduplicados: só apaga se nenhum outro documento usa o mesmo conteúdo
+    async with blobs_serializados(db):
+        await travar_blobs(db, [blob_key])
+        result = await db.execute(select(func.count()).where(Documento.blob_key == blob_key))
+        if result.scalar() == 0:
+            await get_blob_store().remover(blob_key)
+        await db.commit()
+
 # ------------------------
 # CRUD de Usuario
 # ------------------------
@@ -119,37 +629,71 @@ async def get_usuario_por_email(db: AsyncSession, email: str) -> Usuario | None:
     result = await db.execute(select(Usuario).where(Usuario.email == email))
     return result.scalars().first()
 
+async def autenticar_usuario(db: AsyncSession, email: str, senha: str) -> Usuario | None:
+    user = await get_usuario_por_email(db, email)
+    if not await verificar_senha(senha, user.senha_hash if user else None):
+        return None
+    return user
+
 async def list_usuarios(db: AsyncSession, skip: int = 0, limit: int = 100) -> list[Usuario]:
     result = await db.execute(select(Usuario).offset(skip).limit(limit))
     return result.scalars().all()
 
-async def create_usuario(db: AsyncSession, usuario_in: UsuarioCreate) -> Usuario:
-    hashed_pwd = pwd_context.hash(usuario_in.senha)
-    db_user = Usuario(
-        nome       = usuario_in.nome,
-        email      = usuario_in.email,
-        senha_hash = hashed_pwd,
-        tipo       = "user"
+def _insert(db: AsyncSession, tabela):
+    # INSERT com suporte a ON CONFLICT do dialeto em uso
+    dialeto = postgresql if db.bind.dialect.name == "postgresql" else sqlite
+    return dialeto.insert(tabela)
+
+async def create_usuario(db: AsyncSession, usuario_in: UsuarioCreate) -> Row | None:
+    # Retorna None se o e-mail já existe. O ON CONFLICT substitui a consulta
+    # prévia por e-mail e elimina a corrida entre dois cadastros simultâneos.
+    # bcrypt roda no pool de app.seguranca, fora do event loop
+    hashed_pwd = await gerar_hash(usuario_in.senha)
+    q = (
+        _insert(db, Usuario)
+        .values(
+            nome       = usuario_in.nome,
+            email      = usuario_in.email,
+            senha_hash = hashed_pwd,
+            tipo       = "user",
+            datacad    = datetime.utcnow(),
+        )
+        .on_conflict_do_nothing(index_elements=[Usuario.email])
+        .returning(*COLUNAS_USUARIO)
     )
-    db.add(db_user)
+    user = (await db.execute(q)).first()
     await db.commit()
-    await db.refresh(db_user)
-    return db_user
+    return user
 
-async def update_usuario(db: AsyncSession, usuario_id: int, usuario_in: UsuarioUpdate) -> Usuario | None:
-    user = await get_usuario(db, usuario_id)
+async def update_usuario(db: AsyncSession, usuario_id: int, usuario_in: UsuarioUpdate) -> Row | None:
+    valores = usuario_in.model_dump(exclude_unset=True)
+    if not valores:
+        return await get_usuario(db, usuario_id)
+    q = (
+        update(Usuario)
+        .where(Usuario.id == usuario_id)
+        .values(**valores)
+        .returning(*COLUNAS_USUARIO)
+        .execution_options(synchronize_session=False)
+    )
+    user = (await db.execute(q)).first()
+    await db.commit()
     if not user:
         return None
-    for field, value in usuario_in.model_dump(exclude_unset=True).items():
-        setattr(user, field, value)
-    await db.commit()
-    await db.refresh(user)
+    # tokens emitidos antes da alteração (ex.: mudança de tipo) deixam de valer
+    await revogacoes.revogar(user.id)
     return user
 
-async def delete_usuario(db: AsyncSession, usuario_id: int) -> Usuario | None:
-    user = await get_usuario(db, usuario_id)
+async def delete_usuario(db: AsyncSession, usuario_id: int) -> Row | None:
+    q = (
+        delete(Usuario)
+        .where(Usuario.id == usuario_id)
+        .returning(*COLUNAS_USUARIO)
+        .execution_options(synchronize_session=False)
+    )
+    user = (await db.execute(q)).first()
+    await db.commit()
     if not user:
         return None
-    await db.delete(user)
-    await db.commit()
+    await revogacoes.revogar(user.id)
     return user
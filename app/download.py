@@ -0,0 +1,177 @@
+# app/download.py
+#
+# Montagem da resposta de download: streaming em blocos, Range/206,
+# ETag/If-None-Match e Last-Modified/If-Modified-Since.
+
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import AsyncIterator, Callable
+
+from fastapi import Request, Response
+from fastapi.responses import StreamingResponse
+
+# tamanho de cada leitura feita no armazenamento
+TAMANHO_BLOCO = 256 * 1024
+
+LeitorArquivo = Callable[[int, int], AsyncIterator[bytes]]
+
+# extensão ASGI para envio com sendfile(), quando o servidor oferece
+EXTENSAO_ZEROCOPY = "http.response.zerocopy"
+
+
+class RespostaArquivo(StreamingResponse):
+    # Para blobs em disco local: usa a extensão zerocopy do servidor ASGI se
+    # disponível e, senão, cai no streaming em blocos normal.
+
+    def __init__(self, caminho: str, inicio: int, fim: int, ler: LeitorArquivo, **kwargs):
+        super().__init__(ler(inicio, fim), **kwargs)
+        self.caminho = caminho
+        self.inicio = inicio
+        self.fim = fim
+
+    async def __call__(self, scope, receive, send):
+        if EXTENSAO_ZEROCOPY not in scope.get("extensions", {}):
+            await super().__call__(scope, receive, send)
+            return
+        await self.body_iterator.aclose()
+        await send({
+            "type": "http.response.start",
+            "status": self.status_code,
+            "headers": self.raw_headers,
+        })
+        with open(self.caminho, "rb") as arquivo:
+            await send({
+                "type": EXTENSAO_ZEROCOPY,
+                "file": arquivo,
+                "offset": self.inicio,
+                "count": self.fim - self.inicio + 1,
+                "more_body": False,
+            })
+
+
+class IntervaloInvalido(Exception):
+    pass
+
+
+def parse_range(valor: str | None, tamanho: int) -> tuple[int, int] | None:
+    # Retorna (inicio, fim) inclusivo ou None quando o cabeçalho deve ser ignorado.
+    # Só um intervalo é suportado; pedidos com vários são servidos inteiros (RFC 9110 permite).
+    if not valor or not valor.startswith("bytes=") or "," in valor:
+        return None
+    inicio_txt, sep, fim_txt = valor[6:].strip().partition("-")
+    if not sep:
+        return None
+    try:
+        if inicio_txt == "":
+            # sufixo: "bytes=-500" são os últimos 500 bytes
+            sufixo = int(fim_txt)
+            if sufixo <= 0:
+                raise IntervaloInvalido(valor)
+            return max(tamanho - sufixo, 0), tamanho - 1
+        inicio = int(inicio_txt)
+        fim = int(fim_txt) if fim_txt else tamanho - 1
+    except ValueError:
+        return None
+    if inicio >= tamanho:
+        raise IntervaloInvalido(valor)
+    if inicio > fim:
+        return None
+    return inicio, min(fim, tamanho - 1)
+
+
+def gerar_etag(sha256: str | None) -> str | None:
+    return f'"{sha256}"' if sha256 else None
+
+
+def _utc(dt: datetime) -> datetime:
+    # published_at é gravado com datetime.utcnow(), sem fuso
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(timezone.utc).replace(microsecond=0)
+
+
+def _etag_confere(cabecalho: str, etag: str) -> bool:
+    if cabecalho.strip() == "*":
+        return True
+    etags = [e.strip().removeprefix("W/") for e in cabecalho.split(",")]
+    return etag in etags
+
+
+def _nao_modificado(request: Request, etag: str | None, modificado: datetime | None) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return etag is not None and _etag_confere(if_none_match, etag)
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and modificado is not None:
+        try:
+            return modificado <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def _range_aplicavel(request: Request, etag: str | None, modificado: datetime | None) -> bool:
+    if_range = request.headers.get("if-range")
+    if not if_range:
+        return True
+    if if_range.startswith('"'):
+        return etag is not None and if_range == etag
+    try:
+        return modificado is not None and modificado == parsedate_to_datetime(if_range)
+    except (TypeError, ValueError):
+        return False
+
+
+def responder_download(
+    request: Request,
+    tamanho: int,
+    sha256: str | None,
+    published_at: datetime | None,
+    ler: LeitorArquivo,
+    filename: str,
+    caminho: str | None = None,
+) -> Response:
+    etag = gerar_etag(sha256)
+    modificado = _utc(published_at) if published_at else None
+
+    headers = {
+        "Accept-Ranges": "bytes",
+        "Content-Disposition": f"attachment; filename=\"{filename}\"",
+    }
+    if etag:
+        headers["ETag"] = etag
+    if modificado:
+        headers["Last-Modified"] = format_datetime(modificado, usegmt=True)
+
+    if _nao_modificado(request, etag, modificado):
+        return Response(status_code=304, headers=headers)
+
+    intervalo = None
+    if _range_aplicavel(request, etag, modificado):
+        try:
+            intervalo = parse_range(request.headers.get("range"), tamanho)
+        except IntervaloInvalido:
+            headers["Content-Range"] = f"bytes */{tamanho}"
+            return Response(status_code=416, headers=headers)
+
+    if intervalo is None:
+        inicio, fim, status_code = 0, tamanho - 1, 200
+    else:
+        inicio, fim = intervalo
+        status_code = 206
+        headers["Content-Range"] = f"bytes {inicio}-{fim}/{tamanho}"
+    headers["Content-Length"] = str(fim - inicio + 1)
+
+    if caminho is not None:
+        return RespostaArquivo(
+            caminho, inicio, fim, ler,
+            status_code=status_code,
+            media_type="application/pdf",
+            headers=headers,
+        )
+    return StreamingResponse(
+        ler(inicio, fim),
+        status_code=status_code,
+        media_type="application/pdf",
+        headers=headers,
+    )
@@ -0,0 +1,65 @@
+# app/exportacao.py
+#
+# Exportação dos metadados do acervo inteiro (/documentos/export) em NDJSON ou
+# CSV. As linhas vêm de um cursor no servidor (crud.stream_metadados), em
+# partições, e são escritas direto na resposta, com gzip opcional: a memória
+# usada não depende do tamanho da tabela.
+
+import csv
+import io
+import json
+import zlib
+from datetime import datetime
+from typing import AsyncIterator
+
+from . import crud
+
+CAMPOS = [coluna.key for coluna in crud.COLUNAS_METADADOS]
+
+TIPOS_CONTEUDO = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+
+def _json_padrao(valor):
+    if isinstance(valor, datetime):
+        return valor.isoformat()
+    raise TypeError(type(valor).__name__)
+
+
+def _ndjson(linhas) -> bytes:
+    return "".join(
+        json.dumps(dict(zip(CAMPOS, linha)), default=_json_padrao, ensure_ascii=False) + "\n"
+        for linha in linhas
+    ).encode()
+
+
+def _csv(linhas, cabecalho: bool = False) -> bytes:
+    saida = io.StringIO()
+    escritor = csv.writer(saida)
+    if cabecalho:
+        escritor.writerow(CAMPOS)
+    escritor.writerows(
+        [v.isoformat() if isinstance(v, datetime) else v for v in linha] for linha in linhas
+    )
+    return saida.getvalue().encode()
+
+
+async def exportar(
+    formato: str, since: datetime | None = None, comprimir: bool = False, since_id: int | None = None
+) -> AsyncIterator[bytes]:
+    gzip = zlib.compressobj(wbits=31) if comprimir else None
+
+    def saida(dados: bytes) -> bytes:
+        return gzip.compress(dados) if gzip else dados
+
+    if formato == "csv":
+        yield saida(_csv([], cabecalho=True))
+    async for particao in crud.stream_metadados(since, since_id=since_id):
+        bloco = _csv(particao) if formato == "csv" else _ndjson(particao)
+        dados = saida(bloco)
+        if dados:
+            yield dados
+    if gzip:
+        yield gzip.flush()
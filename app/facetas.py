@@ -0,0 +1,149 @@
+# app/facetas.py
+#
+# Contagens de documentos por ano, departamento, orientador e grupo de
+# instrução (/documentos/facetas) e o total para X-Total-Count.
+#
+# As contagens ficam pré-agregadas em documentos_facetas, ajustadas na mesma
+# transação de cada INSERT/UPDATE/DELETE de documento (crud, app.lote) com um
+# upsert "total = total + delta" (no Postgres, ajuste_em_cte faz o mesmo
+# dentro do próprio statement do documento). Consultar as facetas lê só essa tabela,
+# nunca documentos. Valores nulos não entram. `recalcular` refaz tudo a partir
+# de documentos e roda em python -m app.migracoes.
+
+from collections import Counter
+from typing import Iterable
+
+from sqlalchemy import and_, cast, func, literal, select, text, union_all
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Row
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+
+from .models import Documento, FacetaDocumento
+
+FACETAS = {
+    "ano": Documento.ano,
+    "departamento": Documento.departamento,
+    "orientador": Documento.orientador,
+    "grupo_instrucao": Documento.grupo_instrucao,
+}
+
+COLUNAS = tuple(FACETAS.values())
+
+
+def _deltas(removidos: Iterable[Row], adicionados: Iterable[Row]) -> Counter:
+    deltas = Counter()
+    for sinal, linhas in ((-1, removidos), (1, adicionados)):
+        for linha in linhas:
+            for faceta in FACETAS:
+                valor = getattr(linha, faceta)
+                if valor is not None:
+                    deltas[(faceta, str(valor))] += sinal
+    return deltas
+
+
+async def ajustar(db: AsyncSession, removidos: Iterable[Row] = (), adicionados: Iterable[Row] = ()) -> None:
+    # Recebe as linhas (com as colunas de FACETAS) que saíram e entraram.
+    # Não faz commit: roda dentro da transação da escrita do documento.
+    deltas = {chave: delta for chave, delta in _deltas(removidos, adicionados).items() if delta}
+    if not deltas:
+        return
+    dialeto = postgresql if db.bind.dialect.name == "postgresql" else sqlite
+    q = dialeto.insert(FacetaDocumento)
+    q = q.on_conflict_do_update(
+        index_elements=[FacetaDocumento.faceta, FacetaDocumento.valor],
+        set_={"total": FacetaDocumento.total + q.excluded.total},
+    )
+    # sempre na mesma ordem, para duas transações concorrentes não travarem
+    # uma à outra esperando as mesmas linhas
+    linhas = [
+        {"faceta": faceta, "valor": valor, "total": delta}
+        for (faceta, valor), delta in sorted(deltas.items())
+    ]
+    await db.execute(q, linhas)
+
+
+def ajuste_em_cte(removidos=None, adicionados=None):
+    # O mesmo ajuste de `ajustar`, só para o Postgres, como INSERT ... SELECT
+    # sobre CTEs com as colunas de FACETAS (as linhas que saíram e as que
+    # entraram). Vira uma CTE de escrita do INSERT/UPDATE/DELETE do documento:
+    # o ajuste vai ao banco no mesmo statement.
+    deltas = union_all(*(
+        select(
+            literal(faceta).label("faceta"),
+            cast(linhas.c[faceta], FacetaDocumento.valor.type).label("valor"),
+            literal(sinal).label("delta"),
+        ).where(linhas.c[faceta].is_not(None))
+        for sinal, linhas in ((-1, removidos), (1, adicionados)) if linhas is not None
+        for faceta in FACETAS
+    )).subquery("deltas")
+    soma = func.sum(deltas.c.delta)
+    q = postgresql.insert(FacetaDocumento).from_select(
+        ["faceta", "valor", "total"],
+        # mesma ordem de `ajustar`, pelo mesmo motivo
+        select(deltas.c.faceta, deltas.c.valor, soma)
+        .group_by(deltas.c.faceta, deltas.c.valor)
+        .having(soma != 0)
+        .order_by(deltas.c.faceta, deltas.c.valor),
+    )
+    return q.on_conflict_do_update(
+        index_elements=[FacetaDocumento.faceta, FacetaDocumento.valor],
+        set_={"total": FacetaDocumento.total + q.excluded.total},
+    )
+
+
+async def contar(db: AsyncSession, facetas: Iterable[str], limite: int) -> dict[str, list[tuple[str, int]]]:
+    # os `limite` valores mais frequentes de cada faceta, numa consulta só
+    posicao = func.row_number().over(
+        partition_by=FacetaDocumento.faceta,
+        order_by=(FacetaDocumento.total.desc(), FacetaDocumento.valor),
+    ).label("posicao")
+    ranking = (
+        select(FacetaDocumento.faceta, FacetaDocumento.valor, FacetaDocumento.total, posicao)
+        .where(FacetaDocumento.faceta.in_(list(facetas)), FacetaDocumento.total > 0)
+        .subquery()
+    )
+    result = await db.execute(
+        select(ranking.c.faceta, ranking.c.valor, ranking.c.total)
+        .where(ranking.c.posicao <= limite)
+        .order_by(ranking.c.faceta, ranking.c.posicao)
+    )
+    contagens = {faceta: [] for faceta in facetas}
+    for faceta, valor, total in result:
+        contagens[faceta].append((valor, total))
+    return contagens
+
+
+async def contar_valor(db: AsyncSession, faceta: str, valor) -> int:
+    result = await db.execute(
+        select(FacetaDocumento.total)
+        .where(and_(FacetaDocumento.faceta == faceta, FacetaDocumento.valor == str(valor)))
+    )
+    return result.scalar() or 0
+
+
+async def total_documentos(db: AsyncSession) -> int:
+    # No Postgres, a estimativa do planner (pg_class.reltuples, atualizada pelo
+    # autovacuum/ANALYZE) evita o count(*) que varre a tabela inteira. Tabela
+    # nunca analisada (reltuples = -1) cai no count(*).
+    if db.bind.dialect.name == "postgresql":
+        result = await db.execute(text(
+            "SELECT reltuples::bigint FROM pg_class WHERE oid = 'documentos'::regclass"
+        ))
+        estimativa = result.scalar()
+        if estimativa is not None and estimativa >= 0:
+            return estimativa
+    result = await db.execute(select(func.count()).select_from(Documento))
+    return result.scalar()
+
+
+async def recalcular(conn: AsyncConnection) -> None:
+    agregados = union_all(*(
+        select(literal(faceta), cast(coluna, FacetaDocumento.valor.type), func.count())
+        .where(coluna.is_not(None))
+        .group_by(coluna)
+        for faceta, coluna in FACETAS.items()
+    ))
+    await conn.execute(FacetaDocumento.__table__.delete())
+    await conn.execute(
+        FacetaDocumento.__table__.insert().from_select(["faceta", "valor", "total"], agregados)
+    )
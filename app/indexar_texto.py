@@ -0,0 +1,142 @@
+# app/indexar_texto.py
+#
+# Backfill do texto dos PDFs já existentes em documento_texto, para a busca
+# por conteúdo (/documentos/buscar?conteudo=). Os documentos novos são
+# indexados pelo app.worker; este comando cobre o acervo anterior.
+#
+# Os PDFs são processados em lotes num pool de processos (a extração é CPU
+# pura) e cada lote é gravado numa transação. Cada lote gravado é um
+# checkpoint: um documento com linha em documento_texto não é processado de
+# novo, então o comando pode ser interrompido e executado outra vez. Ao
+# final, informa páginas por segundo e páginas por segundo por núcleo (tempo
+# de CPU dos processos filhos), para dimensionar JOBS_PROCESSOS.
+#
+# Os PDFs do S3 e das linhas legadas são lidos inteiros para a memória do
+# processo pai; dentro de cada lote eles são extraídos em grupos de no
+# máximo --memoria bytes (um PDF maior que isso vai sozinho). Os do BlobStore
+# local são lidos do disco pelos processos filhos e não contam. Um PDF que
+# não pôde ser lido (NoSuchKey no S3, por exemplo) fica registrado com o erro
+# em documento_texto, como os que o pypdf não abre, e o backfill segue.
+#
+# Uso: python -m app.indexar_texto [--lote 32] [--processos N] [--memoria BYTES]
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from sqlalchemy import exists, func
+from sqlalchemy.future import select
+
+from . import config, crud, processamento
+from .database import AsyncSessionLocal
+from .models import Documento, DocumentoTexto
+from .storage import get_blob_store
+
+MEMORIA_PADRAO = 256 * 1024 * 1024
+
+
+def _bytes_em_memoria(linha) -> int:
+    # o que crud.origem_pdf lê para o processo pai (0 se o filho lê do disco)
+    if linha.blob_key and get_blob_store().caminho_local(linha.blob_key):
+        return 0
+    return linha.tamanho or 0
+
+
+def _grupos(linhas: list, memoria: int) -> list[list]:
+    # linhas consecutivas cujos PDFs em memória somam até `memoria` bytes
+    grupos, atual, em_uso = [], [], 0
+    for linha in linhas:
+        tamanho = _bytes_em_memoria(linha)
+        if atual and em_uso + tamanho > memoria:
+            grupos.append(atual)
+            atual, em_uso = [], 0
+        atual.append(linha)
+        em_uso += tamanho
+    if atual:
+        grupos.append(atual)
+    return grupos
+
+
+async def _analisar(executor, linha) -> dict:
+    try:
+        origem = await crud.origem_pdf(linha)
+        return await asyncio.get_running_loop().run_in_executor(
+            executor, processamento.analisar_pdf, origem, config.TEXTO_MAXIMO
+        )
+    except Exception as exc:
+        # arquivo ausente no BlobStore, por exemplo
+        return {"texto": None, "paginas": None, "erro": repr(exc)[:2000], "cpu_s": 0.0}
+
+
+async def indexar(lote: int = 32, processos: int | None = None, memoria: int = MEMORIA_PADRAO) -> dict:
+    processos = processos or os.cpu_count() or 1
+    executor = ProcessPoolExecutor(max_workers=processos, mp_context=multiprocessing.get_context("spawn"))
+    totais = {"documentos": 0, "paginas": 0, "erros": 0, "cpu_s": 0.0}
+    inicio = time.perf_counter()
+    ultimo_id = 0
+    try:
+        while True:
+            async with AsyncSessionLocal() as db:
+                result = await db.execute(
+                    select(
+                        Documento.id,
+                        Documento.blob_key,
+                        func.coalesce(Documento.tamanho, func.length(Documento.arquivo_tcc)).label("tamanho"),
+                    )
+                    .where(
+                        Documento.id > ultimo_id,
+                        ~exists().where(DocumentoTexto.documento_id == Documento.id),
+                        Documento.blob_key.is_not(None) | Documento.arquivo_tcc.is_not(None),
+                    )
+                    .order_by(Documento.id)
+                    .limit(lote)
+                )
+                linhas = result.all()
+                if not linhas:
+                    break
+
+                analises = []
+                for grupo in _grupos(linhas, memoria):
+                    analises += await asyncio.gather(*(_analisar(executor, linha) for linha in grupo))
+
+                for linha, analise in zip(linhas, analises):
+                    if analise["texto"] is None and not analise["erro"]:
+                        raise SystemExit("pypdf não está instalado: pip install pypdf")
+                    await crud.salvar_texto_documento(db, linha.id, analise)
+                    totais["documentos"] += 1
+                    totais["paginas"] += analise["paginas"] or 0
+                    totais["erros"] += bool(analise["erro"])
+                    totais["cpu_s"] += analise["cpu_s"]
+                await db.commit()
+                ultimo_id = linhas[-1].id
+                print(json.dumps(_relatorio(totais, inicio, processos), ensure_ascii=False), flush=True)
+    finally:
+        executor.shutdown(cancel_futures=True)
+    return _relatorio(totais, inicio, processos)
+
+
+def _relatorio(totais: dict, inicio: float, processos: int) -> dict:
+    duracao = time.perf_counter() - inicio
+    return {
+        **totais,
+        "cpu_s": round(totais["cpu_s"], 2),
+        "duracao_s": round(duracao, 2),
+        "processos": processos,
+        "paginas_por_segundo": round(totais["paginas"] / duracao, 1) if duracao else None,
+        "paginas_por_segundo_por_nucleo": round(totais["paginas"] / totais["cpu_s"], 1) if totais["cpu_s"] else None,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Extrai o texto dos PDFs ainda não indexados.")
+    parser.add_argument("--lote", type=int, default=32, help="documentos por lote/transação")
+    parser.add_argument("--processos", type=int, default=None, help="processos de extração (padrão: núcleos)")
+    parser.add_argument("--memoria", type=int, default=MEMORIA_PADRAO,
+                        help="bytes de PDF em memória ao mesmo tempo (S3 e linhas legadas)")
+    args = parser.parse_args()
+    resultado = asyncio.run(indexar(args.lote, args.processos, args.memoria))
+    print(json.dumps(resultado, ensure_ascii=False))
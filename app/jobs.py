@@ -0,0 +1,162 @@
+# app/jobs.py
+#
+# Fila durável de tarefas em segundo plano, na tabela jobs.
+#
+# enfileirar() grava o job na mesma transação da escrita que o originou (o
+# upload, por exemplo): não existe documento sem job nem job de documento que
+# não chegou a ser gravado. Os workers (app.worker) reservam jobs com um
+# UPDATE ... RETURNING sobre SELECT ... FOR UPDATE SKIP LOCKED, então vários
+# processos consomem a mesma fila sem pegar o mesmo job. No SQLite, onde as
+# escritas já são serializadas, o FOR UPDATE é omitido pelo próprio dialeto.
+#
+# Um job reservado fica "travado" por JOBS_PRAZO segundos; se o worker morrer
+# no meio, o job volta a ser elegível quando o prazo vence.
+#
+# Jobs terminados não são mais lidos pela fila; limpar() apaga os que
+# passaram de JOBS_RETENCAO_DIAS, chamado periodicamente pelo worker.
+
+import random
+from datetime import datetime, timedelta
+from typing import Callable, Iterable
+
+from sqlalchemy import and_, delete, func, insert, literal, or_, select, update
+from sqlalchemy.engine import Row
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import config
+from .models import Job
+
+PENDENTE, PROCESSANDO, CONCLUIDO, FALHOU = "pendente", "processando", "concluido", "falhou"
+
+# chamados depois do commit de novos jobs, para o worker da própria API não
+# esperar JOBS_INTERVALO até a próxima consulta
+_ouvintes: list[Callable[[], None]] = []
+
+
+def ao_enfileirar(fn: Callable[[], None]) -> None:
+    _ouvintes.append(fn)
+
+
+def avisar() -> None:
+    for fn in _ouvintes:
+        fn()
+
+
+async def enfileirar(db: AsyncSession, tipo: str, documento_ids: Iterable[int]) -> None:
+    # Não faz commit: o job entra junto com a transação de quem chamou
+    agora = datetime.utcnow()
+    linhas = [
+        {
+            "tipo": tipo,
+            "documento_id": documento_id,
+            "status": PENDENTE,
+            "tentativas": 0,
+            "max_tentativas": config.JOBS_TENTATIVAS,
+            "executar_em": agora,
+            "criado_em": agora,
+            "atualizado_em": agora,
+        }
+        for documento_id in documento_ids
+    ]
+    if linhas:
+        await db.execute(insert(Job), linhas)
+
+
+def enfileirar_em_cte(tipo: str, documentos):
+    # O INSERT de enfileirar() como INSERT ... SELECT sobre a CTE (Postgres)
+    # com os documentos que acabaram de ser gravados, no mesmo statement.
+    agora = datetime.utcnow()
+    valores = {
+        "tipo": literal(tipo),
+        "documento_id": documentos.c.id,
+        "status": literal(PENDENTE),
+        "tentativas": literal(0),
+        "max_tentativas": literal(config.JOBS_TENTATIVAS),
+        "executar_em": literal(agora, Job.executar_em.type),
+        "criado_em": literal(agora, Job.criado_em.type),
+        "atualizado_em": literal(agora, Job.atualizado_em.type),
+    }
+    return insert(Job).from_select(list(valores), select(*valores.values()))
+
+
+async def reservar(db: AsyncSession, limite: int) -> list[Row]:
+    agora = datetime.utcnow()
+    elegiveis = (
+        select(Job.id)
+        .where(or_(
+            and_(Job.status == PENDENTE, Job.executar_em <= agora),
+            and_(Job.status == PROCESSANDO, Job.travado_ate < agora),
+        ))
+        .order_by(Job.executar_em, Job.id)
+        .limit(limite)
+        .with_for_update(skip_locked=True)
+    )
+    q = (
+        update(Job)
+        .where(Job.id.in_(elegiveis.scalar_subquery()))
+        .values(
+            status        = PROCESSANDO,
+            tentativas    = Job.tentativas + 1,
+            travado_ate   = agora + timedelta(seconds=config.JOBS_PRAZO),
+            atualizado_em = agora,
+        )
+        .returning(Job.id, Job.tipo, Job.documento_id, Job.tentativas, Job.max_tentativas)
+        .execution_options(synchronize_session=False)
+    )
+    result = await db.execute(q)
+    return result.all()
+
+
+async def concluir(db: AsyncSession, job_id: int) -> None:
+    await db.execute(
+        update(Job)
+        .where(Job.id == job_id)
+        .values(status=CONCLUIDO, travado_ate=None, erro=None, atualizado_em=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+
+
+def espera(tentativas: int) -> float:
+    # exponencial com jitter, para jobs que falharam juntos não voltarem juntos
+    base = min(config.JOBS_BACKOFF_MAXIMO, config.JOBS_BACKOFF_BASE * 2 ** (tentativas - 1))
+    return base * random.uniform(0.5, 1)
+
+
+async def falhar(db: AsyncSession, job: Row, erro: str) -> bool:
+    # Devolve o job à fila com espera exponencial ou, esgotadas as tentativas,
+    # marca como falhou. Retorna True se ainda haverá nova tentativa.
+    agora = datetime.utcnow()
+    de_novo = job.tentativas < job.max_tentativas
+    valores = {"status": PENDENTE, "executar_em": agora + timedelta(seconds=espera(job.tentativas))} \
+        if de_novo else {"status": FALHOU}
+    await db.execute(
+        update(Job)
+        .where(Job.id == job.id)
+        .values(**valores, travado_ate=None, erro=erro[:2000], atualizado_em=agora)
+        .execution_options(synchronize_session=False)
+    )
+    return de_novo
+
+
+async def limpar(db: AsyncSession, antes_de: datetime, limite: int) -> int:
+    # Apaga até `limite` jobs terminados antes de `antes_de` e retorna quantos.
+    # Não faz commit: quem chama repete com transações curtas até sobrar
+    # menos que `limite`. SKIP LOCKED para dois workers limpando ao mesmo
+    # tempo não esperarem um pelo outro.
+    antigos = (
+        select(Job.id)
+        .where(Job.status.in_((CONCLUIDO, FALHOU)), Job.atualizado_em < antes_de)
+        .limit(limite)
+        .with_for_update(skip_locked=True)
+    )
+    result = await db.execute(
+        delete(Job)
+        .where(Job.id.in_(antigos.scalar_subquery()))
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount
+
+
+async def resumo(db: AsyncSession) -> dict[str, int]:
+    result = await db.execute(select(Job.status, func.count()).group_by(Job.status))
+    return {status: total for status, total in result.all()}
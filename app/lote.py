@@ -0,0 +1,372 @@
+# app/lote.py
+#
+# Importação de acervos inteiros: um ZIP ou TAR (opcionalmente comprimido)
+# com os PDFs e um manifesto (manifesto.csv ou manifesto.json) cujas colunas
+# usam os mesmos nomes de DocumentoCreate (titprinc, ano, autor_nome_curto...),
+# mais:
+#   arquivo  caminho do PDF dentro do pacote (obrigatório)
+#   chave    chave de idempotência (opcional; padrão: o próprio `arquivo`)
+#
+# As entradas são lidas em streaming direto para o BlobStore, sem extrair o
+# pacote, e os metadados entram em INSERTs executemany de até
+# `tamanho_lote` linhas por transação. Documentos cuja chave já foi importada
+# são ignorados, então um lote interrompido pode ser enviado de novo.
+# No TAR, lido sequencialmente, o manifesto precisa ser a primeira entrada.
+#
+# Uso: python -m app.lote acervo.zip [--lote 200]
+
+import argparse
+import asyncio
+import csv
+import io
+import json
+import posixpath
+import tarfile
+import time
+import zipfile
+import zlib
+from datetime import datetime
+from dataclasses import dataclass, field
+from typing import IO, Iterator
+
+from fastapi import HTTPException
+from pydantic import ValidationError
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from . import busca, cache, config, facetas, jobs
+from .crud import (
+    PROCESSAR_DOCUMENTO, STATUS_PENDENTE, blobs_serializados, remover_blob_sem_referencia, travar_blobs,
+)
+from .models import Documento
+from .schemas import DocumentoCreate
+from .storage import BlobStore, get_blob_store
+from .upload import receber_pdf
+
+NOMES_MANIFESTO = ("manifesto.csv", "manifesto.json")
+
+
+# o que a leitura de uma entrada corrompida levanta, em ZIP ou TAR
+ERROS_LEITURA = (zipfile.BadZipFile, zlib.error, tarfile.TarError, EOFError, OSError)
+
+
+class PacoteInvalido(Exception):
+    pass
+
+
+# ------------------------
+# Leitura do pacote
+# ------------------------
+
+def _ler_manifesto(nome: str, conteudo: bytes) -> list[dict]:
+    try:
+        texto = conteudo.decode("utf-8-sig")
+        if nome.endswith(".json"):
+            linhas = json.loads(texto)
+        else:
+            linhas = list(csv.DictReader(io.StringIO(texto)))
+    except UnicodeDecodeError as exc:
+        raise PacoteInvalido(f"{posixpath.basename(nome)} deve estar em UTF-8") from exc
+    except (json.JSONDecodeError, csv.Error) as exc:
+        raise PacoteInvalido(f"{posixpath.basename(nome)} inválido: {exc}") from exc
+    if not isinstance(linhas, list) or not all(isinstance(linha, dict) for linha in linhas):
+        raise PacoteInvalido("manifesto.json deve ser uma lista de objetos")
+    # no CSV, campo vazio significa ausente
+    return [{k: v for k, v in linha.items() if v not in ("", None)} for linha in linhas]
+
+
+def _eh_manifesto(nome: str) -> bool:
+    return posixpath.basename(nome) in NOMES_MANIFESTO
+
+
+class _LeitorAssincrono:
+    # read() assíncrono sobre a entrada do pacote, para reaproveitar receber_pdf
+    def __init__(self, arquivo: IO[bytes]):
+        self._arquivo = arquivo
+
+    async def read(self, size: int = -1) -> bytes:
+        return await asyncio.to_thread(self._arquivo.read, size)
+
+
+class _EntradaCorrompida:
+    def __init__(self, erro: Exception):
+        self._erro = erro
+
+    def read(self, size: int = -1) -> bytes:
+        raise self._erro
+
+
+class Pacote:
+    def manifesto(self) -> list[dict]: ...
+    def entradas(self) -> Iterator[tuple[str, IO[bytes]]]: ...
+
+
+class PacoteZip(Pacote):
+    def __init__(self, arquivo: IO[bytes]):
+        try:
+            self._zip = zipfile.ZipFile(arquivo)
+        except zipfile.BadZipFile as exc:
+            raise PacoteInvalido(f"ZIP corrompido: {exc}") from exc
+
+    def manifesto(self) -> list[dict]:
+        for nome in self._zip.namelist():
+            if _eh_manifesto(nome):
+                try:
+                    conteudo = self._zip.read(nome)
+                except (zipfile.BadZipFile, zlib.error, EOFError) as exc:
+                    raise PacoteInvalido(f"{nome} corrompido no ZIP: {exc}") from exc
+                return _ler_manifesto(nome, conteudo)
+        raise PacoteInvalido("manifesto.csv ou manifesto.json não encontrado")
+
+    def entradas(self) -> Iterator[tuple[str, IO[bytes]]]:
+        # cada entrada do ZIP é independente: um cabeçalho corrompido vira
+        # erro só daquela entrada, na leitura
+        for info in self._zip.infolist():
+            if not info.is_dir() and not _eh_manifesto(info.filename):
+                try:
+                    entrada = self._zip.open(info)
+                except ERROS_LEITURA as exc:
+                    yield info.filename, _EntradaCorrompida(exc)
+                    continue
+                with entrada:
+                    yield info.filename, entrada
+
+
+class PacoteTar(Pacote):
+    def __init__(self, arquivo: IO[bytes]):
+        # modo stream: lê o TAR uma única vez, sem seek
+        self._tar = tarfile.open(fileobj=arquivo, mode="r|*")
+        self._membros = iter(self._tar)
+        self._manifesto = None
+
+    def manifesto(self) -> list[dict]:
+        if self._manifesto is None:
+            try:
+                membro = next(self._membros, None)
+                if membro is None or not _eh_manifesto(membro.name):
+                    raise PacoteInvalido("no TAR, o manifesto precisa ser a primeira entrada")
+                conteudo = self._tar.extractfile(membro).read()
+            except (tarfile.TarError, zlib.error, EOFError, OSError) as exc:
+                raise PacoteInvalido(f"TAR corrompido: {exc}") from exc
+            self._manifesto = _ler_manifesto(membro.name, conteudo)
+        return self._manifesto
+
+    def entradas(self) -> Iterator[tuple[str, IO[bytes]]]:
+        for membro in self._membros:
+            if membro.isfile():
+                yield membro.name, self._tar.extractfile(membro)
+
+
+def abrir_pacote(arquivo: IO[bytes]) -> Pacote:
+    inicio = arquivo.read(4)
+    arquivo.seek(0)
+    if inicio.startswith(b"PK"):
+        return PacoteZip(arquivo)
+    try:
+        return PacoteTar(arquivo)
+    except tarfile.TarError as exc:
+        raise PacoteInvalido("o pacote deve ser ZIP ou TAR") from exc
+
+
+# ------------------------
+# Importação
+# ------------------------
+
+@dataclass
+class ItemLote:
+    chave: str
+    arquivo: str
+    status: str = "pendente"   # criado | ignorado | erro
+    id: int | None = None
+    erro: str | None = None
+
+
+@dataclass
+class ResultadoLote:
+    itens: list[ItemLote] = field(default_factory=list)
+    duracao_s: float = 0.0
+
+    def resumo(self) -> dict:
+        contagem = {"criado": 0, "ignorado": 0, "erro": 0}
+        for item in self.itens:
+            contagem[item.status] = contagem.get(item.status, 0) + 1
+        return {
+            "total": len(self.itens),
+            "criados": contagem["criado"],
+            "ignorados": contagem["ignorado"],
+            "erros": contagem["erro"],
+            "duracao_s": round(self.duracao_s, 3),
+            "documentos_por_segundo": round(contagem["criado"] / self.duracao_s, 2) if self.duracao_s else None,
+        }
+
+
+def _insert(db: AsyncSession):
+    dialeto = postgresql if db.bind.dialect.name == "postgresql" else sqlite
+    return (
+        dialeto.insert(Documento)
+        .on_conflict_do_nothing(index_elements=[Documento.chave_importacao])
+        .returning(Documento.id, Documento.chave_importacao, *facetas.COLUNAS)
+    )
+
+
+async def _chaves_existentes(db: AsyncSession, chaves: list[str]) -> set[str]:
+    existentes = set()
+    for i in range(0, len(chaves), 1000):
+        result = await db.execute(
+            select(Documento.chave_importacao).where(Documento.chave_importacao.in_(chaves[i:i + 1000]))
+        )
+        existentes.update(result.scalars())
+    return existentes
+
+
+async def _gravar_lote(db: AsyncSession, pendentes: list[tuple[ItemLote, dict]], store: BlobStore) -> None:
+    if not pendentes:
+        return
+    try:
+        async with blobs_serializados(db):
+            # com as chaves travadas, um blob deduplicado que uma remoção
+            # concorrente apagou não some mais até o commit
+            await travar_blobs(db, [linha["blob_key"] for _, linha in pendentes])
+            sumidos = {
+                chave for chave in {linha["blob_key"] for _, linha in pendentes}
+                if not await store.existe(chave)
+            }
+            for item, linha in pendentes:
+                if linha["blob_key"] in sumidos:
+                    item.status, item.erro = "erro", "conteúdo removido durante a importação; importe de novo"
+            pendentes = [(item, linha) for item, linha in pendentes if linha["blob_key"] not in sumidos]
+            linhas = [linha for _, linha in pendentes]
+            criados = (await db.execute(_insert(db), linhas)).all() if linhas else []
+            ids = {linha.chave_importacao: linha.id for linha in criados}
+            await facetas.ajustar(db, adicionados=criados)
+            await jobs.enfileirar(db, PROCESSAR_DOCUMENTO, [linha.id for linha in criados])
+            await db.commit()
+    except Exception as exc:
+        await db.rollback()
+        for item, linha in pendentes:
+            item.status, item.erro = "erro", f"falha ao gravar o lote: {exc}"
+        for chave_blob in {linha["blob_key"] for _, linha in pendentes}:
+            await remover_blob_sem_referencia(db, chave_blob)
+        return
+    for item, linha in pendentes:
+        if item.chave in ids:
+            item.status, item.id = "criado", ids[item.chave]
+            busca.indice.atualizar(item.id, linha)
+        else:
+            # chave importada por outro lote enquanto este era lido
+            item.status = "ignorado"
+            await remover_blob_sem_referencia(db, linha["blob_key"])
+    jobs.avisar()
+    await cache.documentos.invalidar()
+
+
+async def importar_pacote(
+    db: AsyncSession,
+    arquivo: IO[bytes],
+    tamanho_lote: int = config.LOTE_TAMANHO_TRANSACAO,
+    store: BlobStore | None = None,
+) -> ResultadoLote:
+    store = store or get_blob_store()
+    inicio = time.perf_counter()
+    resultado = ResultadoLote()
+
+    pacote = await asyncio.to_thread(abrir_pacote, arquivo)
+    manifesto = await asyncio.to_thread(pacote.manifesto)
+
+    por_arquivo: dict[str, tuple[ItemLote, DocumentoCreate | None]] = {}
+    chaves: set[str] = set()
+    for numero, linha in enumerate(manifesto, start=1):
+        nome = linha.get("arquivo")
+        item = ItemLote(chave=str(linha.get("chave") or nome or numero), arquivo=nome or "")
+        resultado.itens.append(item)
+        if not nome:
+            item.status, item.erro = "erro", f"linha {numero} do manifesto sem `arquivo`"
+            continue
+        try:
+            doc_in = DocumentoCreate.model_validate(linha)
+        except ValidationError as exc:
+            item.status, item.erro = "erro", f"metadados inválidos: {exc.errors(include_url=False)}"
+            continue
+        nome = posixpath.normpath(nome)
+        if nome in por_arquivo:
+            item.status, item.erro = "erro", f"`{nome}` aparece mais de uma vez no manifesto"
+            continue
+        # a chave decide qual linha entra: repetida, o PDF seria gravado duas
+        # vezes para uma linha só e um dos blobs ficaria órfão
+        if item.chave in chaves:
+            item.status, item.erro = "erro", f"chave `{item.chave}` aparece mais de uma vez no manifesto"
+            continue
+        chaves.add(item.chave)
+        por_arquivo[nome] = (item, doc_in)
+
+    # retomada: o que já foi importado antes nem é lido do pacote
+    existentes = await _chaves_existentes(db, [item.chave for item, _ in por_arquivo.values()])
+    for item, _ in por_arquivo.values():
+        if item.chave in existentes:
+            item.status = "ignorado"
+
+    pendentes: list[tuple[ItemLote, dict]] = []
+    entradas = pacote.entradas()
+    corrompido = None
+    while True:
+        try:
+            proxima = await asyncio.to_thread(next, entradas, None)
+        except ERROS_LEITURA as exc:
+            # TAR lido em sequência: daqui em diante não há o que ler; o que
+            # já foi lido é gravado e o restante fica como erro
+            corrompido = f"pacote corrompido antes deste arquivo: {exc}"
+            break
+        if proxima is None:
+            break
+        nome, conteudo = proxima
+        item, doc_in = por_arquivo.get(posixpath.normpath(nome), (None, None))
+        if item is None or item.status != "pendente":
+            continue
+        try:
+            blob = await receber_pdf(_LeitorAssincrono(conteudo), store)
+        except HTTPException as exc:
+            item.status, item.erro = "erro", exc.detail
+            continue
+        except ERROS_LEITURA as exc:
+            item.status, item.erro = "erro", f"entrada corrompida no pacote: {exc}"
+            continue
+        pendentes.append((item, {
+            **doc_in.model_dump(),
+            "blob_key": blob.chave,
+            "tamanho": blob.tamanho,
+            "sha256": blob.sha256,
+            "published_at": datetime.utcnow(),
+            "status": STATUS_PENDENTE,
+            "chave_importacao": item.chave,
+        }))
+        if len(pendentes) >= tamanho_lote:
+            await _gravar_lote(db, pendentes, store)
+            pendentes = []
+    await _gravar_lote(db, pendentes, store)
+
+    for item in resultado.itens:
+        if item.status == "pendente":
+            item.status, item.erro = "erro", corrompido or "arquivo não encontrado no pacote"
+    resultado.duracao_s = time.perf_counter() - inicio
+    return resultado
+
+
+async def _main(caminho: str, tamanho_lote: int) -> None:
+    from .database import AsyncSessionLocal
+
+    with open(caminho, "rb") as arquivo:
+        async with AsyncSessionLocal() as db:
+            resultado = await importar_pacote(db, arquivo, tamanho_lote)
+    for item in resultado.itens:
+        if item.status == "erro":
+            print(f"ERRO {item.arquivo} ({item.chave}): {item.erro}")
+    print(json.dumps(resultado.resumo(), ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Importa um pacote ZIP/TAR de TCCs com manifesto")
+    parser.add_argument("pacote", help="arquivo .zip, .tar, .tar.gz...")
+    parser.add_argument("--lote", type=int, default=config.LOTE_TAMANHO_TRANSACAO, help="documentos por transação")
+    args = parser.parse_args()
+    asyncio.run(_main(args.pacote, args.lote))
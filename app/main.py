@@ -1,28 +1,146 @@
-from fastapi import FastAPI
+import json
+from contextlib import asynccontextmanager
+
+from fastapi import APIRouter, Depends, FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from .routers import documentos, users
-
-app = FastAPI(
-    title="API de Gerenciamento de TCCs",
-    description="API em Português para upload, listagem, busca e download de documentos acadêmicos (TCCs).",
-    version="1.0.0",
-    docs_url="/docs",
-    redoc_url="/redoc",
-    openapi_url="/openapi.json",
-)
+from fastapi.responses import JSONResponse, PlainTextResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import admissao, cache, cache_blobs, config, database, jobs, metricas, monitoramento, roteadores
+from .seguranca import PoolSenhasSaturado, pool_senhas
+from .upload import LimiteUploadMiddleware
+from .worker import worker
 
-# Configuração de CORS liberando tudo
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],       # permite qualquer domínio
-    allow_credentials=True,
-    allow_methods=["*"],       # permite todos os métodos HTTP
-    allow_headers=["*"],       # permite todos os cabeçalhos
+# (prefixo, módulo, preguiçoso): os preguiçosos só são importados na primeira
+# requisição ao prefixo (app.roteadores)
+ROTEADORES = (
+    ("/documentos", ".routers.documentos", False),
+    ("/usuarios", ".routers.users", True),
 )
 
-@app.get("/", summary="Rota raiz")
-async def root():
-    return {"message": "API de Gerenciamento de TCCs rodando!"}
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # engine e conexões prontos antes da primeira requisição; pool fechado no shutdown
+    database.obter_engine()
+    await database.preaquecer()
+    if config.JOBS_NA_APP:
+        worker.iniciar()
+    yield
+    await worker.encerrar()
+    pool_senhas.encerrar()
+    await database.encerrar()
+
+def create_app(
+    rotas_preguicosas: bool = config.ROTAS_PREGUICOSAS,
+    openapi_precomputado: str = config.OPENAPI_PRECOMPUTADO,
+) -> FastAPI:
+    app = FastAPI(
+        title="API de Gerenciamento de TCCs",
+        description="API em Português para upload, listagem, busca e download de documentos acadêmicos (TCCs).",
+        version="1.0.0",
+        docs_url="/docs",
+        redoc_url="/redoc",
+        openapi_url="/openapi.json",
+        lifespan=lifespan,
+    )
+
+    # Configuração de CORS liberando tudo
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],       # permite qualquer domínio
+        allow_credentials=True,
+        allow_methods=["*"],       # permite todos os métodos HTTP
+        allow_headers=["*"],       # permite todos os cabeçalhos
+        expose_headers=["Link", "X-Next-Cursor", "X-Total-Count"],  # paginação
+    )
+
+    # Recusa uploads acima do limite (ou que não são PDF) antes de ler o corpo inteiro
+    app.add_middleware(
+        LimiteUploadMiddleware,
+        limites={
+            "/documentos/upload": config.TAMANHO_MAXIMO_UPLOAD,
+            "/documentos/lote": config.TAMANHO_MAXIMO_LOTE,
+        },
+        pdf=("/documentos/upload",),
+    )
+
+    # Limites por classe de rota, orçamento de bytes e taxa por cliente,
+    # antes de abrir sessão no banco ou ler o corpo
+    app.add_middleware(admissao.AdmissaoMiddleware)
+
+    # Por último = mais externo: mede também o tempo dos outros middlewares
+    app.add_middleware(metricas.MetricasMiddleware)
+    database.ao_criar_engine(metricas.instrumentar_engine)
+    metricas.instrumentar_pool(database.estatisticas)
+
+    @app.exception_handler(PoolSenhasSaturado)
+    async def pool_senhas_saturado(request: Request, exc: PoolSenhasSaturado):
+        return JSONResponse(
+            status_code=503,
+            content={"detail": "Servidor ocupado, tente novamente em instantes"},
+            headers={"Retry-After": "1"},
+        )
+
+    @app.get("/", summary="Rota raiz")
+    async def root():
+        return {"message": "API de Gerenciamento de TCCs rodando!"}
+
+    # detalhes internos: só com MONITORAMENTO_TOKEN (ou em dev), ver app.monitoramento
+    interno = APIRouter(dependencies=[Depends(monitoramento.exigir)])
+
+    @interno.get("/pool", summary="Estatísticas do pool de conexões")
+    async def pool():
+        return database.estatisticas_pool()
+
+    @interno.get("/cache", summary="Estatísticas do cache de metadados")
+    async def cache_stats():
+        return cache.documentos.resumo()
+
+    @interno.get("/cache/blobs", summary="Estatísticas do cache de PDFs")
+    async def cache_blobs_stats():
+        return cache_blobs.blobs.resumo()
+
+    @interno.get("/admissao", summary="Estado do controle de admissão")
+    async def admissao_stats():
+        return admissao.governador.resumo()
+
+    @interno.get("/jobs", summary="Estado da fila de processamento")
+    async def jobs_stats(db: AsyncSession = Depends(database.get_db)):
+        return {"fila": await jobs.resumo(db), "worker": worker.resumo()}
+
+    @interno.get("/metrics", summary="Métricas no formato do Prometheus", response_class=PlainTextResponse)
+    async def metrics():
+        return PlainTextResponse(metricas.renderizar(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+    @interno.get("/metrics/perfis", summary="Pilhas das requisições mais lentas (METRICAS_PERFIL)")
+    async def metrics_perfis():
+        if metricas.amostrador is None:
+            return {"ativo": False, "perfis": []}
+        return {"ativo": True, "limiar_s": metricas.amostrador.limiar, "perfis": metricas.amostrador.perfis()}
+
+    app.include_router(interno)
+
+    for prefixo, modulo, preguicoso in ROTEADORES:
+        if preguicoso and rotas_preguicosas:
+            roteadores.incluir_preguicoso(app, prefixo, modulo)
+        else:
+            roteadores.incluir(app, modulo)
+
+    if openapi_precomputado:
+        # gerado no build com python -m app.openapi; evita montar o schema
+        # (e importar os routers preguiçosos) no primeiro /docs
+        with open(openapi_precomputado, encoding="utf-8") as arquivo:
+            schema = json.load(arquivo)
+        app.openapi = lambda: schema
+    else:
+        gerar_openapi = app.openapi
+
+        def openapi():
+            roteadores.carregar(app)
+            return gerar_openapi()
+
+        app.openapi = openapi
+
+    return app
 
-app.include_router(documentos.router)
-app.include_router(users.router)
+app = create_app()
@@ -0,0 +1,519 @@
+# app/metricas.py
+#
+# Métricas da API no formato texto do Prometheus (/metrics):
+#   - MetricasMiddleware: requisições, status e latência por rota (o template,
+#     p.ex. /documentos/{documento_id}, não a URL), bytes recebidos e enviados
+#     e consultas ao banco (comandos e uma estimativa dos bytes lidos) por
+#     requisição;
+#   - instrumentar_engine: tempo de cada comando SQL (eventos do SQLAlchemy,
+#     sem o custo do echo) e espera por conexão no pool;
+#   - coletores: valores lidos na hora da coleta (pool, caches, worker...).
+# Com METRICAS_PERFIL, um Amostrador guarda as pilhas das requisições mais
+# lentas (/metrics/perfis).
+
+import asyncio
+import logging
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from contextvars import ContextVar
+from heapq import heappush, heappushpop
+from typing import Callable, Iterable
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from . import admissao, cache, cache_blobs, config, database
+from .download import EXTENSAO_ZEROCOPY
+from .seguranca import pool_senhas
+from .worker import worker
+
+logger = logging.getLogger(__name__)
+
+LATENCIAS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUANTIDADES = (0, 1, 2, 3, 5, 8, 13, 21, 50, 100)
+
+
+def _rotulos(nomes: tuple[str, ...], valores: tuple, extra: str = "") -> str:
+    pares = [f'{nome}="{_escapar(valor)}"' for nome, valor in zip(nomes, valores)]
+    if extra:
+        pares.append(extra)
+    return "{" + ",".join(pares) + "}" if pares else ""
+
+
+def _escapar(valor) -> str:
+    return str(valor).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _numero(valor: float) -> str:
+    return str(int(valor)) if float(valor).is_integer() else repr(float(valor))
+
+
+class Contador:
+    def __init__(self, nome: str, ajuda: str, rotulos: tuple[str, ...] = ()):
+        self.nome, self.ajuda, self.rotulos = nome, ajuda, rotulos
+        self.valores: dict[tuple, float] = {}
+
+    def somar(self, *rotulos, valor: float = 1) -> None:
+        self.valores[rotulos] = self.valores.get(rotulos, 0) + valor
+
+    def renderizar(self) -> Iterable[str]:
+        yield f"# HELP {self.nome} {self.ajuda}"
+        yield f"# TYPE {self.nome} counter"
+        for rotulos, valor in self.valores.items():
+            yield f"{self.nome}{_rotulos(self.rotulos, rotulos)} {_numero(valor)}"
+
+
+class Histograma:
+    def __init__(self, nome: str, ajuda: str, rotulos: tuple[str, ...] = (), limites: tuple = LATENCIAS):
+        self.nome, self.ajuda, self.rotulos, self.limites = nome, ajuda, rotulos, limites
+        # por rótulos: contagem por faixa (não acumulada; +Inf no fim), soma
+        self.series: dict[tuple, list] = {}
+
+    def observar(self, valor: float, *rotulos) -> None:
+        serie = self.series.get(rotulos)
+        if serie is None:
+            serie = self.series[rotulos] = [[0] * (len(self.limites) + 1), 0.0]
+        serie[0][bisect_left(self.limites, valor)] += 1
+        serie[1] += valor
+
+    def renderizar(self) -> Iterable[str]:
+        yield f"# HELP {self.nome} {self.ajuda}"
+        yield f"# TYPE {self.nome} histogram"
+        for rotulos, (faixas, soma) in self.series.items():
+            acumulado = 0
+            for limite, quantidade in zip((*self.limites, "+Inf"), faixas):
+                acumulado += quantidade
+                le = 'le="+Inf"' if limite == "+Inf" else f'le="{_numero(limite)}"'
+                yield f"{self.nome}_bucket{_rotulos(self.rotulos, rotulos, le)} {acumulado}"
+            yield f"{self.nome}_sum{_rotulos(self.rotulos, rotulos)} {_numero(soma)}"
+            yield f"{self.nome}_count{_rotulos(self.rotulos, rotulos)} {acumulado}"
+
+
+# Coletor: chamado na hora da coleta, devolve (nome, tipo, ajuda, [(rotulos, valor)])
+Coletor = Callable[[], Iterable[tuple[str, str, str, list[tuple[dict, float]]]]]
+
+
+class Registro:
+    def __init__(self):
+        self.metricas: list[Contador | Histograma] = []
+        self.coletores: list[Coletor] = []
+
+    def contador(self, *args, **kwargs) -> Contador:
+        self.metricas.append(metrica := Contador(*args, **kwargs))
+        return metrica
+
+    def histograma(self, *args, **kwargs) -> Histograma:
+        self.metricas.append(metrica := Histograma(*args, **kwargs))
+        return metrica
+
+    def coletor(self, fn: Coletor) -> Coletor:
+        self.coletores.append(fn)
+        return fn
+
+    def renderizar(self) -> str:
+        linhas = []
+        for metrica in self.metricas:
+            linhas.extend(metrica.renderizar())
+        for coletor in self.coletores:
+            try:
+                familias = list(coletor())
+            except Exception:
+                logger.exception("Falha no coletor de métricas %r", coletor)
+                continue
+            for nome, tipo, ajuda, amostras in familias:
+                linhas += [f"# HELP {nome} {ajuda}", f"# TYPE {nome} {tipo}"]
+                for rotulos, valor in amostras:
+                    if valor is None:
+                        continue
+                    nomes = tuple(rotulos)
+                    linhas.append(f"{nome}{_rotulos(nomes, tuple(rotulos.values()))} {_numero(valor)}")
+        return "\n".join(linhas) + "\n"
+
+
+registro = Registro()
+
+requisicoes = registro.contador(
+    "http_requisicoes_total", "Requisições atendidas", ("metodo", "rota", "status"))
+duracao = registro.histograma(
+    "http_requisicao_duracao_segundos", "Latência das requisições", ("metodo", "rota"))
+bytes_recebidos = registro.contador(
+    "http_bytes_recebidos_total", "Bytes de corpo recebidos (uploads)", ("metodo", "rota"))
+bytes_enviados = registro.contador(
+    "http_bytes_enviados_total", "Bytes de corpo enviados (downloads)", ("metodo", "rota"))
+bytes_banco = registro.contador(
+    "http_bytes_banco_total",
+    "Bytes lidos do banco, aproximados pelo tamanho dos valores (só asyncpg e aiosqlite)", ("metodo", "rota"))
+consultas_requisicao = registro.histograma(
+    "http_consultas_banco_por_requisicao", "Comandos SQL por requisição", ("metodo", "rota"), QUANTIDADES)
+consultas = registro.histograma(
+    "db_comando_duracao_segundos", "Tempo de execução dos comandos SQL", ("operacao",))
+espera_pool = registro.histograma(
+    "db_pool_espera_segundos", "Espera para obter uma conexão do pool")
+
+OPERACOES = {"SELECT", "INSERT", "UPDATE", "DELETE", "WITH", "BEGIN", "COMMIT", "ROLLBACK", "SAVEPOINT", "RELEASE"}
+
+
+# ------------------------
+# Requisições
+# ------------------------
+
+class _Requisicao:
+    __slots__ = ("metodo", "inicio", "tarefa", "consultas", "tempo_banco", "bytes_banco", "amostras", "rota")
+
+    def __init__(self, metodo: str):
+        self.metodo = metodo
+        self.inicio = time.perf_counter()
+        self.tarefa = None
+        self.consultas = 0
+        self.tempo_banco = 0.0
+        self.bytes_banco = 0
+        self.amostras: Counter | None = None
+        self.rota = None
+
+
+_atual: ContextVar[_Requisicao | None] = ContextVar("metricas_requisicao", default=None)
+em_andamento = 0
+
+
+class MetricasMiddleware:
+    # ASGI puro: não bufferiza o corpo e vê também o envio zerocopy dos downloads
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        global em_andamento
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        req = _Requisicao(scope["method"])
+        token = _atual.set(req)
+        status = 500
+        recebidos = enviados = 0
+
+        async def receber():
+            nonlocal recebidos
+            mensagem = await receive()
+            if mensagem["type"] == "http.request":
+                recebidos += len(mensagem.get("body", b""))
+            return mensagem
+
+        async def enviar(mensagem):
+            nonlocal status, enviados
+            tipo = mensagem["type"]
+            if tipo == "http.response.start":
+                status = mensagem["status"]
+            elif tipo == "http.response.body":
+                enviados += len(mensagem.get("body", b""))
+            elif tipo == EXTENSAO_ZEROCOPY:
+                enviados += mensagem.get("count") or 0
+            await send(mensagem)
+
+        em_andamento += 1
+        if amostrador:
+            amostrador.comecar(req)
+        try:
+            await self.app(scope, receber, enviar)
+        finally:
+            em_andamento -= 1
+            _atual.reset(token)
+            segundos = time.perf_counter() - req.inicio
+            # template da rota que atendeu; caminhos sem rota (404) ficam juntos
+            rota = getattr(scope.get("route"), "path", None) or "sem_rota"
+            req.rota = rota
+            requisicoes.somar(req.metodo, rota, str(status))
+            duracao.observar(segundos, req.metodo, rota)
+            consultas_requisicao.observar(req.consultas, req.metodo, rota)
+            if recebidos:
+                bytes_recebidos.somar(req.metodo, rota, valor=recebidos)
+            if enviados:
+                bytes_enviados.somar(req.metodo, rota, valor=enviados)
+            if req.bytes_banco:
+                bytes_banco.somar(req.metodo, rota, valor=req.bytes_banco)
+            if amostrador:
+                amostrador.terminar(req, segundos)
+
+
+# ------------------------
+# Banco de dados
+# ------------------------
+
+def instrumentar_engine(engine: AsyncEngine) -> None:
+    sync = engine.sync_engine
+    if event.contains(sync, "before_cursor_execute", _antes_comando):
+        return
+    event.listen(sync, "before_cursor_execute", _antes_comando)
+    event.listen(sync, "after_cursor_execute", _depois_comando)
+    event.listen(sync, "handle_error", _erro_comando)
+
+
+def _antes_comando(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("metricas_inicio", []).append(time.perf_counter())
+
+
+def _depois_comando(conn, cursor, statement, parameters, context, executemany):
+    inicios = conn.info.get("metricas_inicio")
+    if not inicios:
+        return
+    segundos = time.perf_counter() - inicios.pop()
+    operacao = statement.lstrip()[:10].split(None, 1)[0].upper() if statement.strip() else ""
+    consultas.observar(segundos, operacao if operacao in OPERACOES else "OUTRA")
+    # o greenlet do SQLAlchemy herda o contexto da tarefa, então o
+    # ContextVar aponta para a requisição que executou o comando
+    req = _atual.get()
+    if req is not None:
+        req.consultas += 1
+        req.tempo_banco += segundos
+        if conn.dialect.driver in DRIVERS_MEDIDOS:
+            req.bytes_banco += tamanho_resultado(cursor)
+
+
+# Drivers cujo cursor (o adaptador async do SQLAlchemy) já traz o resultado
+# inteiro no execute. Não há API pública para ver essas linhas sem
+# consumi-las, então tamanho_resultado lê o buffer do adaptador; nos outros
+# drivers a métrica não é medida.
+DRIVERS_MEDIDOS = ("asyncpg", "aiosqlite")
+
+
+def tamanho_resultado(cursor) -> int:
+    # Aproximação do volume lido: texto em bytes UTF-8, binários pelo tamanho
+    # e os demais valores (números, datas) como 8 bytes. Cursores de
+    # streaming (exportação) não têm o buffer e contam 0.
+    total = 0
+    for linha in getattr(cursor, "_rows", None) or ():
+        for valor in linha:
+            if isinstance(valor, str):
+                total += len(valor) if valor.isascii() else len(valor.encode())
+            elif isinstance(valor, (bytes, bytearray, memoryview)):
+                total += len(valor)
+            elif valor is not None:
+                total += 8
+    return total
+
+
+def _erro_comando(contexto):
+    inicios = contexto.connection.info.get("metricas_inicio") if contexto.connection is not None else None
+    if inicios:
+        inicios.pop()
+
+
+def instrumentar_pool(estatisticas: database.EstatisticasPool) -> None:
+    if espera_pool.observar not in estatisticas.observadores:
+        estatisticas.observadores.append(espera_pool.observar)
+
+
+# ------------------------
+# Perfil por amostragem (opcional)
+# ------------------------
+
+class Amostrador:
+    # Uma thread acorda a cada `intervalo` e, para cada requisição em
+    # andamento, registra duas pilhas: a do thread do event loop naquele
+    # instante ("cpu", o que está executando) e a cadeia de awaits da tarefa
+    # da requisição ("espera", onde ela está parada). As requisições que
+    # passam de `limiar` segundos têm as pilhas mais frequentes registradas
+    # no log; as `guardados` mais lentas ficam em /metrics/perfis, no formato
+    # "collapsed" (uma pilha por linha, frames separados por ";").
+
+    MAXIMO_PILHAS = 200
+    PROFUNDIDADE = 40
+
+    def __init__(self, limiar: float, intervalo: float, guardados: int):
+        self.limiar = limiar
+        self.intervalo = intervalo
+        self.guardados = guardados
+        self.piores: list[tuple[float, int, dict]] = []
+        self._ativas: dict[int, _Requisicao] = {}
+        # _ativas e os Counter das requisições são escritos pela thread e lidos no loop
+        self._lock = threading.Lock()
+        self._sequencia = 0
+        self._thread: threading.Thread | None = None
+        self._id_loop: int | None = None
+
+    def comecar(self, req: _Requisicao) -> None:
+        if self._thread is None:
+            self._id_loop = threading.get_ident()
+            self._thread = threading.Thread(target=self._rodar, name="metricas-amostrador", daemon=True)
+            self._thread.start()
+        req.tarefa = asyncio.current_task()
+        req.amostras = Counter()
+        with self._lock:
+            self._ativas[id(req)] = req
+
+    def terminar(self, req: _Requisicao, segundos: float) -> None:
+        # fora de _ativas (sob a trava), a thread não mexe mais nas amostras
+        with self._lock:
+            self._ativas.pop(id(req), None)
+        if segundos < self.limiar or not req.amostras:
+            return
+        mais_frequentes = req.amostras.most_common(20)
+        logger.warning(
+            "Requisição lenta: %s %s em %.3fs (%d comandos SQL, %.3fs no banco). Pilhas mais frequentes:\n%s",
+            req.metodo, req.rota, segundos, req.consultas, req.tempo_banco,
+            "\n".join(f"{quantidade:5d} {pilha}" for pilha, quantidade in mais_frequentes[:5]),
+        )
+        perfil = {
+            "metodo": req.metodo,
+            "rota": req.rota,
+            "duracao_s": round(segundos, 4),
+            "comandos_sql": req.consultas,
+            "tempo_banco_s": round(req.tempo_banco, 4),
+            "pilhas": [{"pilha": pilha, "amostras": quantidade} for pilha, quantidade in mais_frequentes],
+        }
+        self._sequencia += 1
+        item = (segundos, self._sequencia, perfil)
+        if len(self.piores) < self.guardados:
+            heappush(self.piores, item)
+        else:
+            heappushpop(self.piores, item)
+
+    def perfis(self) -> list[dict]:
+        return [perfil for _, _, perfil in sorted(self.piores, reverse=True)]
+
+    def _rodar(self) -> None:
+        while True:
+            time.sleep(self.intervalo)
+            self._amostrar()
+
+    def _amostrar(self) -> None:
+        with self._lock:
+            ativas = list(self._ativas.items())
+        if not ativas:
+            return
+        frame = sys._current_frames().get(self._id_loop)
+        cpu = self._pilha_frames(frame)
+        # pilhas montadas fora da trava; só a contagem é feita com ela
+        pilhas = [(chave, req, (cpu, self._pilha_tarefa(req.tarefa))) for chave, req in ativas]
+        with self._lock:
+            for chave, req, pilhas_req in pilhas:
+                amostras = req.amostras
+                if amostras is None or chave not in self._ativas:
+                    continue
+                for pilha in pilhas_req:
+                    if pilha and (pilha in amostras or len(amostras) < self.MAXIMO_PILHAS):
+                        amostras[pilha] += 1
+
+    def _pilha_frames(self, frame) -> str | None:
+        frames = []
+        while frame is not None and len(frames) < self.PROFUNDIDADE:
+            frames.append(frame)
+            frame = frame.f_back
+        if not frames or frames[0].f_code.co_name == "select":
+            # event loop parado no select(): ocioso, esperando I/O
+            return None
+        return "cpu;" + ";".join(self._nome(f) for f in reversed(frames))
+
+    def _pilha_tarefa(self, tarefa) -> str | None:
+        if tarefa is None or tarefa.done():
+            return None
+        frames = []
+        coro = tarefa.get_coro()
+        while coro is not None and len(frames) < self.PROFUNDIDADE:
+            frame = getattr(coro, "cr_frame", None) or getattr(coro, "gi_frame", None)
+            if frame is None:
+                break
+            frames.append(frame)
+            coro = getattr(coro, "cr_await", None) or getattr(coro, "gi_yieldfrom", None)
+        return "espera;" + ";".join(self._nome(f) for f in frames) if frames else None
+
+    @staticmethod
+    def _nome(frame) -> str:
+        codigo = frame.f_code
+        modulo = frame.f_globals.get("__name__", "?")
+        return f"{modulo}:{codigo.co_name}:{frame.f_lineno}"
+
+
+amostrador = Amostrador(
+    config.METRICAS_PERFIL_LIMIAR, config.METRICAS_PERFIL_INTERVALO, config.METRICAS_PERFIL_GUARDADOS,
+) if config.METRICAS_PERFIL else None
+
+
+def renderizar() -> str:
+    return registro.renderizar()
+
+
+# ------------------------
+# Coletores
+# ------------------------
+
+@registro.coletor
+def _coletar_requisicoes():
+    yield "http_requisicoes_em_andamento", "gauge", "Requisições sendo atendidas", [({}, em_andamento)]
+
+
+@registro.coletor
+def _coletar_pool():
+    pool = database.estatisticas_pool()
+    yield "db_pool_conexoes", "gauge", "Conexões do pool por estado", [
+        ({"estado": estado}, pool.get(chave))
+        for estado, chave in (("em_uso", "em_uso"), ("ociosas", "ociosas"), ("overflow", "overflow"))
+    ]
+    yield "db_pool_tamanho", "gauge", "Tamanho configurado do pool", [({}, pool.get("tamanho"))]
+
+
+@registro.coletor
+def _coletar_cache():
+    resumo = cache.documentos.resumo()
+    yield "cache_entradas", "gauge", "Entradas no cache local de metadados", [({}, resumo["entradas_local"])]
+    yield "cache_consultas_total", "counter", "Consultas ao cache de metadados por resultado", [
+        ({"resultado": resultado}, resumo[resultado])
+        for resultado in ("hits_local", "hits_compartilhado", "misses", "coalescidos")
+    ]
+    yield "cache_invalidacoes_total", "counter", "Invalidações do cache de metadados", [({}, resumo["invalidacoes"])]
+
+
+@registro.coletor
+def _coletar_cache_blobs():
+    resumo = cache_blobs.blobs.resumo()
+    yield "cache_blobs_entradas", "gauge", "PDFs no cache em memória", [({}, resumo["entradas"])]
+    yield "cache_blobs_bytes", "gauge", "Bytes ocupados pelo cache de PDFs", [({}, resumo["bytes_em_uso"])]
+    yield "cache_blobs_consultas_total", "counter", "Downloads servidos pelo cache de PDFs por resultado", [
+        ({"resultado": resultado}, resumo[resultado])
+        for resultado in ("hits", "misses", "coalescidos", "ignorados", "parciais")
+    ]
+    yield "cache_blobs_bytes_origem_total", "counter", "Bytes lidos da origem (S3/banco) para o cache", [
+        ({}, resumo["bytes_origem"])]
+    yield "cache_blobs_bytes_economizados_total", "counter", "Bytes servidos da memória sem nova leitura", [
+        ({}, resumo["bytes_economizados"])]
+    yield "cache_blobs_descartes_total", "counter", "PDFs descartados por falta de espaço", [({}, resumo["descartes"])]
+
+
+@registro.coletor
+def _coletar_senhas():
+    yield "senhas_pendentes", "gauge", "Hashes de senha executando ou na fila", [({}, pool_senhas.pendentes)]
+    yield "senhas_recusadas_total", "counter", "Pedidos de hash recusados com 503", [({}, pool_senhas.recusados)]
+
+
+@registro.coletor
+def _coletar_worker():
+    resumo = worker.resumo()
+    yield "jobs_em_execucao", "gauge", "Jobs executando neste processo", [({}, resumo["em_execucao"])]
+    yield "jobs_executados_total", "counter", "Jobs concluídos neste processo", [({}, resumo["executados"])]
+    yield "jobs_falhas_total", "counter", "Tentativas de job que falharam neste processo", [({}, resumo["falhas"])]
+
+
+@registro.coletor
+def _coletar_admissao():
+    gov = admissao.governador
+    classes = gov.limitadores.items()
+    yield "admissao_em_uso", "gauge", "Requisições admitidas em execução por classe", [
+        ({"classe": nome}, limitador.em_uso) for nome, limitador in classes]
+    yield "admissao_na_fila", "gauge", "Requisições esperando vaga por classe", [
+        ({"classe": nome}, limitador.na_fila) for nome, limitador in classes]
+    yield "admissao_limite", "gauge", "Requisições simultâneas permitidas por classe", [
+        ({"classe": nome}, limitador.limite) for nome, limitador in classes]
+    yield "admissao_admitidas_total", "counter", "Requisições admitidas por classe", [
+        ({"classe": nome}, limitador.admitidos) for nome, limitador in classes]
+    yield "admissao_recusadas_total", "counter", "Requisições recusadas com 503 por classe", [
+        ({"classe": nome}, limitador.recusados) for nome, limitador in classes]
+    yield "admissao_espera_segundos_total", "counter", "Tempo somado na fila de admissão por classe", [
+        ({"classe": nome}, limitador.espera_total) for nome, limitador in classes]
+    yield "admissao_bytes_em_transito", "gauge", "Bytes reservados por uploads e downloads", [({}, gov.bytes.em_uso)]
+    yield "admissao_bytes_maximo", "gauge", "Orçamento de bytes em trânsito", [({}, gov.bytes.maximo)]
+    yield "admissao_bytes_recusadas_total", "counter", "Requisições recusadas pelo orçamento de bytes", [
+        ({}, gov.bytes.recusados)]
+    yield "admissao_limitadas_taxa_total", "counter", "Requisições recusadas com 429 pelo limite por cliente", [
+        ({}, gov.limitados)]
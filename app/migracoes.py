@@ -0,0 +1,86 @@
+# app/migracoes.py
+#
+# O projeto não usa Alembic: as tabelas novas são criadas com create_all e as
+# colunas/índices novos em tabelas existentes são aplicados com DDL idempotente.
+# Uso: python -m app.migracoes
+
+import asyncio
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from . import facetas
+from .database import obter_engine
+from .models import Base
+
+DDL_POSTGRES = [
+    # tamanho e hash do PDF, usados em Content-Length/ETag no download
+    "ALTER TABLE documentos ADD COLUMN IF NOT EXISTS tamanho BIGINT",
+    "ALTER TABLE documentos ADD COLUMN IF NOT EXISTS sha256 VARCHAR(64)",
+    # (o preenchimento das linhas legadas é feito em lotes por app.migrar_blobs)
+    # PDFs fora da tabela (app.storage); arquivo_tcc fica só para linhas legadas
+    "ALTER TABLE documentos ADD COLUMN IF NOT EXISTS blob_key VARCHAR(64)",
+    "ALTER TABLE documentos ALTER COLUMN arquivo_tcc DROP NOT NULL",
+    "CREATE INDEX IF NOT EXISTS ix_documentos_blob_key ON documentos (blob_key)",
+    # busca textual (app.busca): tsvector gerado + GIN e trigramas para os ilike
+    "CREATE EXTENSION IF NOT EXISTS unaccent",
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    # unaccent() não é IMMUTABLE; o wrapper permite usá-lo em coluna gerada e índice
+    "CREATE OR REPLACE FUNCTION f_unaccent(text) RETURNS text "
+    "LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT "
+    "AS $$ SELECT public.unaccent('public.unaccent'::regdictionary, $1) $$",
+    # a versão anterior da coluna não tinha autor_nome_curto (que o fallback de
+    # app.busca indexa); coluna gerada não muda de expressão, então é recriada
+    "DO $$ BEGIN "
+    "IF EXISTS (SELECT 1 FROM pg_attrdef d JOIN pg_attribute a ON a.attrelid = d.adrelid AND a.attnum = d.adnum "
+    "WHERE d.adrelid = 'documentos'::regclass AND a.attname = 'busca' "
+    "AND pg_get_expr(d.adbin, d.adrelid) NOT LIKE '%autor_nome_curto%') THEN "
+    "ALTER TABLE documentos DROP COLUMN busca; "
+    "END IF; END $$",
+    "ALTER TABLE documentos ADD COLUMN IF NOT EXISTS busca tsvector GENERATED ALWAYS AS ("
+    "setweight(to_tsvector('portuguese', f_unaccent(coalesce(titulo_principal, ''))), 'A') || "
+    "setweight(to_tsvector('portuguese', f_unaccent(coalesce(subtitulo, ''))), 'B') || "
+    "setweight(to_tsvector('portuguese', f_unaccent(coalesce(autor_nome_completo, '') || ' ' || "
+    "coalesce(autor_nome_curto, '') || ' ' || coalesce(orientador, ''))), 'C') || "
+    "setweight(to_tsvector('portuguese', f_unaccent(coalesce(departamento, ''))), 'D')"
+    ") STORED",
+    "CREATE INDEX IF NOT EXISTS ix_documentos_busca ON documentos USING gin (busca)",
+    # paginação por cursor (app.paginacao)
+    "CREATE INDEX IF NOT EXISTS ix_documentos_published_at_id ON documentos (published_at DESC, id DESC)",
+    # importação em lote idempotente (app.lote)
+    "ALTER TABLE documentos ADD COLUMN IF NOT EXISTS chave_importacao VARCHAR",
+    "CREATE UNIQUE INDEX IF NOT EXISTS ix_documentos_chave_importacao ON documentos (chave_importacao)",
+    # busca no conteúdo dos PDFs (app.indexar_texto)
+    "ALTER TABLE documento_texto ADD COLUMN IF NOT EXISTS busca tsvector GENERATED ALWAYS AS ("
+    "to_tsvector('portuguese', f_unaccent(coalesce(texto, '')))) STORED",
+    "CREATE INDEX IF NOT EXISTS ix_documento_texto_busca ON documento_texto USING gin (busca)",
+    # o texto sai junto com o documento; as linhas órfãs de antes da chave
+    # estrangeira (worker que terminou depois do DELETE) são apagadas antes
+    "DO $$ BEGIN "
+    "IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'documento_texto_documento_id_fkey') THEN "
+    "DELETE FROM documento_texto t WHERE NOT EXISTS (SELECT 1 FROM documentos d WHERE d.id = t.documento_id); "
+    "ALTER TABLE documento_texto ADD CONSTRAINT documento_texto_documento_id_fkey "
+    "FOREIGN KEY (documento_id) REFERENCES documentos (id) ON DELETE CASCADE; "
+    "END IF; END $$",
+] + [
+    f"CREATE INDEX IF NOT EXISTS ix_documentos_{coluna}_trgm ON documentos USING gin ({coluna} gin_trgm_ops)"
+    for coluna in (
+        "titulo_principal", "subtitulo", "departamento", "orientador",
+        "grupo_instrucao", "autor_nome_curto", "autor_nome_completo",
+    )
+]
+
+
+async def aplicar(engine: AsyncEngine | None = None) -> None:
+    async with (engine or obter_engine()).begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        if conn.dialect.name == "postgresql":
+            for ddl in DDL_POSTGRES:
+                await conn.execute(text(ddl))
+        # refaz as contagens de app.facetas a partir de documentos (cobre as
+        # linhas gravadas antes da tabela existir e qualquer divergência)
+        await facetas.recalcular(conn)
+
+
+if __name__ == "__main__":
+    asyncio.run(aplicar())
@@ -0,0 +1,94 @@
+# app/migrar_blobs.py
+#
+# Move os PDFs legados de documentos.arquivo_tcc para o BlobStore, em lotes.
+# Cada PDF é copiado em blocos (substr), sem carregar o arquivo inteiro, e a
+# linha passa a apontar para o blob com arquivo_tcc = NULL. Pode ser
+# interrompido e executado de novo: só processa linhas ainda sem blob_key.
+#
+# Com --apenas-hashes, deixa os PDFs na tabela e só preenche tamanho e sha256
+# (Content-Length/ETag do download) das linhas legadas que não têm, também em
+# lotes, cada um na sua transação. Só no Postgres (sha256() no banco).
+#
+# Uso: python -m app.migrar_blobs [--lote 50] [--apenas-hashes]
+
+import argparse
+import asyncio
+
+from sqlalchemy import func, text, update
+from sqlalchemy.future import select
+
+from . import crud
+from .database import AsyncSessionLocal
+from .models import Documento
+from .storage import get_blob_store
+
+
+async def migrar(lote: int = 50) -> int:
+    store = get_blob_store()
+    migrados = 0
+    ultimo_id = 0
+    while True:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(Documento.id, func.length(Documento.arquivo_tcc).label("tamanho"))
+                .where(Documento.blob_key.is_(None), Documento.arquivo_tcc.is_not(None), Documento.id > ultimo_id)
+                .order_by(Documento.id)
+                .limit(lote)
+            )
+            linhas = result.all()
+            if not linhas:
+                return migrados
+
+            for linha in linhas:
+                escritor = store.novo_escritor()
+                try:
+                    async for bloco in crud.iter_documento_arquivo(linha.id, 0, linha.tamanho - 1):
+                        await escritor.escrever(bloco)
+                except BaseException:
+                    await escritor.descartar()
+                    raise
+                blob = await escritor.concluir()
+                await db.execute(
+                    update(Documento)
+                    .where(Documento.id == linha.id)
+                    .values(blob_key=blob.chave, tamanho=blob.tamanho, sha256=blob.sha256, arquivo_tcc=None)
+                )
+                ultimo_id = linha.id
+            await db.commit()
+            migrados += len(linhas)
+            print(f"{migrados} documentos migrados (último id {ultimo_id})")
+
+
+PREENCHER_HASHES = text(
+    "UPDATE documentos SET tamanho = length(arquivo_tcc), sha256 = encode(sha256(arquivo_tcc), 'hex') "
+    "WHERE id IN (SELECT id FROM documentos WHERE sha256 IS NULL AND arquivo_tcc IS NOT NULL "
+    "ORDER BY id LIMIT :lote) RETURNING id"
+)
+
+
+async def preencher_hashes(lote: int = 50) -> int:
+    preenchidos = 0
+    while True:
+        async with AsyncSessionLocal() as db:
+            if db.bind.dialect.name != "postgresql":
+                raise SystemExit("--apenas-hashes requer Postgres")
+            ids = (await db.execute(PREENCHER_HASHES, {"lote": lote})).scalars().all()
+            await db.commit()
+        if not ids:
+            return preenchidos
+        preenchidos += len(ids)
+        print(f"{preenchidos} documentos com hash (último id {max(ids)})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move os PDFs de arquivo_tcc para o BlobStore")
+    parser.add_argument("--lote", type=int, default=50, help="documentos por transação")
+    parser.add_argument("--apenas-hashes", action="store_true",
+                        help="só preenche tamanho e sha256 das linhas legadas, sem mover os PDFs")
+    args = parser.parse_args()
+    if args.apenas_hashes:
+        total = asyncio.run(preencher_hashes(args.lote))
+        print(f"Concluído: {total} documentos com tamanho e sha256 preenchidos.")
+    else:
+        total = asyncio.run(migrar(args.lote))
+        print(f"Concluído: {total} documentos migrados. Rode VACUUM FULL documentos para devolver o espaço.")
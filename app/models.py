@@ -1,5 +1,5 @@
-from sqlalchemy import Column, Integer, String, DateTime, LargeBinary
-from sqlalchemy.orm import declarative_base
+from sqlalchemy import Column, ForeignKey, Index, Integer, BigInteger, String, DateTime, LargeBinary, Text
+from sqlalchemy.orm import declarative_base, deferred
 from datetime import datetime
 
 Base = declarative_base()
@@ -14,12 +14,71 @@ class Documento(Base):
     data_defesa         = Column('data_defesa', DateTime(timezone=True), nullable=True)
     orientador          = Column('orientador', String, nullable=True)
     grupo_instrucao     = Column('grupo_instrucao', String, nullable=True)
-    arquivo_tcc         = Column('arquivo_tcc', LargeBinary, nullable=False)
+    # PDF legado gravado na própria tabela; os novos ficam no BlobStore (blob_key).
+    # Nunca é carregado junto com os metadados, só via crud.get_documento_arquivo
+    arquivo_tcc         = deferred(Column('arquivo_tcc', LargeBinary, nullable=True), raiseload=True)
+    blob_key            = Column('blob_key', String(64), nullable=True, index=True)
+    tamanho             = Column('tamanho', BigInteger, nullable=True)
+    sha256              = Column('sha256', String(64), nullable=True)
     contagem_passagens  = Column('contagem_passagens', Integer, nullable=True)
     published_at        = Column('published_at', DateTime(timezone=True), default=datetime.utcnow)
     status              = Column('status', String, nullable=True)
     autor_nome_curto    = Column('autor_nome_curto', String, nullable=False, index=True)
     autor_nome_completo = Column('autor_nome_completo', String, nullable=False)
+    # chave de idempotência da importação em lote (app.lote)
+    chave_importacao    = Column('chave_importacao', String, nullable=True, unique=True)
+
+    __table_args__ = (
+        # paginação por cursor e ordenação das listagens (app.paginacao)
+        Index('ix_documentos_published_at_id', published_at.desc(), id.desc()),
+    )
+
+# contagens por ano/departamento/orientador/grupo, mantidas pelas escritas do
+# crud (app.facetas); valor guarda o texto, inclusive para ano
+class FacetaDocumento(Base):
+    __tablename__ = 'documentos_facetas'
+    faceta = Column('faceta', String, primary_key=True)
+    valor  = Column('valor', String, primary_key=True)
+    total  = Column('total', BigInteger, nullable=False, default=0)
+
+    __table_args__ = (
+        Index('ix_documentos_facetas_faceta_total', faceta, total.desc()),
+    )
+
+# texto extraído do PDF (app.processamento), separado para as consultas de
+# metadados não carregarem nada disso; no Postgres há ainda a coluna gerada
+# busca (tsvector) com índice GIN, criada em app/migracoes.py. Sai junto com o
+# documento (ON DELETE CASCADE), inclusive se o worker gravar depois do DELETE
+class DocumentoTexto(Base):
+    __tablename__ = 'documento_texto'
+    documento_id = Column('documento_id', Integer, ForeignKey('documentos.id', ondelete='CASCADE'),
+                          primary_key=True)
+    texto        = Column('texto', Text, nullable=True)
+    paginas      = Column('paginas', Integer, nullable=True)
+    # PDF que não pôde ser lido; a linha existe para o backfill não insistir
+    erro         = Column('erro', Text, nullable=True)
+    extraido_em  = Column('extraido_em', DateTime(timezone=True), nullable=False)
+
+# fila durável de tarefas em segundo plano (app.jobs, app.worker)
+class Job(Base):
+    __tablename__ = 'jobs'
+    id            = Column(Integer, primary_key=True)
+    tipo          = Column('tipo', String, nullable=False)
+    documento_id  = Column('documento_id', Integer, nullable=True, index=True)
+    # pendente -> processando -> concluido | falhou (pendente de novo entre tentativas)
+    status        = Column('status', String, nullable=False, default='pendente')
+    tentativas    = Column('tentativas', Integer, nullable=False, default=0)
+    max_tentativas = Column('max_tentativas', Integer, nullable=False)
+    executar_em   = Column('executar_em', DateTime(timezone=True), nullable=False)
+    # prazo do worker que pegou o job; vencido, o job volta a ser elegível
+    travado_ate   = Column('travado_ate', DateTime(timezone=True), nullable=True)
+    erro          = Column('erro', Text, nullable=True)
+    criado_em     = Column('criado_em', DateTime(timezone=True), nullable=False)
+    atualizado_em = Column('atualizado_em', DateTime(timezone=True), nullable=False)
+
+    __table_args__ = (
+        Index('ix_jobs_status_executar_em', status, executar_em),
+    )
 
 class Usuario(Base):
     __tablename__ = 'usuarios'
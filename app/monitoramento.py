@@ -0,0 +1,35 @@
+# app/monitoramento.py
+#
+# Acesso às rotas de monitoramento (métricas, pool, caches, fila e admissão),
+# que expõem detalhes internos. Com MONITORAMENTO_TOKEN, só entram requisições
+# com "Authorization: Bearer <token>"; sem ele, as rotas ficam abertas em dev
+# e desligadas nos outros ambientes. Só as requisições autorizadas ficam fora
+# do controle de admissão (app.admissao).
+
+import hmac
+
+from fastapi import HTTPException, Request
+
+from . import config
+
+ROTAS = ("/metrics", "/metrics/perfis", "/pool", "/cache", "/cache/blobs", "/jobs", "/admissao")
+
+
+def habilitado() -> bool:
+    return bool(config.MONITORAMENTO_TOKEN) or config.AMBIENTE == "dev"
+
+
+def autorizado(cabecalho: str | None) -> bool:
+    if not config.MONITORAMENTO_TOKEN:
+        return config.AMBIENTE == "dev"
+    esquema, _, token = (cabecalho or "").partition(" ")
+    return esquema.lower() == "bearer" and hmac.compare_digest(
+        token.strip().encode(), config.MONITORAMENTO_TOKEN.encode())
+
+
+async def exigir(request: Request) -> None:
+    # dependência das rotas de monitoramento
+    if not habilitado():
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not autorizado(request.headers.get("authorization")):
+        raise HTTPException(status_code=401, detail="Não autenticado", headers={"WWW-Authenticate": "Bearer"})
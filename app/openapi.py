@@ -0,0 +1,25 @@
+# app/openapi.py
+#
+# Gera o schema OpenAPI da aplicação para ser servido pronto (config
+# OPENAPI_PRECOMPUTADO), sem montá-lo no primeiro acesso a /docs. Rodar no
+# build, depois de qualquer mudança nas rotas ou schemas.
+#
+# Uso: python -m app.openapi [--saida openapi.json]
+
+import argparse
+import json
+import sys
+
+from .main import create_app
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gera o schema OpenAPI da API.")
+    parser.add_argument("--saida", help="arquivo de saída (padrão: stdout)")
+    args = parser.parse_args()
+    schema = create_app(openapi_precomputado="").openapi()
+    texto = json.dumps(schema, ensure_ascii=False, indent=2)
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as arquivo:
+            arquivo.write(texto + "\n")
+    else:
+        sys.stdout.write(texto + "\n")
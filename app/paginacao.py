@@ -0,0 +1,65 @@
+# app/paginacao.py
+#
+# Paginação por cursor (keyset) sobre (published_at, id), a mesma ordem do
+# índice ix_documentos_published_at_id. O cursor é opaco para o cliente:
+# base64 do último (published_at, id) da página anterior.
+
+import base64
+import json
+from datetime import datetime
+
+from fastapi import Request, Response
+from sqlalchemy import desc, tuple_
+
+from .models import Documento
+
+# ordem estável de todas as listagens de documentos
+ORDEM_DOCUMENTOS = (desc(Documento.published_at), desc(Documento.id))
+
+
+class CursorInvalido(ValueError):
+    pass
+
+
+def codificar_cursor(published_at: datetime, documento_id: int) -> str:
+    bruto = json.dumps([published_at.isoformat(), documento_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(bruto.encode()).decode().rstrip("=")
+
+
+def decodificar_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        bruto = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        published_at, documento_id = json.loads(bruto)
+        return datetime.fromisoformat(published_at), int(documento_id)
+    except (ValueError, TypeError) as exc:
+        raise CursorInvalido(cursor) from exc
+
+
+def filtro_cursor(cursor: str):
+    # linhas estritamente depois do cursor na ordem (published_at desc, id desc)
+    published_at, documento_id = decodificar_cursor(cursor)
+    return tuple_(Documento.published_at, Documento.id) < tuple_(published_at, documento_id)
+
+
+def filtro_posterior(published_at: datetime, documento_id: int | None = None):
+    # linhas depois de (published_at, id) na ordem crescente da exportação;
+    # sem o id, só as de published_at posterior (empates nessa data ficam de fora)
+    if documento_id is None:
+        return Documento.published_at > published_at
+    return tuple_(Documento.published_at, Documento.id) > tuple_(published_at, documento_id)
+
+
+def proximo_cursor(itens: list, limit: int) -> str | None:
+    if limit <= 0 or len(itens) < limit:
+        return None
+    ultimo = itens[-1]
+    return codificar_cursor(ultimo.published_at, ultimo.id)
+
+
+def anunciar_proxima_pagina(request: Request, response: Response, cursor: str | None) -> None:
+    # Link (RFC 8288) e X-Next-Cursor; o corpo continua sendo a lista de sempre
+    if cursor is None:
+        return
+    url = request.url.remove_query_params("skip").include_query_params(cursor=cursor)
+    response.headers["Link"] = f'<{url}>; rel="next"'
+    response.headers["X-Next-Cursor"] = cursor
@@ -0,0 +1,75 @@
+# app/processamento.py
+#
+# Etapas de CPU do processamento dos PDFs, executadas num pool de processos
+# pelo app.worker e pelo app.indexar_texto. Funções puras e sem dependências
+# do resto da aplicação: o processo filho (spawn) importa só este módulo.
+
+import hashlib
+import io
+import re
+import time
+from functools import lru_cache
+
+TAMANHO_BLOCO = 1024 * 1024
+
+# objetos de página (/Type /Page, não /Pages) fora de object streams
+_PAGINA = re.compile(rb"/Type\s*/Page(?![A-Za-z])")
+
+
+@lru_cache(maxsize=1)
+def _leitor_pdf():
+    # importado só no processo que extrai o texto: a API importa este módulo
+    # para mandar a função ao pool e não precisa pagar a importação do pypdf
+    try:
+        from pypdf import PdfReader
+    except ImportError:  # dependência opcional: sem ela não há extração de texto
+        return None
+    return PdfReader
+
+
+def analisar_pdf(origem: str | bytes, texto_maximo: int | None = None) -> dict:
+    # `origem` é o caminho do arquivo (BlobStore local, sem copiar o PDF entre
+    # processos) ou o próprio conteúdo (S3 e PDFs legados). Com `texto_maximo`
+    # e o pypdf instalado, extrai também o texto (truncado nesse número de
+    # caracteres). `cpu_s` é o tempo de CPU gasto, para medir páginas/s/núcleo.
+    inicio = time.process_time()
+    if isinstance(origem, str):
+        with open(origem, "rb") as arquivo:
+            conteudo = arquivo.read()
+    else:
+        conteudo = origem
+    sha256 = hashlib.sha256()
+    for posicao in range(0, len(conteudo), TAMANHO_BLOCO):
+        sha256.update(conteudo[posicao:posicao + TAMANHO_BLOCO])
+
+    # PDFs com as páginas em object streams comprimidos não expõem os objetos
+    paginas = len(_PAGINA.findall(conteudo)) or None
+    texto = erro = None
+    if texto_maximo is not None and _leitor_pdf() is not None:
+        try:
+            texto, paginas = _extrair_texto(conteudo, texto_maximo)
+        except Exception as exc:  # PDF que o pypdf não consegue ler
+            erro = repr(exc)[:2000]
+
+    return {
+        "sha256": sha256.hexdigest(),
+        "tamanho": len(conteudo),
+        "paginas": paginas,
+        "texto": texto,
+        "erro": erro,
+        "cpu_s": time.process_time() - inicio,
+    }
+
+
+def _extrair_texto(conteudo: bytes, texto_maximo: int) -> tuple[str, int]:
+    leitor = _leitor_pdf()(io.BytesIO(conteudo))
+    partes, tamanho = [], 0
+    for pagina in leitor.pages:
+        if tamanho >= texto_maximo:
+            break
+        parte = pagina.extract_text() or ""
+        partes.append(parte)
+        tamanho += len(parte) + 1
+    # o Postgres não aceita NUL em text
+    texto = "\n".join(partes)[:texto_maximo].replace("\x00", "")
+    return texto, len(leitor.pages)
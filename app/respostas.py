@@ -0,0 +1,37 @@
+# app/respostas.py
+#
+# Caminho rápido das respostas de listagem (/documentos/, /recentes, /buscar).
+# As rotas continuam declarando response_model, então o OpenAPI não muda, mas
+# devolvem direto uma RespostaJSON: o FastAPI não valida de novo cada item nem
+# passa pelo jsonable_encoder. As linhas vêm do crud como Row (tuplas com os
+# metadados), viram dicts com um zip pelos nomes das colunas e são codificadas
+# de uma vez pelo pydantic-core, o mesmo serializador do response_model: o
+# JSON sai idêntico.
+
+from typing import Any
+
+from fastapi import Response
+from pydantic_core import to_json
+from sqlalchemy.engine import Row
+
+
+class RespostaJSON(Response):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return to_json(content)
+
+
+def como_dicts(itens: list) -> list:
+    # Row -> dict; schemas (vindos do cache) e dicts passam como estão
+    if not itens or not isinstance(itens[0], Row):
+        return itens
+    campos = itens[0]._fields
+    return [dict(zip(campos, item)) for item in itens]
+
+
+def resposta_json(response: Response, itens: list) -> RespostaJSON:
+    # Leva os cabeçalhos já definidos no `response` da rota (Link,
+    # X-Total-Count...), que o FastAPI só aplica quando a rota não devolve
+    # um Response próprio.
+    return RespostaJSON(como_dicts(itens), status_code=response.status_code or 200, headers=response.headers)
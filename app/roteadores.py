@@ -0,0 +1,63 @@
+# app/roteadores.py
+#
+# Inclusão preguiçosa de routers pouco usados: no lugar do APIRouter fica uma
+# rota que casa com todo o prefixo e, na primeira requisição, importa o
+# módulo, inclui o router de verdade na mesma posição e repassa a requisição.
+# Assim a importação do módulo (e das dependências dele, como passlib e
+# email-validator no caso de /usuarios) e a montagem das rotas pelo FastAPI
+# saem da partida do worker.
+
+import importlib
+
+from fastapi import FastAPI
+from starlette.routing import BaseRoute, Match
+
+
+class RoteadorPreguicoso(BaseRoute):
+    def __init__(self, app: FastAPI, prefixo: str, modulo: str):
+        self.app = app
+        self.prefixo = prefixo
+        self.modulo = modulo
+
+    def matches(self, scope):
+        if scope["type"] == "http" and (scope["path"] == self.prefixo or scope["path"].startswith(self.prefixo + "/")):
+            return Match.FULL, {}
+        return Match.NONE, {}
+
+    def url_path_for(self, name: str, /, **path_params):
+        carregar(self.app)
+        return self.app.router.url_path_for(name, **path_params)
+
+    def carregar(self) -> None:
+        rotas = self.app.router.routes
+        if self not in rotas:
+            return
+        router = importlib.import_module(self.modulo, "app").router
+        posicao = rotas.index(self)
+        del rotas[posicao]
+        total = len(rotas)
+        self.app.include_router(router)
+        # include_router acrescenta no fim; as rotas vão para o lugar deste
+        novas = rotas[total:]
+        del rotas[total:]
+        rotas[posicao:posicao] = novas
+
+    async def handle(self, scope, receive, send):
+        self.carregar()
+        # casa de novo, agora com as rotas do router
+        await self.app.router(scope, receive, send)
+
+
+def incluir(app: FastAPI, modulo: str) -> None:
+    app.include_router(importlib.import_module(modulo, "app").router)
+
+
+def incluir_preguicoso(app: FastAPI, prefixo: str, modulo: str) -> None:
+    app.router.routes.append(RoteadorPreguicoso(app, prefixo, modulo))
+
+
+def carregar(app: FastAPI) -> None:
+    # antes de gerar o OpenAPI: o schema precisa de todas as rotas
+    for rota in list(app.router.routes):
+        if isinstance(rota, RoteadorPreguicoso):
+            rota.carregar()
@@ -1,10 +1,18 @@
-from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, Query
-from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, Query, Request, Response
 from fastapi.responses import StreamingResponse
-import io
+from typing import Literal
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime
 
-from .. import crud, schemas
+from .. import cache_blobs, config, crud, schemas
+from ..lote import PacoteInvalido, importar_pacote
+from ..download import TAMANHO_BLOCO, responder_download
+from ..exportacao import TIPOS_CONTEUDO, exportar
+from ..facetas import FACETAS
+from ..paginacao import CursorInvalido, anunciar_proxima_pagina, proximo_cursor
+from ..respostas import resposta_json
+from ..storage import get_blob_store
+from ..upload import receber_pdf
 from ..database import get_db
 
 router = APIRouter(prefix="/documentos", tags=["documentos"])
@@ -13,7 +21,8 @@ router = APIRouter(prefix="/documentos", tags=["documentos"])
     "/upload",
     response_model=schemas.DocumentoOut,
     summary="Enviar novo documento",
-    description="Faz upload de um PDF de TCC e retorna o ID, nome do arquivo e tcc_id."
+    description="Faz upload de um PDF de TCC e retorna o ID, nome do arquivo e tcc_id. "
+                "Arquivos que não são PDF ou que passam do tamanho máximo são recusados."
 )
 async def upload_documento(
     titprinc: str = Query(..., alias="titprinc"),
@@ -29,9 +38,6 @@ async def upload_documento(
     file: UploadFile = File(...),
     db: AsyncSession = Depends(get_db)
 ):
-    # Lê bytes do PDF
-    content = await file.read()
-
     # Monta o schema de entrada com campos da requisição
     doc_in = schemas.DocumentoCreate(
         titprinc=titprinc,
@@ -46,8 +52,19 @@ async def upload_documento(
         autor_nome_completo=autor_nome_completo,
     )
 
-    # Chamada corrigida: passa db, content e doc_in
-    created = await crud.create_documento(db, content, doc_in)
+    # Lê o PDF em blocos (validando assinatura e tamanho e calculando o SHA-256),
+    # gravando direto no BlobStore
+    store = get_blob_store()
+    blob = await receber_pdf(file, store)
+    try:
+        created = await crud.create_documento(db, blob, doc_in)
+    except crud.BlobRemovido:
+        # o conteúdo deduplicado sumiu numa remoção concorrente; nada foi gravado
+        raise HTTPException(status_code=409, detail="Conteúdo removido durante o envio; envie o arquivo de novo")
+    except Exception:
+        await db.rollback()
+        await crud.remover_blob_sem_referencia(db, blob.chave)
+        raise
 
     return schemas.DocumentoOut(
         id=created.id,
@@ -55,18 +72,67 @@ async def upload_documento(
         tcc_id=created.id
     )
 
+@router.post(
+    "/lote",
+    response_model=schemas.LoteResponse,
+    summary="Importar lote de documentos",
+    description="Importa um pacote ZIP ou TAR com PDFs e um manifesto (`manifesto.csv` ou `manifesto.json`) "
+                "com os mesmos campos do upload (`titprinc`, `ano`, ...), mais `arquivo` (caminho no pacote) "
+                "e `chave` opcional de idempotência. Itens já importados são ignorados, então o mesmo pacote "
+                "pode ser reenviado após uma falha. Retorna o resultado de cada item."
+)
+async def importar_lote(
+    pacote: UploadFile = File(...),
+    tamanho_lote: int = Query(config.LOTE_TAMANHO_TRANSACAO, ge=1, le=5000, description="Documentos por transação"),
+    db: AsyncSession = Depends(get_db)
+):
+    try:
+        resultado = await importar_pacote(db, pacote.file, tamanho_lote)
+    except PacoteInvalido as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return schemas.LoteResponse(**resultado.resumo(), itens=[vars(item) for item in resultado.itens])
+
 @router.get(
     "/",
     response_model=list[schemas.DocumentoResponse],
     summary="Listar documentos",
-    description="Retorna todos os documentos, ordenados do mais recente ao mais antigo."
+    description="Retorna todos os documentos, ordenados do mais recente ao mais antigo. "
+                "Quando há mais páginas, o cursor da próxima vem nos cabeçalhos `Link` (rel=\"next\") e `X-Next-Cursor`. "
+                "Com `incluir_total=true`, o total de documentos vem em `X-Total-Count` (no Postgres, uma estimativa)."
 )
 async def list_documentos(
+    request: Request,
+    response: Response,
     skip: int = Query(0),
     limit: int = Query(10),
+    cursor: str | None = Query(None, description="Cursor da próxima página (de `X-Next-Cursor`)"),
+    incluir_total: bool = Query(False, description="Informa o total no cabeçalho `X-Total-Count`"),
+    db: AsyncSession = Depends(get_db)
+):
+    try:
+        docs = await crud.list_documentos_cacheado(db, skip, limit, cursor)
+    except CursorInvalido:
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+    anunciar_proxima_pagina(request, response, proximo_cursor(docs, limit))
+    if incluir_total:
+        response.headers["X-Total-Count"] = str(await crud.total_documentos_cacheado(db))
+    return resposta_json(response, docs)
+
+@router.get(
+    "/facetas",
+    response_model=schemas.FacetasResponse,
+    summary="Contagens por faceta",
+    description="Retorna o total de documentos e, para cada faceta (`ano`, `departamento`, `orientador`, "
+                "`grupo_instrucao`), os valores mais frequentes com suas contagens, do maior para o menor. "
+                "No Postgres, `total` é uma estimativa."
+)
+async def facetas(
+    faceta: list[Literal[tuple(FACETAS)]] | None = Query(None, description="Facetas desejadas (padrão: todas)"),
+    limite: int = Query(20, ge=1, le=1000, description="Valores por faceta"),
     db: AsyncSession = Depends(get_db)
 ):
-    return await crud.list_documentos(db, skip, limit)
+    nomes = tuple(dict.fromkeys(faceta)) if faceta else tuple(FACETAS)
+    return await crud.contar_facetas_cacheado(db, nomes, limite)
 
 @router.get(
     "/recentes",
@@ -75,18 +141,27 @@ async def list_documentos(
     description="Retorna os documentos mais recentes, limitado pelo parâmetro `limit`."
 )
 async def recentes(
+    response: Response,
     limit: int = Query(10),
     db: AsyncSession = Depends(get_db)
 ):
-    return await crud.list_recent(db, limit)
+    return resposta_json(response, await crud.list_recent_cacheado(db, limit))
 
 @router.get(
     "/buscar",
-    response_model=list[schemas.DocumentoResponse],
+    response_model=list[schemas.DocumentoBuscaResponse],
     summary="Buscar documentos",
-    description="Busca documentos por quaisquer campos informados e retorna lista ordenada do mais recente ao mais antigo."
+    description="Busca documentos por quaisquer campos informados e retorna lista ordenada do mais recente ao mais antigo. "
+                "Com `q`, faz busca textual em título, subtítulo, autor, orientador e departamento e ordena por relevância. "
+                "Com `conteudo`, busca no texto dos PDFs, ordena por relevância e retorna em `trecho` "
+                "as passagens encontradas, com os termos entre `<mark>`. "
+                "Sem `q` e sem `conteudo`, o cursor da próxima página vem nos cabeçalhos `Link` e `X-Next-Cursor`."
 )
 async def buscar(
+    request: Request,
+    response: Response,
+    q: str | None = Query(None, description="Texto livre (aceita \"frase exata\", OR e -exclusão)"),
+    conteudo: str | None = Query(None, description="Texto livre buscado dentro dos PDFs (mesma sintaxe de `q`)"),
     titprinc: str | None = Query(None, alias="titprinc"),
     subtitu: str | None = Query(None, alias="subtitu"),
     ano: int | None = Query(None, alias="ano"),
@@ -99,13 +174,55 @@ async def buscar(
     autor_nome_completo: str | None = Query(None, alias="autor_nome_completo"),
     skip: int = Query(0),
     limit: int = Query(10),
+    cursor: str | None = Query(None, description="Cursor da próxima página (de `X-Next-Cursor`); não combina com `q` nem `conteudo`"),
+    incluir_total: bool = Query(False, description="Informa o total de resultados no cabeçalho `X-Total-Count`"),
     db: AsyncSession = Depends(get_db)
 ):
-    return await crud.search_documentos(
-        db, titprinc, subtitu, ano, arcurdepto, dtdefesa,
-        nomorienta, grintruc, contpass,
-        autor_nome_curto, autor_nome_completo,
-        skip, limit
+    if (q or conteudo) and cursor:
+        raise HTTPException(status_code=400, detail="`cursor` não pode ser usado junto com `q` ou `conteudo`")
+    try:
+        docs = await crud.search_documentos(
+            db, titprinc, subtitu, ano, arcurdepto, dtdefesa,
+            nomorienta, grintruc, contpass,
+            autor_nome_curto, autor_nome_completo,
+            skip, limit, q=q, cursor=cursor, conteudo=conteudo,
+        )
+    except CursorInvalido:
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+    if not q and not conteudo:
+        anunciar_proxima_pagina(request, response, proximo_cursor(docs, limit))
+    if incluir_total:
+        total = await crud.contar_documentos(
+            db, titprinc, subtitu, ano, arcurdepto, dtdefesa,
+            nomorienta, grintruc, contpass,
+            autor_nome_curto, autor_nome_completo, q=q, conteudo=conteudo,
+        )
+        response.headers["X-Total-Count"] = str(total)
+    return resposta_json(response, docs)
+
+@router.get(
+    "/export",
+    summary="Exportar metadados",
+    description="Exporta os metadados de todos os documentos em NDJSON ou CSV, em ordem de publicação, "
+                "num único download em streaming. Para sincronização incremental, `since` e `since_id` "
+                "recebem `published_at` e `id` da última linha já exportada, e a exportação continua "
+                "dela (documentos com o mesmo `published_at` vêm pelo `id`). Com `gzip=true`, a resposta vem comprimida."
+)
+async def exportar_documentos(
+    format: Literal["ndjson", "csv"] = Query("ndjson"),
+    since: datetime | None = Query(None, description="Exporta só documentos publicados depois deste `published_at`"),
+    since_id: int | None = Query(None, description="Com `since`: `id` da última linha exportada, para os empates em `published_at`"),
+    gzip: bool = Query(False),
+):
+    if since_id is not None and since is None:
+        raise HTTPException(status_code=400, detail="`since_id` exige `since`")
+    headers = {"Content-Disposition": f"attachment; filename=\"documentos.{format}\""}
+    if gzip:
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(
+        exportar(format, since, comprimir=gzip, since_id=since_id),
+        media_type=TIPOS_CONTEUDO[format],
+        headers=headers,
     )
 
 @router.get(
@@ -115,7 +232,7 @@ async def buscar(
     description="Retorna os metadados de um documento específico através do seu ID."
 )
 async def get_doc(documento_id: int, db: AsyncSession = Depends(get_db)):
-    doc = await crud.get_documento(db, documento_id)
+    doc = await crud.get_documento_cacheado(db, documento_id)
     if not doc:
         raise HTTPException(status_code=404, detail="Documento não encontrado")
     return doc
@@ -123,16 +240,33 @@ async def get_doc(documento_id: int, db: AsyncSession = Depends(get_db)):
 @router.get(
     "/{documento_id}/download",
     summary="Download do documento",
-    description="Faz download do arquivo PDF do TCC."
+    description="Faz download do arquivo PDF do TCC. Suporta `Range`, `If-None-Match` e `If-Modified-Since`."
 )
-async def download_documento(documento_id: int, db: AsyncSession = Depends(get_db)):
-    doc = await crud.get_documento(db, documento_id)
-    if not doc or not doc.arquivo_tcc:
+async def download_documento(documento_id: int, request: Request, db: AsyncSession = Depends(get_db)):
+    info = await crud.get_documento_download_cacheado(db, documento_id)
+    if not info or not info.tamanho:
         raise HTTPException(status_code=404, detail="Arquivo não encontrado")
-    return StreamingResponse(
-        io.BytesIO(doc.arquivo_tcc),
-        media_type="application/pdf",
-        headers={"Content-Disposition": f"attachment; filename=\"tcc_{documento_id}.pdf\""}
+    if info.blob_key:
+        store = get_blob_store()
+        ler = lambda inicio, fim: store.ler(info.blob_key, inicio, fim, TAMANHO_BLOCO)
+        caminho = store.caminho_local(info.blob_key)
+        chave = info.blob_key
+    else:
+        # linha legada, com o PDF ainda em arquivo_tcc
+        ler = lambda inicio, fim: crud.iter_documento_arquivo(documento_id, inicio, fim)
+        caminho = None
+        chave = cache_blobs.chave_legado(documento_id)
+    if caminho is None:
+        # S3 e arquivo_tcc: PDFs populares saem da memória (app.cache_blobs)
+        ler = cache_blobs.blobs.leitor(chave, info.tamanho, ler, TAMANHO_BLOCO)
+    return responder_download(
+        request,
+        tamanho=info.tamanho,
+        sha256=info.sha256,
+        published_at=info.published_at,
+        ler=ler,
+        filename=f"tcc_{documento_id}.pdf",
+        caminho=caminho,
     )
 
 @router.put(
@@ -2,6 +2,8 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from .. import crud, schemas
+from ..auth import UsuarioToken, emitir_token, usuario_atual
+from ..config import TOKEN_TTL
 from ..database import get_db
 
 router = APIRouter(prefix="/usuarios", tags=["usuarios"])
@@ -17,11 +19,10 @@ async def create_usuario(
     usuario_in: schemas.UsuarioCreate,
     db: AsyncSession = Depends(get_db)
 ):
-    # verifica duplicidade de e-mail
-    existing = await crud.get_usuario_por_email(db, usuario_in.email)
-    if existing:
-        raise HTTPException(status_code=400, detail="E-mail já cadastrado")
+    # duplicidade de e-mail resolvida no próprio INSERT (ON CONFLICT)
     user = await crud.create_usuario(db, usuario_in)
+    if not user:
+        raise HTTPException(status_code=400, detail="E-mail já cadastrado")
     return user
 
 
@@ -37,6 +38,41 @@ async def list_usuarios(
     return await crud.list_usuarios(db, skip, limit)
 
 
+@router.post(
+    "/login",
+    response_model=schemas.TokenResponse,
+    summary="Login",
+    description="Verifica e-mail e senha e devolve um token de acesso para o cabeçalho `Authorization: Bearer`."
+)
+async def login(
+    credenciais: schemas.UsuarioLogin,
+    db: AsyncSession = Depends(get_db)
+):
+    user = await crud.autenticar_usuario(db, credenciais.email, credenciais.senha)
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="E-mail ou senha inválidos",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return schemas.TokenResponse(access_token=emitir_token(user.id, user.tipo), expires_in=TOKEN_TTL)
+
+
+@router.get(
+    "/me",
+    response_model=schemas.UsuarioResponse,
+    summary="Usuário autenticado"
+)
+async def get_me(
+    atual: UsuarioToken = Depends(usuario_atual),
+    db: AsyncSession = Depends(get_db)
+):
+    user = await crud.get_usuario(db, atual.id)
+    if not user:
+        raise HTTPException(status_code=404, detail="Usuário não encontrado")
+    return user
+
+
 @router.get(
     "/{usuario_id}",
     response_model=schemas.UsuarioResponse,
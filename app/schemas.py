@@ -39,6 +39,12 @@ class DocumentoResponse(BaseModel):
         from_attributes = True
 
 
+# resultado de /documentos/buscar: com `conteudo`, traz o trecho do PDF
+# onde os termos aparecem, entre <mark>
+class DocumentoBuscaResponse(DocumentoResponse):
+    trecho: Optional[str]               = None
+
+
 # usado apenas na rota de upload para retorno
 class DocumentoOut(BaseModel):
     id: int
@@ -49,12 +55,47 @@ class DocumentoOut(BaseModel):
         from_attributes = True
 
 
+# retorno da importação em lote (/documentos/lote)
+class ItemLoteResponse(BaseModel):
+    chave: str
+    arquivo: str
+    status: str
+    id: Optional[int] = None
+    erro: Optional[str] = None
+
+
+class LoteResponse(BaseModel):
+    total: int
+    criados: int
+    ignorados: int
+    erros: int
+    duracao_s: float
+    documentos_por_segundo: Optional[float] = None
+    itens: list[ItemLoteResponse]
+
+
+# contagens por faceta (/documentos/facetas)
+class ValorFacetaResponse(BaseModel):
+    valor: str
+    total: int
+
+
+class FacetasResponse(BaseModel):
+    total: int
+    facetas: dict[str, list[ValorFacetaResponse]]
+
+
 # --- Schemas para Usuario ---
 
 class UsuarioBase(BaseModel):
     nome: str
     email: EmailStr
 
+    class Config:
+        # validação montada no primeiro uso: o email-validator só é importado
+        # quando o router de usuários é carregado
+        defer_build = True
+
 
 class UsuarioCreate(UsuarioBase):
     senha: str = Field(..., min_length=6)
@@ -83,3 +124,12 @@ class UsuarioResponse(UsuarioBase):
 class UsuarioLogin(BaseModel):
     email: EmailStr
     senha: str
+
+    class Config:
+        defer_build = True
+
+
+class TokenResponse(BaseModel):
+    access_token: str
+    token_type: str = "bearer"
+    expires_in: int
@@ -0,0 +1,99 @@
+# app/seguranca.py
+#
+# Hash e verificação de senha com bcrypt fora do event loop. Cada operação
+# custa de 100 a 300 ms de CPU; rodando direto na rota ela trava todas as
+# outras requisições. Aqui elas vão para um pool de threads de tamanho fixo
+# (o bcrypt libera o GIL) com fila limitada: quando a fila enche, a API
+# responde 503 em vez de acumular espera.
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Callable, TypeVar
+
+from . import config
+
+T = TypeVar("T")
+
+
+@lru_cache(maxsize=1)
+def contexto_senhas():
+    # contexto de hashing de senha, criado no primeiro uso: o passlib só é
+    # importado quando alguém cadastra ou faz login
+    from passlib.context import CryptContext
+
+    return CryptContext(
+        schemes=["bcrypt"],
+        deprecated="auto",
+        bcrypt__rounds=config.BCRYPT_ROUNDS,
+    )
+
+
+class PoolSenhasSaturado(Exception):
+    pass
+
+
+class PoolSenhas:
+    def __init__(self, max_workers: int, max_fila: int):
+        self.max_workers = max_workers
+        self.max_fila = max_fila
+        self.pendentes = 0
+        self.recusados = 0
+        # criado no primeiro uso e descartado em encerrar(): um novo lifespan
+        # (testes, reload do uvicorn) ganha um executor novo em vez de um
+        # já desligado
+        self._executor: ThreadPoolExecutor | None = None
+
+    def _obter_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="senhas")
+        return self._executor
+
+    async def executar(self, fn: Callable[..., T], *args) -> T:
+        # o contador só é alterado no event loop, então não precisa de lock
+        if self.pendentes >= self.max_workers + self.max_fila:
+            self.recusados += 1
+            raise PoolSenhasSaturado()
+        self.pendentes += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._obter_executor(), fn, *args)
+        finally:
+            self.pendentes -= 1
+
+    def encerrar(self) -> None:
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+pool_senhas = PoolSenhas(config.HASH_WORKERS, config.HASH_FILA_MAXIMA)
+
+
+async def gerar_hash(senha: str) -> str:
+    return await pool_senhas.executar(_gerar_hash, senha)
+
+
+async def verificar_senha(senha: str, senha_hash: str | None) -> bool:
+    if senha_hash is None:
+        # e-mail inexistente: verifica contra um hash fixo para o tempo de
+        # resposta não revelar quais e-mails estão cadastrados
+        await pool_senhas.executar(_verificar_hash_falso, senha)
+        return False
+    return await pool_senhas.executar(_verificar_hash, senha, senha_hash)
+
+
+@lru_cache(maxsize=1)
+def _hash_falso() -> str:
+    return _gerar_hash("senha-inexistente")
+
+
+def _verificar_hash_falso(senha: str) -> bool:
+    return _verificar_hash(senha, _hash_falso())
+
+
+def _gerar_hash(senha: str) -> str:
+    return contexto_senhas().hash(senha)
+
+
+def _verificar_hash(senha: str, senha_hash: str) -> bool:
+    return contexto_senhas().verify(senha, senha_hash)
@@ -0,0 +1,239 @@
+# app/storage.py
+#
+# Armazenamento dos PDFs fora da tabela documentos, endereçado pelo SHA-256 do
+# conteúdo: uploads idênticos viram o mesmo blob. Há um backend em disco local
+# e um compatível com S3 (AWS, MinIO etc., via S3_ENDPOINT_URL).
+
+import asyncio
+import hashlib
+import os
+import tempfile
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import AsyncIterator, IO
+
+from . import config
+
+
+@dataclass(frozen=True)
+class BlobInfo:
+    chave: str
+    tamanho: int
+    sha256: str
+
+
+class EscritorBlob(ABC):
+    # Recebe o conteúdo em blocos, calculando hash e tamanho no caminho, e só
+    # publica o blob em concluir(), quando a chave (o SHA-256) é conhecida.
+
+    def __init__(self):
+        self._hash = hashlib.sha256()
+        self.tamanho = 0
+
+    async def escrever(self, bloco: bytes) -> None:
+        self._hash.update(bloco)
+        self.tamanho += len(bloco)
+        await self._escrever(bloco)
+
+    @property
+    def sha256(self) -> str:
+        return self._hash.hexdigest()
+
+    @abstractmethod
+    async def _escrever(self, bloco: bytes) -> None: ...
+
+    @abstractmethod
+    async def concluir(self) -> BlobInfo: ...
+
+    @abstractmethod
+    async def descartar(self) -> None: ...
+
+
+class BlobStore(ABC):
+    @abstractmethod
+    def novo_escritor(self) -> EscritorBlob: ...
+
+    @abstractmethod
+    def ler(self, chave: str, inicio: int, fim: int, tamanho_bloco: int) -> AsyncIterator[bytes]: ...
+
+    @abstractmethod
+    async def remover(self, chave: str) -> None: ...
+
+    @abstractmethod
+    async def existe(self, chave: str) -> bool: ...
+
+    def caminho_local(self, chave: str) -> str | None:
+        # caminho no disco quando o backend permite envio zero-copy
+        return None
+
+
+def _ler_trecho(arquivo: IO[bytes], tamanho: int) -> bytes:
+    return arquivo.read(tamanho)
+
+
+# ------------------------
+# Backend em disco local
+# ------------------------
+
+class _EscritorLocal(EscritorBlob):
+    def __init__(self, store: "LocalBlobStore"):
+        super().__init__()
+        self._store = store
+        fd, self._tmp = tempfile.mkstemp(dir=store.dir_tmp, suffix=".part")
+        self._arquivo = os.fdopen(fd, "wb")
+
+    async def _escrever(self, bloco: bytes) -> None:
+        await asyncio.to_thread(self._arquivo.write, bloco)
+
+    async def concluir(self) -> BlobInfo:
+        chave = self.sha256
+        destino = self._store.caminho(chave)
+
+        def publicar():
+            self._arquivo.flush()
+            os.fsync(self._arquivo.fileno())
+            self._arquivo.close()
+            if os.path.exists(destino):
+                # conteúdo já armazenado: deduplica
+                os.unlink(self._tmp)
+                return
+            os.makedirs(os.path.dirname(destino), exist_ok=True)
+            os.replace(self._tmp, destino)
+
+        await asyncio.to_thread(publicar)
+        return BlobInfo(chave=chave, tamanho=self.tamanho, sha256=chave)
+
+    async def descartar(self) -> None:
+        def apagar():
+            self._arquivo.close()
+            if os.path.exists(self._tmp):
+                os.unlink(self._tmp)
+
+        await asyncio.to_thread(apagar)
+
+
+class LocalBlobStore(BlobStore):
+    # Layout: <raiz>/ab/cd/abcd...; <raiz>/tmp guarda os envios em andamento,
+    # no mesmo sistema de arquivos para o rename ser atômico.
+
+    def __init__(self, raiz: str):
+        self.raiz = os.path.abspath(raiz)
+        self.dir_tmp = os.path.join(self.raiz, "tmp")
+        os.makedirs(self.dir_tmp, exist_ok=True)
+
+    def caminho(self, chave: str) -> str:
+        return os.path.join(self.raiz, chave[:2], chave[2:4], chave)
+
+    def caminho_local(self, chave: str) -> str | None:
+        return self.caminho(chave)
+
+    def novo_escritor(self) -> EscritorBlob:
+        return _EscritorLocal(self)
+
+    async def ler(self, chave: str, inicio: int, fim: int, tamanho_bloco: int) -> AsyncIterator[bytes]:
+        arquivo = await asyncio.to_thread(open, self.caminho(chave), "rb")
+        try:
+            arquivo.seek(inicio)
+            restante = fim - inicio + 1
+            while restante > 0:
+                bloco = await asyncio.to_thread(_ler_trecho, arquivo, min(tamanho_bloco, restante))
+                if not bloco:
+                    break
+                restante -= len(bloco)
+                yield bloco
+        finally:
+            arquivo.close()
+
+    async def remover(self, chave: str) -> None:
+        try:
+            await asyncio.to_thread(os.unlink, self.caminho(chave))
+        except FileNotFoundError:
+            pass
+
+    async def existe(self, chave: str) -> bool:
+        return await asyncio.to_thread(os.path.exists, self.caminho(chave))
+
+
+# ------------------------
+# Backend compatível com S3
+# ------------------------
+
+class _EscritorS3(EscritorBlob):
+    # A chave só é conhecida no fim, então o conteúdo passa por um arquivo
+    # temporário e sobe com upload_fileobj (multipart para arquivos grandes).
+
+    def __init__(self, store: "S3BlobStore"):
+        super().__init__()
+        self._store = store
+        self._arquivo = tempfile.TemporaryFile()
+
+    async def _escrever(self, bloco: bytes) -> None:
+        await asyncio.to_thread(self._arquivo.write, bloco)
+
+    async def concluir(self) -> BlobInfo:
+        chave = self.sha256
+        try:
+            if not await self._store.existe(chave):
+                self._arquivo.seek(0)
+                await asyncio.to_thread(
+                    self._store.client.upload_fileobj,
+                    self._arquivo, self._store.bucket, self._store.objeto(chave),
+                    ExtraArgs={"ContentType": "application/pdf"},
+                )
+        finally:
+            self._arquivo.close()
+        return BlobInfo(chave=chave, tamanho=self.tamanho, sha256=chave)
+
+    async def descartar(self) -> None:
+        self._arquivo.close()
+
+
+class S3BlobStore(BlobStore):
+    def __init__(self, bucket: str, prefixo: str = "", endpoint_url: str | None = None):
+        try:
+            import boto3
+        except ImportError as exc:
+            raise RuntimeError("O backend S3 requer o pacote boto3 (requirements-extras.txt)") from exc
+        self.bucket = bucket
+        self.prefixo = prefixo
+        self.client = boto3.client("s3", endpoint_url=endpoint_url)
+
+    def objeto(self, chave: str) -> str:
+        return f"{self.prefixo}{chave[:2]}/{chave[2:4]}/{chave}"
+
+    def novo_escritor(self) -> EscritorBlob:
+        return _EscritorS3(self)
+
+    async def ler(self, chave: str, inicio: int, fim: int, tamanho_bloco: int) -> AsyncIterator[bytes]:
+        resposta = await asyncio.to_thread(
+            self.client.get_object,
+            Bucket=self.bucket, Key=self.objeto(chave), Range=f"bytes={inicio}-{fim}",
+        )
+        corpo = resposta["Body"]
+        try:
+            while bloco := await asyncio.to_thread(corpo.read, tamanho_bloco):
+                yield bloco
+        finally:
+            corpo.close()
+
+    async def remover(self, chave: str) -> None:
+        await asyncio.to_thread(self.client.delete_object, Bucket=self.bucket, Key=self.objeto(chave))
+
+    async def existe(self, chave: str) -> bool:
+        from botocore.exceptions import ClientError
+
+        try:
+            await asyncio.to_thread(self.client.head_object, Bucket=self.bucket, Key=self.objeto(chave))
+        except ClientError as exc:
+            if exc.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+        return True
+
+
+@lru_cache
+def get_blob_store() -> BlobStore:
+    if config.ARMAZENAMENTO == "s3":
+        return S3BlobStore(config.S3_BUCKET, config.S3_PREFIXO, config.S3_ENDPOINT_URL)
+    return LocalBlobStore(config.ARMAZENAMENTO_DIR)
@@ -0,0 +1,164 @@
+# app/upload.py
+#
+# Recebimento de PDFs em blocos: valida o cabeçalho do arquivo no primeiro
+# bloco, calcula SHA-256 e tamanho durante a leitura, recusa o envio assim que
+# passa do limite e grava cada bloco direto no BlobStore, sem montar o arquivo
+# inteiro em memória.
+
+from typing import Protocol
+
+from fastapi import HTTPException
+
+from . import config
+from .storage import BlobInfo, BlobStore
+
+ASSINATURA_PDF = b"%PDF-"
+
+# folga para boundaries e campos do multipart além do próprio arquivo
+FOLGA_MULTIPART = 64 * 1024
+
+
+class LeitorArquivo(Protocol):
+    # UploadFile ou qualquer fonte com read() assíncrono (ex.: entradas de app.lote)
+    async def read(self, size: int = -1) -> bytes: ...
+
+
+def _muito_grande(tamanho_maximo: int) -> HTTPException:
+    return HTTPException(
+        status_code=413,
+        detail=f"Arquivo excede o tamanho máximo de {tamanho_maximo} bytes",
+    )
+
+
+def _nao_pdf() -> HTTPException:
+    return HTTPException(status_code=415, detail="O arquivo enviado não é um PDF")
+
+
+async def receber_pdf(
+    file: LeitorArquivo,
+    store: BlobStore,
+    tamanho_maximo: int = config.TAMANHO_MAXIMO_UPLOAD,
+    tamanho_bloco: int = config.TAMANHO_BLOCO_UPLOAD,
+) -> BlobInfo:
+    escritor = store.novo_escritor()
+    try:
+        while bloco := await file.read(tamanho_bloco):
+            if escritor.tamanho == 0 and not bloco.startswith(ASSINATURA_PDF):
+                raise _nao_pdf()
+            if escritor.tamanho + len(bloco) > tamanho_maximo:
+                raise _muito_grande(tamanho_maximo)
+            await escritor.escrever(bloco)
+        if escritor.tamanho == 0:
+            raise HTTPException(status_code=400, detail="Arquivo vazio")
+    except BaseException:
+        await escritor.descartar()
+        raise
+    return await escritor.concluir()
+
+
+def _boundary(headers) -> bytes | None:
+    for nome, valor in headers:
+        if nome == b"content-type" and valor.lower().startswith(b"multipart/form-data"):
+            for parametro in valor.split(b";")[1:]:
+                chave, _, boundary = parametro.strip().partition(b"=")
+                if chave.lower() == b"boundary" and boundary:
+                    return boundary.strip(b'"')
+    return None
+
+
+class InicioMultipart:
+    # Acompanha o começo do corpo multipart até o primeiro campo com arquivo
+    # (filename=) e confere a assinatura do PDF nos primeiros bytes dele, sem
+    # esperar o Starlette gravar o corpo inteiro no arquivo temporário. Se o
+    # campo não aparece nos primeiros LIMITE bytes, desiste e deixa a
+    # verificação para receber_pdf.
+    LIMITE = 64 * 1024
+
+    def __init__(self, boundary: bytes):
+        self.delimitador = b"--" + boundary
+        self.buffer = bytearray()
+        self.concluido = False
+
+    def alimentar(self, dados: bytes) -> bool:
+        # False quando o arquivo já se mostrou não-PDF
+        if self.concluido:
+            return True
+        self.buffer += dados
+        posicao = 0
+        while (inicio := self.buffer.find(self.delimitador, posicao)) >= 0:
+            fim_cabecalho = self.buffer.find(b"\r\n\r\n", inicio)
+            if fim_cabecalho < 0:
+                break
+            corpo = fim_cabecalho + 4
+            if b"filename=" not in self.buffer[inicio:fim_cabecalho].lower():
+                posicao = corpo
+                continue
+            conteudo = self.buffer[corpo:corpo + len(ASSINATURA_PDF)]
+            if len(conteudo) < len(ASSINATURA_PDF) or conteudo.startswith(b"\r\n--"):
+                # poucos bytes até agora ou arquivo vazio (receber_pdf responde 400)
+                if self.buffer.startswith(b"\r\n--", corpo):
+                    self.concluido = True
+                break
+            self.concluido = True
+            self.buffer = bytearray()
+            return conteudo == ASSINATURA_PDF
+        if len(self.buffer) > self.LIMITE:
+            self.concluido = True
+            self.buffer = bytearray()
+        return True
+
+
+class LimiteUploadMiddleware:
+    # Recusa uploads grandes ou que não são PDF antes que o multipart seja
+    # lido inteiro: pelo Content-Length quando informado e, senão, contando os
+    # bytes à medida que chegam; nos caminhos de "pdf", confere a assinatura
+    # do arquivo no começo do corpo (InicioMultipart).
+
+    def __init__(self, app, limites: dict[str, int], pdf: tuple[str, ...] = ()):
+        self.app = app
+        self.limites = limites
+        self.pdf = pdf
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.limites:
+            await self.app(scope, receive, send)
+            return
+
+        tamanho_maximo = self.limites[scope["path"]]
+        limite = tamanho_maximo + FOLGA_MULTIPART
+        for nome, valor in scope["headers"]:
+            if nome == b"content-length" and valor.isdigit() and int(valor) > limite:
+                await self._recusar(send, tamanho_maximo)
+                return
+
+        boundary = _boundary(scope["headers"]) if scope["path"] in self.pdf else None
+        inicio = InicioMultipart(boundary) if boundary else None
+        recebidos = 0
+
+        async def receive_limitado():
+            nonlocal recebidos
+            message = await receive()
+            if message["type"] == "http.request":
+                corpo = message.get("body", b"")
+                recebidos += len(corpo)
+                # HTTPException atravessa o parser do FastAPI e vira 413/415
+                if recebidos > limite:
+                    raise _muito_grande(tamanho_maximo)
+                if inicio is not None and not inicio.alimentar(corpo):
+                    raise _nao_pdf()
+            return message
+
+        await self.app(scope, receive_limitado, send)
+
+    async def _recusar(self, send, tamanho_maximo: int):
+        corpo = f'{{"detail":"Arquivo excede o tamanho máximo de {tamanho_maximo} bytes"}}'.encode()
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(corpo)).encode()),
+                (b"connection", b"close"),
+            ],
+        })
+        await send({"type": "http.response.body", "body": corpo})
@@ -0,0 +1,211 @@
+# app/worker.py
+#
+# Executa os jobs da fila (app.jobs): roda dentro da API (lifespan, com
+# JOBS_NA_APP) ou como processo separado:
+#
+#   python -m app.worker
+#
+# Cada worker executa até JOBS_CONCORRENCIA jobs ao mesmo tempo; as etapas de
+# CPU (hash, contagem de páginas, extração do texto) vão para um pool de JOBS_PROCESSOS processos,
+# fora do event loop e do GIL da API. Falhas voltam à fila com espera
+# exponencial até JOBS_TENTATIVAS; depois o job e o documento ficam "falhou".
+
+import asyncio
+import logging
+import multiprocessing
+import signal
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable
+
+from sqlalchemy.engine import Row
+from sqlalchemy.exc import IntegrityError
+
+from . import config, crud, jobs, processamento
+from .database import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+
+class ErroProcessamento(Exception):
+    pass
+
+
+class Worker:
+    def __init__(self, concorrencia: int, processos: int, intervalo: float):
+        self.concorrencia = concorrencia
+        self.processos = processos
+        self.intervalo = intervalo
+        self.executados = 0
+        self.falhas = 0
+        self.removidos = 0
+        self._proxima_limpeza = 0.0
+        self._executor: ProcessPoolExecutor | None = None
+        self._tarefas: set[asyncio.Task] = set()
+        self._laco: asyncio.Task | None = None
+        self._acordar = asyncio.Event()
+        self._parar = asyncio.Event()
+        jobs.ao_enfileirar(self.avisar)
+
+    def avisar(self) -> None:
+        self._acordar.set()
+
+    async def executar_cpu(self, fn: Callable, *args):
+        # processos criados só quando o primeiro job precisa deles; "spawn"
+        # porque o pai tem threads e conexões abertas
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.processos, mp_context=multiprocessing.get_context("spawn")
+            )
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    def iniciar(self) -> None:
+        self._parar.clear()
+        self._laco = asyncio.create_task(self._rodar())
+
+    async def encerrar(self, espera: float = 10) -> None:
+        # Jobs em andamento têm `espera` segundos para terminar; os cancelados
+        # voltam à fila quando o prazo da reserva vencer.
+        self._parar.set()
+        self._acordar.set()
+        if self._laco:
+            await self._laco
+        if self._tarefas:
+            _, restantes = await asyncio.wait(self._tarefas, timeout=espera)
+            for tarefa in restantes:
+                tarefa.cancel()
+            await asyncio.gather(*restantes, return_exceptions=True)
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def _limpar(self) -> None:
+        # jobs terminados há mais de JOBS_RETENCAO_DIAS, em lotes
+        antes_de = datetime.utcnow() - timedelta(days=config.JOBS_RETENCAO_DIAS)
+        removidos = config.JOBS_LIMPEZA_LOTE
+        while removidos == config.JOBS_LIMPEZA_LOTE and not self._parar.is_set():
+            async with AsyncSessionLocal() as db:
+                removidos = await jobs.limpar(db, antes_de, config.JOBS_LIMPEZA_LOTE)
+                await db.commit()
+            self.removidos += removidos
+
+    async def _rodar(self) -> None:
+        while not self._parar.is_set():
+            self._acordar.clear()
+            if config.JOBS_RETENCAO_DIAS > 0 and time.monotonic() >= self._proxima_limpeza:
+                self._proxima_limpeza = time.monotonic() + config.JOBS_LIMPEZA_INTERVALO
+                try:
+                    await self._limpar()
+                except Exception:
+                    logger.exception("Falha ao limpar jobs terminados")
+            livres = self.concorrencia - len(self._tarefas)
+            reservados = []
+            if livres > 0:
+                try:
+                    async with AsyncSessionLocal() as db:
+                        reservados = await jobs.reservar(db, livres)
+                        await db.commit()
+                except Exception:
+                    logger.exception("Falha ao consultar a fila de jobs")
+            for job in reservados:
+                tarefa = asyncio.create_task(self._executar(job))
+                self._tarefas.add(tarefa)
+                tarefa.add_done_callback(self._concluida)
+            if reservados and len(reservados) == livres:
+                # provavelmente há mais na fila: volta assim que uma vaga abrir
+                # (_concluida acorda o laço), sem esperar o intervalo
+                continue
+            try:
+                await asyncio.wait_for(self._acordar.wait(), self.intervalo)
+            except asyncio.TimeoutError:
+                pass
+
+    def _concluida(self, tarefa: asyncio.Task) -> None:
+        self._tarefas.discard(tarefa)
+        self._acordar.set()
+
+    async def _executar(self, job: Row) -> None:
+        executar, ao_falhar = TAREFAS[job.tipo]
+        try:
+            await executar(self, job)
+        except Exception as exc:
+            self.falhas += 1
+            logger.warning("Job %s (%s) falhou na tentativa %s: %r", job.id, job.tipo, job.tentativas, exc)
+            async with AsyncSessionLocal() as db:
+                de_novo = await jobs.falhar(db, job, repr(exc))
+                await db.commit()
+            await ao_falhar(job, de_novo)
+            return
+        self.executados += 1
+        async with AsyncSessionLocal() as db:
+            await jobs.concluir(db, job.id)
+            await db.commit()
+
+    def resumo(self) -> dict:
+        return {
+            "ativo": self._laco is not None and not self._laco.done(),
+            "em_execucao": len(self._tarefas),
+            "concorrencia": self.concorrencia,
+            "processos": self.processos,
+            "executados": self.executados,
+            "falhas": self.falhas,
+            "removidos": self.removidos,
+        }
+
+
+# ------------------------
+# Tarefas
+# ------------------------
+
+async def processar_documento(worker: Worker, job: Row) -> None:
+    async with AsyncSessionLocal() as db:
+        info = await crud.get_documento_download(db, job.documento_id)
+        if info is None:
+            # documento excluído depois do upload: nada a fazer
+            return
+        await crud.atualizar_processamento(db, info.id, crud.STATUS_PROCESSANDO)
+
+    origem = await crud.origem_pdf(info)
+    analise = await worker.executar_cpu(processamento.analisar_pdf, origem, config.TEXTO_MAXIMO)
+    if info.sha256 and analise["sha256"] != info.sha256:
+        raise ErroProcessamento(f"conteúdo do PDF não confere com o SHA-256 gravado ({analise['sha256']})")
+
+    async with AsyncSessionLocal() as db:
+        # sem o pypdf não há texto; o documento fica para o app.indexar_texto
+        if analise["texto"] is not None or analise["erro"]:
+            try:
+                await crud.salvar_texto_documento(db, info.id, analise)
+            except IntegrityError:
+                # documento excluído durante a extração (chave estrangeira)
+                return
+        await crud.atualizar_processamento(db, info.id, crud.STATUS_PRONTO, analise["paginas"])
+
+
+async def documento_falhou(job: Row, de_novo: bool) -> None:
+    async with AsyncSessionLocal() as db:
+        status = crud.STATUS_PENDENTE if de_novo else crud.STATUS_FALHOU
+        await crud.atualizar_processamento(db, job.documento_id, status)
+
+
+TAREFAS: dict[str, tuple[Callable[[Worker, Row], Awaitable[None]], Callable[[Row, bool], Awaitable[None]]]] = {
+    crud.PROCESSAR_DOCUMENTO: (processar_documento, documento_falhou),
+}
+
+worker = Worker(config.JOBS_CONCORRENCIA, config.JOBS_PROCESSOS, config.JOBS_INTERVALO)
+
+
+async def _main() -> None:
+    loop = asyncio.get_running_loop()
+    parar = asyncio.Event()
+    for sinal in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sinal, parar.set)
+    worker.iniciar()
+    logger.info("Worker iniciado: %s", worker.resumo())
+    await parar.wait()
+    await worker.encerrar()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    asyncio.run(_main())
@@ -0,0 +1,133 @@
+# bench/admissao.py
+#
+# Teste de carga do controle de admissão (app.admissao): muitos clientes
+# simultâneos, bem acima do pool do banco, pedindo downloads, buscas e
+# metadados por alguns segundos, primeiro com os limites desligados e depois
+# com os limites configurados. Para cada rodada mostra requisições/s, 503s e
+# p50/p95/p99 das respostas bem-sucedidas, além da espera no pool. Com os
+# limites, o excesso é recusado logo e o p99 de quem entra fica estável; sem
+# eles, todos entram e esperam o pool.
+#
+# Roda a aplicação no mesmo processo (httpx.ASGITransport) com SQLite e
+# armazenamento local em um diretório temporário.
+#
+# Requer httpx (pip install httpx), além das dependências da aplicação.
+#
+# Uso: python -m bench.admissao [--clientes 200] [--segundos 5]
+
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+_tmp = tempfile.mkdtemp(prefix="bench-admissao-")
+os.environ.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{_tmp}/bench.sqlite")
+os.environ.setdefault("ARMAZENAMENTO_DIR", f"{_tmp}/blobs")
+os.environ.setdefault("DB_POOL_SIZE", "5")
+os.environ.setdefault("DB_MAX_OVERFLOW", "0")
+os.environ.setdefault("DB_POOL_TIMEOUT", "10")
+os.environ.setdefault("ADMISSAO_DOWNLOAD_LIMITE", "4")
+os.environ.setdefault("ADMISSAO_DOWNLOAD_FILA", "8")
+os.environ.setdefault("ADMISSAO_BUSCA_LIMITE", "2")
+os.environ.setdefault("ADMISSAO_BUSCA_FILA", "4")
+os.environ.setdefault("ADMISSAO_ESPERA", "0.5")
+
+import httpx  # noqa: E402
+
+from app import admissao, database  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models import Base  # noqa: E402
+
+PDF = b"%PDF-1.4\n" + os.urandom(256 * 1024) + b"\n%%EOF"
+DOCUMENTOS = 20
+
+
+def percentil(valores: list[float], p: float) -> float:
+    if not valores:
+        return float("nan")
+    valores = sorted(valores)
+    return valores[min(len(valores) - 1, int(len(valores) * p))]
+
+
+async def popular(cliente: httpx.AsyncClient) -> list[int]:
+    async with database.engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    ids = []
+    for i in range(DOCUMENTOS):
+        r = await cliente.post("/documentos/upload", params={
+            "titprinc": f"Estudo {i} sobre educação ambiental", "ano": 2000 + i,
+            "autor_nome_curto": "Autor", "autor_nome_completo": f"Autor {i}",
+        }, files={"file": ("tcc.pdf", PDF, "application/pdf")})
+        r.raise_for_status()
+        ids.append(r.json()["id"])
+    return ids
+
+
+async def rodada(cliente: httpx.AsyncClient, ids: list[int], clientes: int, segundos: float) -> dict:
+    latencias: list[float] = []
+    status: dict[int, int] = {}
+    fim = time.perf_counter() + segundos
+    espera_pool = database.estatisticas.espera_total
+
+    async def usuario():
+        while time.perf_counter() < fim:
+            sorteio = random.random()
+            if sorteio < 0.4:
+                url, params = f"/documentos/{random.choice(ids)}/download", None
+            elif sorteio < 0.7:
+                url, params = "/documentos/buscar", {"titprinc": "educacao"}
+            else:
+                url, params = f"/documentos/{random.choice(ids)}", None
+            inicio = time.perf_counter()
+            r = await cliente.get(url, params=params)
+            status[r.status_code] = status.get(r.status_code, 0) + 1
+            if r.status_code < 400:
+                latencias.append(time.perf_counter() - inicio)
+            elif r.status_code == 503:
+                # cliente educado: respeita o Retry-After (em escala menor)
+                await asyncio.sleep(float(r.headers.get("retry-after", 1)) / 10)
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(usuario() for _ in range(clientes)))
+    duracao = time.perf_counter() - inicio
+    return {
+        "ok_s": len(latencias) / duracao,
+        "status": dict(sorted(status.items())),
+        "p50": percentil(latencias, 0.50),
+        "p95": percentil(latencias, 0.95),
+        "p99": percentil(latencias, 0.99),
+        "max": max(latencias, default=float("nan")),
+        "espera_pool_media": (database.estatisticas.espera_total - espera_pool) / max(1, sum(status.values())),
+    }
+
+
+async def main(clientes: int, segundos: float) -> None:
+    gov = admissao.governador
+    gov.taxa = None  # todos os clientes vêm do mesmo "IP"
+    limites = {nome: (lim.limite, lim.fila_maxima) for nome, lim in gov.limitadores.items()}
+
+    transporte = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transporte, base_url="http://bench", timeout=None) as cliente:
+        ids = await popular(cliente)
+
+        print(f"{clientes} clientes por {segundos:.0f}s, pool de {database.engine.sync_engine.pool.size()} conexões")
+        print(f"{'admissão':<10} {'ok/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'máx ms':>8} "
+              f"{'pool ms':>8}  status")
+        for nome, ligada in (("desligada", False), ("ligada", True)):
+            for classe, lim in gov.limitadores.items():
+                lim.limite, lim.fila_maxima = limites[classe] if ligada else (10**9, 10**9)
+            r = await rodada(cliente, ids, clientes, segundos)
+            print(f"{nome:<10} {r['ok_s']:>8,.0f} {r['p50'] * 1000:>8.1f} {r['p95'] * 1000:>8.1f} "
+                  f"{r['p99'] * 1000:>8.1f} {r['max'] * 1000:>8.1f} {r['espera_pool_media'] * 1000:>8.2f}  "
+                  f"{r['status']}")
+    await database.engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Teste de carga do controle de admissão.")
+    parser.add_argument("--clientes", type=int, default=200)
+    parser.add_argument("--segundos", type=float, default=5)
+    args = parser.parse_args()
+    asyncio.run(main(args.clientes, args.segundos))
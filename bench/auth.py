@@ -0,0 +1,139 @@
+# bench/auth.py
+#
+# Custo do caminho autenticado (app.auth): a validação do token (HMAC,
+# validade e revogações, sem banco e sem bcrypt) medida isoladamente, com o
+# registro de revogações só em memória e com o backend compartilhado
+# "memoria" (o mesmo caminho do Redis, sem a rede), e ponta a ponta
+# comparando POST /usuarios/login (bcrypt) com GET /usuarios/me (token).
+#
+# Termina com código 1 se o p99 da validação passar de --limite-ms.
+#
+# Requer httpx (pip install httpx), além das dependências da aplicação.
+#
+# Uso:
+#   python -m bench.auth
+#   python -m bench.auth --validacoes 100000 --requisicoes 500 --saida auth.json
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import httpx
+
+from .carga import percentil
+
+
+def _resumo(latencias: list[float], escala: float, unidade: str) -> dict:
+    return {
+        "n": len(latencias),
+        f"p50_{unidade}": round(percentil(latencias, 0.50) * escala, 2),
+        f"p99_{unidade}": round(percentil(latencias, 0.99) * escala, 2),
+    }
+
+
+async def medir_validacao(n: int, compartilhado) -> dict:
+    from app import auth
+
+    anterior = auth.revogacoes
+    auth.revogacoes = auth.Revogacoes(60, 10_000, compartilhado)
+    try:
+        # registro com revogações de outros usuários, como em produção
+        for usuario_id in range(1000, 2000):
+            await auth.revogacoes.revogar(usuario_id)
+        token = auth.emitir_token(1, "user")
+        latencias = []
+        for _ in range(n):
+            inicio = time.perf_counter()
+            await auth.validar_token(token)
+            latencias.append(time.perf_counter() - inicio)
+    finally:
+        auth.revogacoes = anterior
+    return _resumo(latencias, 1e6, "us")
+
+
+async def medir_http(requisicoes: int) -> dict:
+    from app.main import app
+    from .dados import SENHA, popular
+
+    await popular(documentos=0, usuarios=1, pdfs=0, tamanho_pdf=0)
+    credenciais = {"email": "usuario0@bench.exemplo.com.br", "senha": SENHA}
+    transporte = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transporte, base_url="http://bench") as cliente:
+            async def medir(total: int, chamar) -> dict:
+                latencias = []
+                for _ in range(total):
+                    inicio = time.perf_counter()
+                    r = await chamar()
+                    latencias.append(time.perf_counter() - inicio)
+                    r.raise_for_status()
+                return _resumo(latencias, 1e3, "ms")
+
+            r = await cliente.post("/usuarios/login", json=credenciais)
+            r.raise_for_status()
+            cabecalhos = {"Authorization": f"Bearer {r.json()['access_token']}"}
+            resultados = {
+                # o login é caro (bcrypt): bastam poucas amostras
+                "login": await medir(max(1, requisicoes // 20),
+                                     lambda: cliente.post("/usuarios/login", json=credenciais)),
+                "me": await medir(requisicoes, lambda: cliente.get("/usuarios/me", headers=cabecalhos)),
+            }
+    return resultados
+
+
+async def executar(args) -> dict:
+    from app import cache
+
+    validacao = {
+        "so_memoria": await medir_validacao(args.validacoes, None),
+        "backend_compartilhado": await medir_validacao(args.validacoes, cache.BackendMemoria()),
+    }
+    for nome, resultado in validacao.items():
+        print(nome, json.dumps(resultado), file=sys.stderr, flush=True)
+    return {
+        "meta": {
+            "data": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "validacoes": args.validacoes,
+            "requisicoes": args.requisicoes,
+            "limite_ms": args.limite_ms,
+        },
+        "validacao": validacao,
+        "http": await medir_http(args.requisicoes),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Custo do caminho autenticado por token.")
+    parser.add_argument("--validacoes", type=int, default=20_000)
+    parser.add_argument("--requisicoes", type=int, default=200, help="GET /usuarios/me ponta a ponta")
+    parser.add_argument("--limite-ms", type=float, default=1.0, help="p99 máximo aceito para a validação")
+    parser.add_argument("--saida", help="grava o relatório JSON neste arquivo")
+    args = parser.parse_args()
+
+    # a configuração da aplicação é lida na importação: tudo antes de importar app.*
+    tmp = tempfile.mkdtemp(prefix="bench-auth-")
+    os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{tmp}/bench.sqlite"
+    os.environ["ARMAZENAMENTO_DIR"] = os.path.join(tmp, "blobs")
+    os.environ.setdefault("JOBS_NA_APP", "0")
+    os.environ.setdefault("ADMISSAO_TAXA", "0")
+
+    relatorio = asyncio.run(executar(args))
+    texto = json.dumps(relatorio, ensure_ascii=False, indent=2)
+    if args.saida:
+        with open(args.saida, "w") as arquivo:
+            arquivo.write(texto + "\n")
+    print(texto)
+
+    acima = [nome for nome, r in relatorio["validacao"].items() if r["p99_us"] > args.limite_ms * 1000]
+    if acima:
+        print(f"\np99 da validação acima de {args.limite_ms} ms: {', '.join(acima)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
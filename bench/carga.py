@@ -0,0 +1,465 @@
+# bench/carga.py
+#
+# Benchmark de carga reproduzível da API. Popula um banco local (SQLite num
+# diretório temporário ou um Postgres local com --url) com documentos,
+# usuários e PDFs sintéticos (bench.dados), sobe a aplicação no mesmo
+# processo (httpx.ASGITransport) ou num uvicorn separado e roda cada cenário
+# com N clientes assíncronos simultâneos por alguns segundos:
+#
+#   listar              GET /documentos/?limit=50
+#   pagina_1            GET /documentos/ primeira página, sem passar pelo cache
+#   pagina_n_cursor     GET /documentos/ na página --pagina-n, por cursor
+#   pagina_n_offset     GET /documentos/ na página --pagina-n, por skip (para comparar)
+#   buscar              GET /documentos/buscar?q=<palavra>
+#   obter               GET /documentos/{id}
+#   download            GET /documentos/{id}/download
+#   upload              POST /documentos/upload
+#   cadastro            POST /usuarios/ (bcrypt)
+#   misto_cadastro      um quarto dos clientes em cadastro e o resto em obter/buscar;
+#                       informa as leituras e, à parte, os cadastros
+#
+# Para cada cenário informa requisições/s, p50/p95/p99 (ms), erros, bytes de
+# resposta e bytes lidos do banco por requisição (http_bytes_banco_total do
+# /metrics) e o pico de memória (RSS) do processo que atende. O relatório sai
+# em JSON (--saida); com --base, compara com um relatório anterior e termina
+# com código 1 se algum cenário piorou mais que --tolerancia (vazão menor ou
+# p99 maior).
+#
+# Requer httpx (pip install httpx), além das dependências da aplicação.
+#
+# Uso:
+#   python -m bench.carga --saida base.json
+#   python -m bench.carga --base base.json --tolerancia 0.15
+#   python -m bench.carga --modo uvicorn --cenarios listar,download
+#   python -m bench.carga --url postgresql+asyncpg://localhost/bench --limpar
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+
+import httpx
+
+CENARIOS = (
+    "listar", "pagina_1", "pagina_n_cursor", "pagina_n_offset", "buscar", "obter", "download", "upload", "cadastro",
+    "misto_cadastro",
+)
+PAGINA = 50
+# tamanho das páginas dos cenários pagina_* (o padrão da API)
+PAGINA_LISTAGEM = 10
+
+
+# ------------------------
+# Medição
+# ------------------------
+
+@dataclass
+class Medicao:
+    latencias: list[float] = field(default_factory=list)
+    status: dict[int, int] = field(default_factory=dict)
+    erros: int = 0
+    bytes_resposta: int = 0
+    # todas as requisições, com as do aquecimento (para os bytes do banco)
+    enviadas: int = 0
+
+
+def percentil(valores: list[float], p: float) -> float | None:
+    if not valores:
+        return None
+    valores = sorted(valores)
+    return valores[min(len(valores) - 1, int(len(valores) * p))]
+
+
+def rss_kb(pid: int) -> int | None:
+    # RSS atual pelo /proc (Linux); None onde não existe
+    try:
+        with open(f"/proc/{pid}/status") as arquivo:
+            for linha in arquivo:
+                if linha.startswith("VmRSS:"):
+                    return int(linha.split()[1])
+    except OSError:
+        return None
+    return None
+
+
+async def amostrar_rss(pid: int, parar: asyncio.Event) -> int | None:
+    pico = None
+    while not parar.is_set():
+        atual = rss_kb(pid)
+        if atual is not None:
+            pico = max(pico or 0, atual)
+        try:
+            await asyncio.wait_for(parar.wait(), 0.05)
+        except asyncio.TimeoutError:
+            pass
+    if pico is None and pid == os.getpid():
+        # sem /proc: o máximo do processo inteiro (kB no Linux, bytes no macOS)
+        maximo = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        pico = maximo // 1024 if sys.platform == "darwin" else maximo
+    return pico
+
+
+async def bytes_lidos_banco(cliente: httpx.AsyncClient) -> float:
+    # soma de http_bytes_banco_total (app.metricas) em todas as rotas
+    token = os.getenv("MONITORAMENTO_TOKEN")
+    r = await cliente.get("/metrics", headers={"Authorization": f"Bearer {token}"} if token else None)
+    r.raise_for_status()
+    return sum(
+        float(linha.rsplit(" ", 1)[1])
+        for linha in r.text.splitlines()
+        if linha.startswith("http_bytes_banco_total{")
+    )
+
+
+# ------------------------
+# Cenários
+# ------------------------
+
+class Contexto:
+    def __init__(self, dados: dict, tamanho_pdf: int, semente: int):
+        self.ids = dados["documentos"]
+        self.com_pdf = dados["com_pdf"]
+        self.palavras = dados["palavras"]
+        self.pagina_n = 1
+        self.cursor_topo: str | None = None
+        self.cursor_n: str | None = None
+        self.pdf = None
+        self.tamanho_pdf = tamanho_pdf
+        self.semente = semente
+        self.cadastros = 0
+
+    async def preparar(self, pagina_n: int) -> None:
+        # cursor da página N lido direto do banco (a linha que fecha a página
+        # N-1), sem percorrer a listagem; com poucos documentos, a última página
+        from sqlalchemy.future import select
+
+        from app.database import AsyncSessionLocal
+        from app.models import Documento
+        from app.paginacao import ORDEM_DOCUMENTOS, codificar_cursor
+        from .dados import gerar_pdf
+
+        # cursor antes de qualquer documento: a primeira página por keyset, que
+        # não passa pelo cache de listagem (só a página sem cursor passa)
+        self.cursor_topo = codificar_cursor(datetime(9999, 12, 31, tzinfo=timezone.utc), 2**62)
+        self.pagina_n = max(1, min(pagina_n, (len(self.ids) - 1) // PAGINA_LISTAGEM + 1))
+        if self.pagina_n > 1:
+            async with AsyncSessionLocal() as db:
+                linha = (await db.execute(
+                    select(Documento.published_at, Documento.id).order_by(*ORDEM_DOCUMENTOS)
+                    .offset((self.pagina_n - 1) * PAGINA_LISTAGEM - 1).limit(1)
+                )).first()
+            self.cursor_n = codificar_cursor(linha.published_at, linha.id)
+        else:
+            self.cursor_n = self.cursor_topo
+        self.pdf = gerar_pdf(random.Random(self.semente), self.tamanho_pdf)
+
+
+def requisicao(nome: str, ctx: Contexto, rnd: random.Random) -> tuple[str, str, dict]:
+    if nome == "listar":
+        return "GET", "/documentos/", {"params": {"limit": PAGINA}}
+    if nome == "pagina_1":
+        return "GET", "/documentos/", {"params": {"limit": PAGINA_LISTAGEM, "cursor": ctx.cursor_topo}}
+    if nome == "pagina_n_cursor":
+        return "GET", "/documentos/", {"params": {"limit": PAGINA_LISTAGEM, "cursor": ctx.cursor_n}}
+    if nome == "pagina_n_offset":
+        skip = (ctx.pagina_n - 1) * PAGINA_LISTAGEM
+        return "GET", "/documentos/", {"params": {"limit": PAGINA_LISTAGEM, "skip": skip}}
+    if nome == "buscar":
+        return "GET", "/documentos/buscar", {"params": {"q": rnd.choice(ctx.palavras), "limit": 20}}
+    if nome == "obter":
+        return "GET", f"/documentos/{rnd.choice(ctx.ids)}", {}
+    if nome == "download":
+        return "GET", f"/documentos/{rnd.choice(ctx.com_pdf)}/download", {}
+    if nome == "upload":
+        return "POST", "/documentos/upload", {
+            "params": {"titprinc": " ".join(rnd.choices(ctx.palavras, k=5)), "ano": rnd.randint(1995, 2025),
+                       "autor_nome_curto": "Bench", "autor_nome_completo": "Bench da Silva"},
+            "files": {"file": ("tcc.pdf", ctx.pdf, "application/pdf")},
+        }
+    if nome == "cadastro":
+        ctx.cadastros += 1
+        return "POST", "/usuarios/", {"json": {
+            "nome": "Bench", "email": f"cadastro{ctx.semente}-{ctx.cadastros}@bench.exemplo.com.br", "senha": "senha-bench",
+        }}
+    raise ValueError(nome)
+
+
+def tipos_usuario(nome: str, concorrencia: int) -> list[tuple[str, tuple[str, ...]]]:
+    # (grupo da medição, cenários sorteados) de cada cliente simultâneo
+    if nome == "misto_cadastro":
+        cadastradores = max(1, concorrencia // 4)
+        return [("cadastro", ("cadastro",))] * cadastradores + \
+            [("leitura", ("obter", "buscar"))] * max(1, concorrencia - cadastradores)
+    return [(nome, (nome,))] * concorrencia
+
+
+def resumir(medicao: Medicao, duracao: float) -> dict:
+    ms = lambda v: round(v * 1000, 2) if v is not None else None
+    lat = medicao.latencias
+    return {
+        "requisicoes": len(lat) + medicao.erros,
+        "req_s": round(len(lat) / duracao, 1),
+        "p50_ms": ms(percentil(lat, 0.50)),
+        "p95_ms": ms(percentil(lat, 0.95)),
+        "p99_ms": ms(percentil(lat, 0.99)),
+        "erros": medicao.erros,
+        "status": {str(k): v for k, v in sorted(medicao.status.items())},
+        "bytes_resposta_por_req": round(medicao.bytes_resposta / len(lat)) if lat else None,
+    }
+
+
+async def rodar_cenario(
+    cliente: httpx.AsyncClient, nome: str, ctx: Contexto, pid: int,
+    concorrencia: int, duracao: float, aquecimento: float,
+) -> dict:
+    usuarios = tipos_usuario(nome, concorrencia)
+    medicoes = {grupo: Medicao() for grupo, _ in usuarios}
+    comeco = time.perf_counter()
+    inicio_medicao = comeco + aquecimento
+    fim = inicio_medicao + duracao
+
+    async def usuario(indice: int):
+        rnd = random.Random(ctx.semente * 1000 + indice)
+        grupo, sorteio = usuarios[indice]
+        medicao = medicoes[grupo]
+        while (agora := time.perf_counter()) < fim:
+            metodo, url, kwargs = requisicao(rnd.choice(sorteio), ctx, rnd)
+            try:
+                r = await cliente.request(metodo, url, **kwargs)
+                codigo = r.status_code
+            except httpx.HTTPError:
+                codigo = None
+            decorrido = time.perf_counter() - agora
+            medicao.enviadas += 1
+            if agora < inicio_medicao:
+                continue
+            if codigo is None:
+                medicao.erros += 1
+                continue
+            medicao.status[codigo] = medicao.status.get(codigo, 0) + 1
+            if codigo < 400:
+                medicao.latencias.append(decorrido)
+                medicao.bytes_resposta += len(r.content)
+            else:
+                medicao.erros += 1
+
+    banco_antes = await bytes_lidos_banco(cliente)
+    parar = asyncio.Event()
+    rss = asyncio.create_task(amostrar_rss(pid, parar))
+    await asyncio.gather(*(usuario(i) for i in range(len(usuarios))))
+    parar.set()
+    pico = await rss
+    banco = await bytes_lidos_banco(cliente) - banco_antes
+    enviadas = sum(m.enviadas for m in medicoes.values())
+
+    # nos cenários mistos, os campos principais (comparados com --base) são
+    # os das leituras; os outros grupos vêm à parte
+    principal = "leitura" if "leitura" in medicoes else nome
+    resultado = resumir(medicoes[principal], duracao)
+    resultado["bytes_banco_por_req"] = round(banco / enviadas) if enviadas else None
+    resultado["rss_pico_mb"] = round(pico / 1024, 1) if pico else None
+    for grupo, medicao in medicoes.items():
+        if grupo != principal:
+            resultado[grupo] = resumir(medicao, duracao)
+    return resultado
+
+
+# ------------------------
+# Servidor
+# ------------------------
+
+def _porta_livre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def _esperar_servidor(url: str, processo: subprocess.Popen, prazo: float = 30) -> None:
+    limite = time.perf_counter() + prazo
+    async with httpx.AsyncClient(base_url=url) as cliente:
+        while time.perf_counter() < limite:
+            if processo.poll() is not None:
+                raise SystemExit(f"uvicorn terminou com código {processo.returncode}")
+            try:
+                await cliente.get("/")
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.1)
+    raise SystemExit("uvicorn não respondeu a tempo")
+
+
+def _versao_git() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# ------------------------
+# Execução
+# ------------------------
+
+async def executar(args) -> dict:
+    from app import database
+    from app.models import Base
+    from .dados import popular
+
+    if args.limpar:
+        async with database.engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
+    dados = await popular(args.documentos, args.usuarios, args.pdfs, args.tamanho_pdf, args.semente)
+    if len(dados["documentos"]) != args.documentos:
+        raise SystemExit("o banco já tinha documentos: use um banco vazio ou --limpar")
+
+    cenarios = [c for c in args.cenarios.split(",") if c]
+    resultados = {}
+    ctx = Contexto(dados, args.tamanho_pdf, args.semente)
+    await ctx.preparar(args.pagina_n)
+    if ctx.pagina_n < args.pagina_n:
+        print(f"atenção: só há {ctx.pagina_n} páginas de {PAGINA_LISTAGEM}; use --documentos "
+              f"{args.pagina_n * PAGINA_LISTAGEM} para chegar à página {args.pagina_n}", file=sys.stderr)
+    limites = httpx.Limits(max_connections=args.concorrencia, max_keepalive_connections=args.concorrencia)
+
+    if args.modo == "asgi":
+        from app.main import app
+        transporte = httpx.ASGITransport(app=app)
+        async with app.router.lifespan_context(app):
+            async with httpx.AsyncClient(transport=transporte, base_url="http://bench", timeout=60) as cliente:
+                for nome in cenarios:
+                    resultados[nome] = await rodar_cenario(
+                        cliente, nome, ctx, os.getpid(), args.concorrencia, args.duracao, args.aquecimento)
+                    print(nome, json.dumps(resultados[nome], ensure_ascii=False), file=sys.stderr, flush=True)
+    else:
+        await database.engine.dispose()
+        porta = _porta_livre()
+        url = f"http://127.0.0.1:{porta}"
+        processo = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(porta),
+             "--log-level", "warning", "--no-access-log"],
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        )
+        try:
+            await _esperar_servidor(url, processo)
+            async with httpx.AsyncClient(base_url=url, timeout=60, limits=limites) as cliente:
+                for nome in cenarios:
+                    resultados[nome] = await rodar_cenario(
+                        cliente, nome, ctx, processo.pid, args.concorrencia, args.duracao, args.aquecimento)
+                    print(nome, json.dumps(resultados[nome], ensure_ascii=False), file=sys.stderr, flush=True)
+        finally:
+            processo.terminate()
+            processo.wait(10)
+
+    await database.engine.dispose()
+    return {
+        "meta": {
+            "data": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "git": _versao_git(),
+            "python": platform.python_version(),
+            "plataforma": platform.platform(),
+            "banco": database.engine.dialect.name,
+            "modo": args.modo,
+            "documentos": args.documentos,
+            "usuarios": args.usuarios,
+            "pdfs": args.pdfs,
+            "tamanho_pdf": args.tamanho_pdf,
+            "concorrencia": args.concorrencia,
+            "pagina_n": ctx.pagina_n,
+            "duracao_s": args.duracao,
+            "semente": args.semente,
+        },
+        "cenarios": resultados,
+    }
+
+
+def comparar(atual: dict, base: dict, tolerancia: float) -> list[str]:
+    # regressão: vazão abaixo de base*(1-tolerância) ou p99 acima de base*(1+tolerância)
+    regressoes = []
+    print(f"\n{'cenário':<20} {'req/s base':>11} {'req/s':>9} {'Δ':>7} {'p99 base':>9} {'p99':>9} {'Δ':>7}")
+    for nome, resultado in atual["cenarios"].items():
+        anterior = base.get("cenarios", {}).get(nome)
+        if not anterior:
+            print(f"{nome:<20} (sem base)")
+            continue
+        delta_vazao = resultado["req_s"] / anterior["req_s"] - 1 if anterior["req_s"] else 0.0
+        delta_p99 = (resultado["p99_ms"] / anterior["p99_ms"] - 1
+                     if anterior.get("p99_ms") and resultado.get("p99_ms") else 0.0)
+        piorou = delta_vazao < -tolerancia or delta_p99 > tolerancia
+        print(f"{nome:<20} {anterior['req_s']:>11,.1f} {resultado['req_s']:>9,.1f} {delta_vazao:>+7.1%} "
+              f"{anterior.get('p99_ms') or 0:>9.1f} {resultado.get('p99_ms') or 0:>9.1f} {delta_p99:>+7.1%}"
+              f"{'  REGRESSÃO' if piorou else ''}")
+        if piorou:
+            regressoes.append(nome)
+    campos = ("banco", "modo", "documentos", "concorrencia", "tamanho_pdf", "pagina_n")
+    diferentes = [c for c in campos if atual["meta"].get(c) != base.get("meta", {}).get(c)]
+    if diferentes:
+        print(f"atenção: parâmetros diferentes da base: {', '.join(diferentes)}")
+    return regressoes
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark de carga da API.")
+    parser.add_argument("--url", help="banco (padrão: SQLite num diretório temporário)")
+    parser.add_argument("--limpar", action="store_true", help="apaga as tabelas do banco antes de popular")
+    parser.add_argument("--modo", choices=("asgi", "uvicorn"), default="asgi")
+    parser.add_argument("--cenarios", default=",".join(CENARIOS))
+    # o suficiente para existir a página --pagina-n nos cenários pagina_*
+    parser.add_argument("--documentos", type=int, default=100_000)
+    parser.add_argument("--usuarios", type=int, default=100)
+    parser.add_argument("--pdfs", type=int, default=20)
+    parser.add_argument("--tamanho-pdf", type=int, default=512 * 1024)
+    parser.add_argument("--pagina-n", type=int, default=10_000,
+                        help=f"página funda dos cenários pagina_n_* ({PAGINA_LISTAGEM} documentos por página)")
+    parser.add_argument("--concorrencia", type=int, default=16)
+    parser.add_argument("--duracao", type=float, default=5, help="segundos medidos por cenário")
+    parser.add_argument("--aquecimento", type=float, default=1, help="segundos descartados no início")
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--saida", help="grava o relatório JSON neste arquivo")
+    parser.add_argument("--base", help="relatório anterior para comparar")
+    parser.add_argument("--tolerancia", type=float, default=0.10)
+    args = parser.parse_args()
+
+    desconhecidos = set(args.cenarios.split(",")) - set(CENARIOS)
+    if desconhecidos:
+        parser.error(f"cenários desconhecidos: {', '.join(sorted(desconhecidos))}")
+
+    # a configuração da aplicação é lida na importação: tudo antes de importar app.*
+    tmp = tempfile.mkdtemp(prefix="bench-carga-")
+    os.environ["DATABASE_URL"] = args.url or f"sqlite+aiosqlite:///{tmp}/bench.sqlite"
+    os.environ["ARMAZENAMENTO"] = "local"
+    os.environ["ARMAZENAMENTO_DIR"] = os.path.join(tmp, "blobs")
+    # sem worker (o processamento dos uploads competiria pela CPU) e sem
+    # limite por cliente (todos os clientes vêm do mesmo IP)
+    os.environ.setdefault("JOBS_NA_APP", "0")
+    os.environ.setdefault("ADMISSAO_TAXA", "0")
+
+    relatorio = asyncio.run(executar(args))
+    texto = json.dumps(relatorio, ensure_ascii=False, indent=2)
+    if args.saida:
+        with open(args.saida, "w") as arquivo:
+            arquivo.write(texto + "\n")
+    print(texto)
+
+    if args.base:
+        with open(args.base) as arquivo:
+            base = json.load(arquivo)
+        regressoes = comparar(relatorio, base, args.tolerancia)
+        if regressoes:
+            print(f"\nregressões: {', '.join(regressoes)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+# bench/colunas.py
+#
+# Antes/depois de deixar o PDF (arquivo_tcc) fora das consultas de
+# metadados. Com linhas legadas que ainda guardam o PDF na tabela, mede a
+# listagem (50 documentos) e a leitura de um documento de duas formas:
+#
+#   antes   select(Documento) com arquivo_tcc carregado junto, como era
+#   depois  as consultas atuais de app.crud (só metadados)
+#
+# e informa, para cada uma, os bytes lidos do banco por consulta (tamanho dos
+# valores retornados, como em app.metricas) e p50/p99 (ms).
+#
+# Uso:
+#   python -m bench.colunas
+#   python -m bench.colunas --documentos 200 --tamanho-pdf 2097152 --repeticoes 200
+#   python -m bench.colunas --url postgresql+asyncpg://localhost/bench --limpar
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from .carga import percentil
+from .manada import criar_documentos
+
+PAGINA = 50
+
+
+async def medir(consulta, repeticoes: int, contagem: list[int]) -> dict:
+    latencias = []
+    contagem[0] = 0
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        await consulta()
+        latencias.append(time.perf_counter() - inicio)
+    ms = lambda valor: round(valor * 1000, 2)
+    return {
+        "bytes_banco_por_consulta": contagem[0] // repeticoes,
+        "p50_ms": ms(percentil(latencias, 0.50)),
+        "p99_ms": ms(percentil(latencias, 0.99)),
+    }
+
+
+async def executar(args) -> dict:
+    from sqlalchemy import desc, event
+    from sqlalchemy.future import select
+    from sqlalchemy.orm import undefer
+
+    from app import crud, database
+    from app.database import AsyncSessionLocal
+    from app.metricas import tamanho_resultado
+    from app.models import Base, Documento
+
+    if args.limpar:
+        async with database.engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
+    documentos = await criar_documentos(args.documentos, args.tamanho_pdf, args.semente)
+    alvo = documentos[len(documentos) // 2][0]
+
+    contagem = [0]
+
+    def contar(conn, cursor, statement, parameters, context, executemany):
+        contagem[0] += tamanho_resultado(cursor)
+
+    event.listen(database.engine.sync_engine, "after_cursor_execute", contar)
+
+    async def listar_antes():
+        async with AsyncSessionLocal() as db:
+            q = (select(Documento).options(undefer(Documento.arquivo_tcc))
+                 .order_by(desc(Documento.published_at)).limit(PAGINA))
+            (await db.execute(q)).scalars().all()
+
+    async def listar_depois():
+        async with AsyncSessionLocal() as db:
+            await crud.list_documentos(db, 0, PAGINA)
+
+    async def obter_antes():
+        async with AsyncSessionLocal() as db:
+            q = select(Documento).options(undefer(Documento.arquivo_tcc)).where(Documento.id == alvo)
+            (await db.execute(q)).scalars().first()
+
+    async def obter_depois():
+        async with AsyncSessionLocal() as db:
+            await crud.get_documento(db, alvo)
+
+    resultados = {}
+    for nome, consulta in (
+        ("listar_antes", listar_antes), ("listar_depois", listar_depois),
+        ("obter_antes", obter_antes), ("obter_depois", obter_depois),
+    ):
+        await consulta()  # aquecimento: conexão e cache de statements
+        resultados[nome] = await medir(consulta, args.repeticoes, contagem)
+        print(nome, json.dumps(resultados[nome]), file=sys.stderr, flush=True)
+
+    await database.engine.dispose()
+    return {
+        "meta": {
+            "data": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "banco": database.engine.url.get_backend_name(),
+            "documentos": args.documentos,
+            "tamanho_pdf": args.tamanho_pdf,
+            "repeticoes": args.repeticoes,
+        },
+        "resultados": resultados,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Consultas de metadados com e sem o PDF junto.")
+    parser.add_argument("--url", help="banco (padrão: SQLite num diretório temporário)")
+    parser.add_argument("--limpar", action="store_true", help="apaga as tabelas do banco antes de popular")
+    parser.add_argument("--documentos", type=int, default=100)
+    parser.add_argument("--tamanho-pdf", type=int, default=1024 * 1024)
+    parser.add_argument("--repeticoes", type=int, default=100)
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--saida", help="grava o relatório JSON neste arquivo")
+    args = parser.parse_args()
+
+    # a configuração da aplicação é lida na importação: tudo antes de importar app.*
+    tmp = tempfile.mkdtemp(prefix="bench-colunas-")
+    os.environ["DATABASE_URL"] = args.url or f"sqlite+aiosqlite:///{tmp}/bench.sqlite"
+    os.environ["ARMAZENAMENTO_DIR"] = os.path.join(tmp, "blobs")
+
+    relatorio = asyncio.run(executar(args))
+    texto = json.dumps(relatorio, ensure_ascii=False, indent=2)
+    if args.saida:
+        with open(args.saida, "w") as arquivo:
+            arquivo.write(texto + "\n")
+    print(texto)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+# bench/dados.py
+#
+# Dados sintéticos para os benchmarks: documentos, usuários e PDFs gerados a
+# partir de uma semente, então duas execuções com os mesmos parâmetros
+# produzem o mesmo banco. Os PDFs vão para o BlobStore configurado e são
+# associados aos primeiros documentos; os demais ficam só com metadados.
+#
+# Importa app.* só dentro das funções: quem chama configura DATABASE_URL,
+# ARMAZENAMENTO_DIR etc. antes.
+
+import random
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+
+PALAVRAS = (
+    "educação ambiental escolas públicas redes neurais aprendizado de máquina "
+    "saúde coletiva políticas públicas agricultura familiar energia solar "
+    "literatura brasileira história oral direito digital engenharia de software "
+    "mobilidade urbana saneamento básico inclusão social ensino de matemática"
+).split()
+DEPARTAMENTOS = ("Computação", "Educação", "Direito", "Engenharia Civil", "Letras", "Saúde Coletiva")
+ORIENTADORES = tuple(f"Prof. Orientador {i}" for i in range(25))
+GRUPOS = ("Graduação", "Especialização", "Mestrado", "Doutorado")
+# um único hash bcrypt para todos os usuários: gerar um por usuário levaria minutos
+SENHA = "senha-bench"
+LOTE = 1000
+
+
+def gerar_pdf(rnd: random.Random, tamanho: int) -> bytes:
+    corpo = rnd.randbytes(max(tamanho - 32, 0))
+    return b"%PDF-1.4\n" + corpo + b"\n%%EOF\n"
+
+
+async def popular(documentos: int, usuarios: int, pdfs: int, tamanho_pdf: int, semente: int = 42) -> dict:
+    from app import migracoes
+    from app.database import AsyncSessionLocal, engine
+    from app.models import Documento, Usuario
+    from app.seguranca import contexto_senhas
+    from app.storage import get_blob_store
+
+    rnd = random.Random(semente)
+    await migracoes.aplicar(engine)
+
+    store = get_blob_store()
+    blobs = []
+    for _ in range(min(pdfs, documentos)):
+        escritor = store.novo_escritor()
+        await escritor.escrever(gerar_pdf(rnd, tamanho_pdf))
+        blobs.append(await escritor.concluir())
+
+    agora = datetime.utcnow()
+    linhas = []
+    for i in range(documentos):
+        blob = blobs[i] if i < len(blobs) else None
+        linhas.append({
+            "titulo_principal": " ".join(rnd.choices(PALAVRAS, k=6)).capitalize(),
+            "subtitulo": " ".join(rnd.choices(PALAVRAS, k=4)) if rnd.random() < 0.5 else None,
+            "ano": rnd.randint(1995, 2025),
+            "departamento": rnd.choice(DEPARTAMENTOS),
+            "data_defesa": agora - timedelta(days=rnd.randint(0, 9000)),
+            "orientador": rnd.choice(ORIENTADORES),
+            "grupo_instrucao": rnd.choice(GRUPOS),
+            "contagem_passagens": rnd.randint(20, 200),
+            "published_at": agora - timedelta(seconds=i),
+            "status": "pronto",
+            "autor_nome_curto": f"Autor {i}",
+            "autor_nome_completo": f"Autor {i} {rnd.choice(PALAVRAS).capitalize()} da Silva",
+            "blob_key": blob.chave if blob else None,
+            "tamanho": blob.tamanho if blob else None,
+            "sha256": blob.sha256 if blob else None,
+        })
+
+    senha_hash = contexto_senhas().hash(SENHA)
+    async with AsyncSessionLocal() as db:
+        for inicio in range(0, len(linhas), LOTE):
+            await db.execute(insert(Documento), linhas[inicio:inicio + LOTE])
+        await db.execute(insert(Usuario), [
+            {"nome": f"Usuário {i}", "email": f"usuario{i}@bench.exemplo.com.br", "senha_hash": senha_hash,
+             "tipo": "user", "datacad": agora}
+            for i in range(usuarios)
+        ])
+        await db.commit()
+        ids = (await db.execute(Documento.__table__.select().with_only_columns(
+            Documento.id, Documento.blob_key).order_by(Documento.id))).all()
+
+    # contagens de app.facetas a partir das linhas inseridas
+    await migracoes.aplicar(engine)
+    return {
+        "documentos": [linha.id for linha in ids],
+        "com_pdf": [linha.id for linha in ids if linha.blob_key],
+        "palavras": PALAVRAS,
+    }
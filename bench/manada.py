@@ -0,0 +1,190 @@
+# bench/manada.py
+#
+# "Manada" de downloads: N clientes pedem /documentos/{id}/download do mesmo
+# PDF ao mesmo tempo, em algumas ondas, como quando um TCC é divulgado na
+# página de uma disciplina. Os PDFs ficam em arquivo_tcc (linhas legadas,
+# lidas do banco em blocos por crud.iter_documento_arquivo), o caso em que
+# cada download sem cache relê o arquivo inteiro do banco.
+#
+# Roda a mesma carga com o cache de PDFs desligado e ligado (app.cache_blobs)
+# e informa, para cada um, os bytes e consultas de PDF feitos ao banco, o
+# tempo total, req/s e p50/p99 (ms).
+#
+# Requer httpx (pip install httpx), além das dependências da aplicação.
+#
+# Uso:
+#   python -m bench.manada
+#   python -m bench.manada --clientes 200 --ondas 5 --tamanho-pdf 8388608 --saida manada.json
+#   python -m bench.manada --url postgresql+asyncpg://localhost/bench --limpar
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import httpx
+
+from .carga import percentil
+from .dados import gerar_pdf
+
+
+async def criar_documentos(quantidade: int, tamanho_pdf: int, semente: int) -> list[tuple[int, bytes]]:
+    from sqlalchemy import insert
+
+    from app import migracoes
+    from app.database import AsyncSessionLocal, engine
+    from app.models import Documento
+
+    rnd = random.Random(semente)
+    await migracoes.aplicar(engine)
+    pdfs = [gerar_pdf(rnd, tamanho_pdf) for _ in range(quantidade)]
+    agora = datetime.utcnow()
+    async with AsyncSessionLocal() as db:
+        ids = (await db.execute(insert(Documento).returning(Documento.id), [
+            {"titulo_principal": f"Documento divulgado {i}", "ano": 2024, "autor_nome_curto": f"Autor {i}",
+             "autor_nome_completo": f"Autor {i} da Silva", "arquivo_tcc": pdf, "published_at": agora,
+             "status": "pronto"}
+            for i, pdf in enumerate(pdfs)
+        ])).scalars().all()
+        await db.commit()
+    return list(zip(ids, pdfs))
+
+
+class Contagem:
+    # bytes e consultas de PDF lidos do banco pela rota de download
+    def __init__(self):
+        self.bytes = 0
+        self.consultas = 0
+
+    def envolver(self, original):
+        async def iter_documento_arquivo(*args, **kwargs):
+            async for bloco in original(*args, **kwargs):
+                self.bytes += len(bloco)
+                self.consultas += 1
+                yield bloco
+        return iter_documento_arquivo
+
+
+async def rodar(cliente: httpx.AsyncClient, documentos: list[tuple[int, bytes]], clientes: int, ondas: int,
+                maximo_bytes: int) -> dict:
+    from app import cache, cache_blobs, config, crud
+
+    # cada modo começa com os dois caches vazios
+    cache_blobs.blobs = cache_blobs.CacheBlobs(maximo_bytes, config.BLOBS_CACHE_ITEM_MAXIMO)
+    await cache.documentos.invalidar()
+    contagem = Contagem()
+    original = crud.iter_documento_arquivo
+    crud.iter_documento_arquivo = contagem.envolver(original)
+
+    latencias: list[float] = []
+    erros = 0
+
+    async def baixar(documento_id: int, esperado: bytes) -> None:
+        nonlocal erros
+        inicio = time.perf_counter()
+        try:
+            resposta = await cliente.get(f"/documentos/{documento_id}/download")
+        except httpx.HTTPError:
+            erros += 1
+            return
+        latencias.append(time.perf_counter() - inicio)
+        if resposta.status_code != 200 or resposta.content != esperado:
+            erros += 1
+
+    try:
+        inicio = time.perf_counter()
+        for onda in range(ondas):
+            documento_id, pdf = documentos[onda % len(documentos)]
+            await asyncio.gather(*(baixar(documento_id, pdf) for _ in range(clientes)))
+        duracao = time.perf_counter() - inicio
+    finally:
+        crud.iter_documento_arquivo = original
+
+    total = clientes * ondas
+    ms = lambda valor: round(valor * 1000, 1) if valor is not None else None
+    return {
+        "requisicoes": total,
+        "erros": erros,
+        "duracao_s": round(duracao, 3),
+        "req_s": round(total / duracao, 1),
+        "p50_ms": ms(percentil(latencias, 0.50)),
+        "p99_ms": ms(percentil(latencias, 0.99)),
+        "bytes_banco": contagem.bytes,
+        "consultas_pdf": contagem.consultas,
+        "cache": cache_blobs.blobs.resumo(),
+    }
+
+
+async def executar(args) -> dict:
+    from app import database
+    from app.models import Base
+
+    if args.limpar:
+        async with database.engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
+    documentos = await criar_documentos(args.documentos, args.tamanho_pdf, args.semente)
+
+    from app.main import app
+    resultados = {}
+    transporte = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transporte, base_url="http://bench", timeout=120) as cliente:
+            for nome, maximo in (("sem_cache", 0), ("com_cache", args.cache_bytes)):
+                resultados[nome] = await rodar(cliente, documentos, args.clientes, args.ondas, maximo)
+                print(nome, json.dumps(resultados[nome], ensure_ascii=False), file=sys.stderr, flush=True)
+
+    await database.engine.dispose()
+    sem, com = resultados["sem_cache"], resultados["com_cache"]
+    return {
+        "meta": {
+            "data": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "banco": database.engine.url.get_backend_name(),
+            "clientes": args.clientes,
+            "ondas": args.ondas,
+            "documentos": args.documentos,
+            "tamanho_pdf": args.tamanho_pdf,
+        },
+        "resultados": resultados,
+        "reducao_bytes_banco": round(sem["bytes_banco"] / com["bytes_banco"], 1) if com["bytes_banco"] else None,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Downloads simultâneos do mesmo PDF, com e sem cache.")
+    parser.add_argument("--url", help="banco (padrão: SQLite num diretório temporário)")
+    parser.add_argument("--limpar", action="store_true", help="apaga as tabelas do banco antes de popular")
+    parser.add_argument("--clientes", type=int, default=100, help="downloads simultâneos por onda")
+    parser.add_argument("--ondas", type=int, default=4, help="rodadas; cada uma pede um dos documentos")
+    parser.add_argument("--documentos", type=int, default=2)
+    parser.add_argument("--tamanho-pdf", type=int, default=2 * 1024 * 1024)
+    parser.add_argument("--cache-bytes", type=int, default=256 * 1024 * 1024)
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--saida", help="grava o relatório JSON neste arquivo")
+    args = parser.parse_args()
+
+    # a configuração da aplicação é lida na importação: tudo antes de importar app.*
+    tmp = tempfile.mkdtemp(prefix="bench-manada-")
+    os.environ["DATABASE_URL"] = args.url or f"sqlite+aiosqlite:///{tmp}/bench.sqlite"
+    os.environ["ARMAZENAMENTO_DIR"] = os.path.join(tmp, "blobs")
+    # a manada inteira é admitida de uma vez: o que se mede aqui é a leitura
+    # dos PDFs, não a fila de app.admissao
+    os.environ.setdefault("JOBS_NA_APP", "0")
+    os.environ.setdefault("ADMISSAO_TAXA", "0")
+    os.environ.setdefault("ADMISSAO_DOWNLOAD_LIMITE", str(args.clientes))
+    os.environ.setdefault("ADMISSAO_BYTES_MAXIMO", str(args.clientes * args.tamanho_pdf * 2))
+
+    relatorio = asyncio.run(executar(args))
+    texto = json.dumps(relatorio, ensure_ascii=False, indent=2)
+    if args.saida:
+        with open(args.saida, "w") as arquivo:
+            arquivo.write(texto + "\n")
+    print(texto)
+
+
+if __name__ == "__main__":
+    main()
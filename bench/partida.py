@@ -0,0 +1,134 @@
+# bench/partida.py
+#
+# Custo da partida de um worker da API (autoscaling):
+#   importacao  `python -X importtime -c "import app.main"`: tempo total e os
+#               pacotes que mais pesam (tempo próprio somado por pacote raiz)
+#   primeira    sobe `uvicorn app.main:app` do zero e mede até a primeira
+#               resposta de /, e depois o tempo da primeira requisição a
+#               cada rota de --caminhos (routers preguiçosos, OpenAPI...)
+# Cada medida é a mediana de --repeticoes processos novos. Com --raiz,
+# mede outra cópia do repositório (ex.: um `git worktree` do commit
+# anterior) para comparar.
+#
+# Requer httpx e uvicorn.
+#
+# Uso: python -m bench.partida [--repeticoes 5] [--raiz ../outra-copia] [--saida partida.json]
+
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+import httpx
+
+CAMINHOS = ("/documentos/?limit=10", "/usuarios/?limit=10", "/openapi.json")
+
+
+def _ambiente(tmp: str) -> dict:
+    return {
+        **os.environ,
+        "DATABASE_URL": f"sqlite+aiosqlite:///{tmp}/partida.sqlite",
+        "ARMAZENAMENTO": "local",
+        "ARMAZENAMENTO_DIR": os.path.join(tmp, "blobs"),
+        "PYTHONWARNINGS": "ignore",
+    }
+
+
+def importacao(raiz: str, ambiente: dict, repeticoes: int, maiores: int) -> dict:
+    totais, por_pacote = [], defaultdict(list)
+    for _ in range(repeticoes):
+        processo = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", "import app.main"],
+            cwd=raiz, env=ambiente, capture_output=True, text=True, check=True,
+        )
+        pacotes = defaultdict(int)
+        for linha in processo.stderr.splitlines():
+            if not linha.startswith("import time:") or "self [us]" in linha:
+                continue
+            proprio, acumulado, nome = (parte.strip() for parte in linha[len("import time:"):].split("|"))
+            pacotes[nome.split(".")[0]] += int(proprio)
+            if nome == "app.main":
+                totais.append(int(acumulado) / 1000)
+        for pacote, micros in pacotes.items():
+            por_pacote[pacote].append(micros / 1000)
+    pacotes = sorted(((p, statistics.median(v)) for p, v in por_pacote.items()), key=lambda item: -item[1])
+    return {
+        "total_ms": round(statistics.median(totais), 1),
+        "pacotes_ms": {pacote: round(ms, 1) for pacote, ms in pacotes[:maiores]},
+    }
+
+
+def _porta_livre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def primeira_resposta(raiz: str, ambiente: dict, repeticoes: int, caminhos: tuple[str, ...]) -> dict:
+    prontos, por_caminho = [], defaultdict(list)
+    for _ in range(repeticoes):
+        porta = _porta_livre()
+        inicio = time.perf_counter()
+        processo = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(porta),
+             "--log-level", "warning"],
+            cwd=raiz, env=ambiente,
+        )
+        try:
+            with httpx.Client(base_url=f"http://127.0.0.1:{porta}") as cliente:
+                while True:
+                    if processo.poll() is not None:
+                        raise SystemExit(f"uvicorn terminou com código {processo.returncode}")
+                    try:
+                        if cliente.get("/").status_code == 200:
+                            break
+                    except httpx.TransportError:
+                        time.sleep(0.005)
+                prontos.append((time.perf_counter() - inicio) * 1000)
+                for caminho in caminhos:
+                    antes = time.perf_counter()
+                    cliente.get(caminho).raise_for_status()
+                    por_caminho[caminho].append((time.perf_counter() - antes) * 1000)
+        finally:
+            processo.terminate()
+            processo.wait(10)
+    return {
+        "primeira_resposta_ms": round(statistics.median(prontos), 1),
+        "primeira_requisicao_ms": {c: round(statistics.median(v), 1) for c, v in por_caminho.items()},
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Mede importação e tempo até a primeira resposta.")
+    parser.add_argument("--raiz", default=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--maiores", type=int, default=12, help="pacotes listados no relatório de importação")
+    parser.add_argument("--caminhos", default=",".join(CAMINHOS))
+    parser.add_argument("--saida")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="bench-partida-")
+    ambiente = _ambiente(tmp)
+    # tabelas criadas antes: a medida é a partida do worker, não a migração
+    subprocess.run([sys.executable, "-m", "app.migracoes"], cwd=args.raiz, env=ambiente, check=True)
+
+    relatorio = {
+        "raiz": os.path.abspath(args.raiz),
+        "importacao": importacao(args.raiz, ambiente, args.repeticoes, args.maiores),
+        **primeira_resposta(args.raiz, ambiente, args.repeticoes, tuple(args.caminhos.split(","))),
+    }
+    texto = json.dumps(relatorio, ensure_ascii=False, indent=2)
+    if args.saida:
+        with open(args.saida, "w") as arquivo:
+            arquivo.write(texto + "\n")
+    print(texto)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+# bench/serializacao.py
+#
+# Micro-benchmark das respostas de listagem: linhas/s para páginas de 10, 100
+# e 1000 documentos, comparando
+#   orm+response_model  objetos do ORM validados pelo response_model
+#                       (from_attributes) + jsonable_encoder + JSONResponse,
+#                       o caminho anterior das rotas
+#   linhas+to_json      Row com os metadados + app.respostas.resposta_json
+# Mede a consulta (SQLite em memória) e a serialização juntas e só a
+# serialização.
+#
+# Uso: python -m bench.serializacao [--repeticoes 50]
+
+import argparse
+import asyncio
+import time
+from datetime import datetime, timedelta
+
+from fastapi import Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+from sqlalchemy import insert
+from sqlalchemy.future import select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app import crud
+from app.database import criar_engine
+from app.models import Base, Documento
+from app.paginacao import ORDEM_DOCUMENTOS
+from app.respostas import resposta_json
+from app.schemas import DocumentoResponse
+
+TAMANHOS = (10, 100, 1000)
+ADAPTADOR = TypeAdapter(list[DocumentoResponse])
+
+
+async def popular(sessao, total: int) -> None:
+    agora = datetime.utcnow()
+    linhas = [
+        {
+            "titulo_principal": f"Estudo {i} sobre educação ambiental em escolas públicas",
+            "subtitulo": "Um estudo de caso" if i % 2 else None,
+            "ano": 2000 + i % 25,
+            "departamento": "Departamento de Computação",
+            "data_defesa": agora - timedelta(days=i),
+            "orientador": "Prof. João Pereira",
+            "grupo_instrucao": "Graduação",
+            "contagem_passagens": 40 + i % 60,
+            "published_at": agora - timedelta(seconds=i),
+            "status": "pronto",
+            "autor_nome_curto": f"Autor {i}",
+            "autor_nome_completo": f"Autor Número {i} da Silva",
+        }
+        for i in range(total)
+    ]
+    async with sessao() as db:
+        await db.execute(insert(Documento), linhas)
+        await db.commit()
+
+
+def serializar_orm(docs) -> bytes:
+    return JSONResponse(jsonable_encoder(ADAPTADOR.validate_python(docs, from_attributes=True))).body
+
+
+def serializar_linhas(linhas) -> bytes:
+    return resposta_json(Response(), linhas).body
+
+
+async def medir(fn, repeticoes: int) -> float:
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        await fn()
+    return (time.perf_counter() - inicio) / repeticoes
+
+
+async def main(repeticoes: int) -> None:
+    engine = criar_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    sessao = async_sessionmaker(engine, expire_on_commit=False)
+    await popular(sessao, max(TAMANHOS))
+
+    print(f"{'itens':>6} {'caminho':<20} {'consulta+json linhas/s':>24} {'só json linhas/s':>18}")
+    async with sessao() as db:
+        for tamanho in TAMANHOS:
+            consulta_orm = select(Documento).order_by(*ORDEM_DOCUMENTOS).limit(tamanho)
+
+            async def orm():
+                docs = (await db.execute(consulta_orm)).scalars().all()
+                return serializar_orm(docs)
+
+            async def linhas():
+                return serializar_linhas(await crud.list_documentos(db, 0, tamanho))
+
+            docs = (await db.execute(consulta_orm)).scalars().all()
+            rows = await crud.list_documentos(db, 0, tamanho)
+            assert serializar_orm(docs) == serializar_linhas(rows), "JSON diferente entre os caminhos"
+
+            for nome, completo, so_json in (
+                ("orm+response_model", orm, lambda: serializar_orm(docs)),
+                ("linhas+to_json", linhas, lambda: serializar_linhas(rows)),
+            ):
+                tempo_completo = await medir(completo, repeticoes)
+
+                async def apenas_json():
+                    so_json()
+                tempo_json = await medir(apenas_json, repeticoes)
+                print(f"{tamanho:>6} {nome:<20} {tamanho / tempo_completo:>24,.0f} {tamanho / tempo_json:>18,.0f}")
+            db.expunge_all()
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark da serialização das listagens.")
+    parser.add_argument("--repeticoes", type=int, default=50)
+    asyncio.run(main(parser.parse_args().repeticoes))
@@ -0,0 +1,98 @@
+# tests/conftest.py
+#
+# A configuração da aplicação é lida na importação: banco SQLite (aiosqlite)
+# e armazenamento num diretório temporário, sem worker de jobs, sem limite de
+# admissão e com bcrypt barato, tudo antes de importar app.*.
+#
+# Com TESTES_DATABASE_URL (um Postgres descartável: as tabelas são apagadas
+# e recriadas no início), os mesmos testes rodam nele.
+
+import os
+import tempfile
+
+_tmp = tempfile.mkdtemp(prefix="tcc-testes-")
+os.environ["DATABASE_URL"] = os.getenv("TESTES_DATABASE_URL") or f"sqlite+aiosqlite:///{_tmp}/testes.sqlite"
+os.environ["ARMAZENAMENTO_DIR"] = os.path.join(_tmp, "blobs")
+os.environ["CACHE_BACKEND"] = ""
+os.environ["JOBS_NA_APP"] = "0"
+os.environ["ADMISSAO_TAXA"] = "0"
+os.environ["BCRYPT_ROUNDS"] = "4"
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+
+async def _recriar_tabelas() -> None:
+    from app import database, migracoes
+    from app.models import Base
+
+    async with database.obter_engine().begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+    await migracoes.aplicar()
+
+
+@pytest.fixture(scope="session")
+def cliente():
+    from app.main import app
+
+    with TestClient(app) as cliente:
+        # no event loop do próprio TestClient, onde o lifespan criou o engine
+        cliente.portal.call(_recriar_tabelas)
+        yield cliente
+
+
+@pytest.fixture(scope="session")
+def postgres(cliente) -> bool:
+    from app import database
+
+    return database.obter_engine().dialect.name == "postgresql"
+
+
+PDF = b"%PDF-1.4\n1 0 obj << /Type /Page >>\n" + b"0" * 2048 + b"\n%%EOF"
+
+METADADOS = {"titprinc": "Título", "ano": 2020, "autor_nome_curto": "Ana", "autor_nome_completo": "Ana Souza"}
+
+
+@pytest.fixture(scope="session")
+def rodar(cliente):
+    # roda uma corrotina de app.* no event loop da aplicação: rodar(fn, *args)
+    return cliente.portal.call
+
+
+@pytest.fixture(scope="session")
+def enviar_documento(cliente):
+    def enviar(conteudo: bytes = PDF, **metadados) -> int:
+        r = cliente.post(
+            "/documentos/upload",
+            params={**METADADOS, **metadados},
+            files={"file": ("tcc.pdf", conteudo, "application/pdf")},
+        )
+        assert r.status_code == 200, r.text
+        return r.json()["id"]
+    return enviar
+
+
+@pytest.fixture(scope="session")
+def criar_usuario(cliente):
+    def criar(email: str, senha: str = "segredo123") -> int:
+        r = cliente.post("/usuarios/", json={"nome": "Ana", "email": email, "senha": senha})
+        assert r.status_code == 201, r.text
+        return r.json()["id"]
+    return criar
+
+
+@pytest.fixture
+def comandos(cliente):
+    # SQL enviado ao banco durante o teste, um item por ida ao banco
+    from app import database
+
+    enviados: list[str] = []
+
+    def registrar(conn, cursor, statement, parameters, context, executemany):
+        enviados.append(statement)
+
+    engine = database.obter_engine().sync_engine
+    event.listen(engine, "before_cursor_execute", registrar)
+    yield enviados
+    event.remove(engine, "before_cursor_execute", registrar)
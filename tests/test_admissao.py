@@ -0,0 +1,130 @@
+# tests/test_admissao.py
+#
+# Controle de admissão (app.admissao) sobre uma aplicação ASGI mínima: 503
+# com a classe lotada, 429 pelo balde de tokens do cliente e o orçamento de
+# bytes reservado por bloco (uploads até o bloco ser consumido, downloads
+# enquanto o bloco é enviado, lotes fora dele).
+
+import asyncio
+
+from fastapi.testclient import TestClient
+
+from app.admissao import AUTH, BUSCA, DOWNLOAD, LOTE, UPLOAD, AdmissaoMiddleware, BaldesMemoria, Governador
+
+BLOCO = 1000
+
+
+def _governador(limite: int = 2, bytes_maximo: int = 10 * BLOCO, taxa: BaldesMemoria | None = None) -> Governador:
+    classes = (UPLOAD, LOTE, DOWNLOAD, BUSCA, AUTH)
+    return Governador({classe: (limite, 0) for classe in classes}, espera=0.05, bytes_maximo=bytes_maximo, taxa=taxa)
+
+
+def _cliente(gov: Governador, observados: list[int]) -> TestClient:
+    # lê o corpo inteiro anotando os bytes reservados a cada bloco e responde
+    # com três blocos, anotando também durante o envio
+    async def app(scope, receive, send):
+        while True:
+            mensagem = await receive()
+            observados.append(gov.bytes.em_uso)
+            if not mensagem.get("more_body"):
+                break
+        await send({"type": "http.response.start", "status": 200, "headers": [(b"content-length", b"3000")]})
+        for i in range(3):
+            observados.append(gov.bytes.em_uso)
+            await send({"type": "http.response.body", "body": b"x" * BLOCO, "more_body": i < 2})
+
+    return TestClient(AdmissaoMiddleware(app, governador=gov))
+
+
+async def _chamar(gov: Governador, observados: list[int], caminho: str) -> list[dict]:
+    # POST com o corpo em três blocos, sem Content-Length (o TestClient
+    # juntaria os blocos numa mensagem só)
+    blocos = [{"type": "http.request", "body": b"x" * BLOCO, "more_body": i < 2} for i in range(3)]
+    enviados = []
+
+    async def receive():
+        return blocos.pop(0)
+
+    async def send(mensagem):
+        enviados.append(mensagem)
+
+    scope = {"type": "http", "method": "POST", "path": caminho, "headers": [], "client": ("127.0.0.1", 1)}
+    await _cliente(gov, observados).app(scope, receive, send)
+    return enviados
+
+
+def test_classe_lotada_responde_503():
+    gov = _governador(limite=0)
+    r = _cliente(gov, []).get("/documentos/buscar")
+    assert r.status_code == 503
+    assert r.headers["retry-after"] == "1"
+    assert gov.limitadores[BUSCA].recusados == 1
+
+
+def test_cliente_acima_da_taxa_responde_429():
+    gov = _governador(taxa=BaldesMemoria(taxa=0.1, rajada=1, maximo=10))
+    cliente = _cliente(gov, [])
+    assert cliente.get("/documentos/buscar").status_code == 200
+    r = cliente.get("/documentos/buscar")
+    assert r.status_code == 429
+    assert int(r.headers["retry-after"]) >= 9
+    # monitoramento não passa pelo limite
+    assert cliente.get("/admissao").status_code == 200
+
+
+def test_monitoramento_sem_token_passa_pelo_limite(monkeypatch):
+    from app import config
+
+    monkeypatch.setattr(config, "MONITORAMENTO_TOKEN", "segredo")
+    gov = _governador(taxa=BaldesMemoria(taxa=0.1, rajada=1, maximo=10))
+    cliente = _cliente(gov, [])
+    assert cliente.get("/metrics").status_code == 200
+    assert cliente.get("/metrics").status_code == 429
+    assert cliente.get("/metrics", headers={"Authorization": "Bearer segredo"}).status_code == 200
+
+
+def test_upload_reserva_so_o_bloco_recebido():
+    # sem Content-Length: nada é reservado pelo tamanho máximo de upload
+    gov = _governador()
+    observados = []
+    enviados = asyncio.run(_chamar(gov, observados, "/documentos/upload"))
+    assert enviados[0]["status"] == 200
+    # enquanto a aplicação lê, só o bloco que ela tem em mãos está reservado
+    assert observados[:3] == [BLOCO, BLOCO, BLOCO]
+    assert gov.bytes.em_uso == 0
+
+
+def test_upload_sem_espaco_no_orcamento_responde_503():
+    gov = _governador()
+    gov.bytes.em_uso = gov.bytes.maximo
+    r = _cliente(gov, []).post("/documentos/upload", content=b"x" * BLOCO)
+    assert r.status_code == 503
+    assert gov.bytes.recusados == 1
+
+
+def test_lote_fica_fora_do_orcamento():
+    gov = _governador()
+    observados = []
+    enviados = asyncio.run(_chamar(gov, observados, "/documentos/lote"))
+    assert enviados[0]["status"] == 200
+    assert set(observados) == {0}
+
+
+def test_download_reserva_cada_bloco_enviado():
+    gov = _governador()
+    observados = []
+    r = _cliente(gov, observados).get("/documentos/1/download")
+    assert r.status_code == 200
+    assert len(r.content) == 3 * BLOCO
+    # entre um bloco e outro nada fica reservado: só durante o send
+    assert set(observados) == {0}
+    assert gov.bytes.em_uso == 0
+
+
+def test_download_sem_espaco_no_orcamento_responde_503():
+    gov = _governador()
+    gov.bytes.em_uso = gov.bytes.maximo
+    r = _cliente(gov, []).get("/documentos/1/download")
+    # o início da resposta ficou retido até o primeiro bloco ter espaço
+    assert r.status_code == 503
+    assert gov.limitadores[DOWNLOAD].em_uso == 0
@@ -0,0 +1,97 @@
+# tests/test_blobs.py
+#
+# Blobs deduplicados x remoção (app.crud): a contagem de referências e o
+# unlink de uma remoção se serializam com a gravação de um documento que usa
+# o mesmo blob, e um upload que deduplicou contra um blob já apagado não grava
+# uma linha apontando para o nada.
+
+import asyncio
+
+import pytest
+
+from conftest import METADADOS, PDF
+
+
+def _pdf_unico(marca: str) -> bytes:
+    return PDF.replace(b"%%EOF", f"% {marca}\n%%EOF".encode())
+
+
+async def _blob(documento_id: int):
+    from app import crud
+    from app.database import AsyncSessionLocal
+
+    async with AsyncSessionLocal() as db:
+        return await crud.get_documento_download(db, documento_id)
+
+
+async def _referencias(blob_key: str) -> int:
+    from sqlalchemy import func, select
+
+    from app.database import AsyncSessionLocal
+    from app.models import Documento
+
+    async with AsyncSessionLocal() as db:
+        return (await db.execute(select(func.count()).where(Documento.blob_key == blob_key))).scalar()
+
+
+async def _gravar_blob(conteudo: bytes) -> None:
+    from app.storage import get_blob_store
+
+    escritor = get_blob_store().novo_escritor()
+    await escritor.escrever(conteudo)
+    await escritor.concluir()
+
+
+async def _gravar_com_blob_removido(info) -> None:
+    from app import crud, schemas
+    from app.database import AsyncSessionLocal
+    from app.storage import BlobInfo
+
+    blob = BlobInfo(chave=info.blob_key, tamanho=info.tamanho, sha256=info.sha256)
+    async with AsyncSessionLocal() as db:
+        await crud.create_documento(db, blob, schemas.DocumentoCreate.model_validate(METADADOS))
+
+
+async def _remocao_espera_gravacao(info) -> tuple[bool, bool]:
+    # Uma sessão trava o blob e grava um documento que o usa; a remoção, em
+    # outra sessão, só conta as referências depois do commit e não apaga nada.
+    from app import crud
+    from app.database import AsyncSessionLocal
+    from app.models import Documento
+    from app.storage import get_blob_store
+
+    async with AsyncSessionLocal() as gravacao, AsyncSessionLocal() as remocao:
+        async with crud.blobs_serializados(gravacao):
+            await crud.travar_blobs(gravacao, [info.blob_key])
+            tarefa = asyncio.create_task(crud.remover_blob_sem_referencia(remocao, info.blob_key))
+            await asyncio.sleep(0.2)
+            esperou = not tarefa.done()
+            gravacao.add(Documento(
+                titulo_principal="Título", ano=2020, autor_nome_curto="Ana", autor_nome_completo="Ana Souza",
+                blob_key=info.blob_key, tamanho=info.tamanho, sha256=info.sha256,
+            ))
+            await gravacao.commit()
+        await tarefa
+    return esperou, await get_blob_store().existe(info.blob_key)
+
+
+def test_upload_deduplicado_com_blob_removido(cliente, enviar_documento, rodar):
+    from app import crud
+
+    documento_id = enviar_documento(_pdf_unico("removido"))
+    info = rodar(_blob, documento_id)
+    assert cliente.delete(f"/documentos/{documento_id}").status_code == 200
+    with pytest.raises(crud.BlobRemovido):
+        rodar(_gravar_com_blob_removido, info)
+    assert rodar(_referencias, info.blob_key) == 0
+
+
+def test_remocao_espera_gravacao_do_mesmo_blob(cliente, enviar_documento, rodar):
+    documento_id = enviar_documento(_pdf_unico("concorrente"))
+    info = rodar(_blob, documento_id)
+    assert cliente.delete(f"/documentos/{documento_id}").status_code == 200
+    # o blob volta ao armazenamento sem nenhum documento: a remoção o apagaria
+    rodar(_gravar_blob, _pdf_unico("concorrente"))
+    esperou, existe = rodar(_remocao_espera_gravacao, info)
+    assert esperou
+    assert existe
@@ -0,0 +1,98 @@
+# tests/test_busca.py
+#
+# Fallback da busca sem Postgres (app.busca): o índice invertido e a busca no
+# conteúdo aceitam a sintaxe do websearch_to_tsquery anunciada em
+# /documentos/buscar — "frase exata", OR entre grupos e -exclusão.
+
+import pytest
+
+from app.busca import IndiceInvertido, analisar_consulta, pontuar_conteudo
+
+
+def _indice() -> IndiceInvertido:
+    indice = IndiceInvertido()
+    indice.indexar(1, {"titulo_principal": "Banco de dados distribuídos", "autor_nome_completo": "Ana Souza"})
+    indice.indexar(2, {"titulo_principal": "Dados de banco genético", "autor_nome_completo": "Rui Lima"})
+    indice.indexar(3, {"titulo_principal": "Redes neurais", "subtitulo": "ou aprendizado profundo"})
+    return indice
+
+
+@pytest.mark.parametrize("q, esperados", [
+    ("banco dados", {1, 2}),
+    ('"banco de dados"', {1}),
+    ('"banco dados"', set()),
+    ('"dados distribuidos"', {1}),
+    ("redes or souza", {1, 3}),
+    ("banco lima OR neurais", {2, 3}),
+    ('dados -"banco de dados"', {2}),
+    ("-banco", {3}),
+    ("educa or", set()),
+    # "or" no meio de uma frase é só uma palavra
+    ('"redes or neurais"', set()),
+    # prefixo, como no fallback de termos soltos
+    ('"banc de dad"', {1}),
+])
+def test_indice_invertido(q, esperados):
+    assert set(_indice().buscar(q)) == esperados
+
+
+def test_frase_nao_atravessa_campos_fora_de_ordem():
+    # os campos ficam em sequência: fim do título seguido do subtítulo casa
+    assert set(_indice().buscar('"neurais ou aprendizado"')) == {3}
+    assert set(_indice().buscar('"aprendizado neurais"')) == set()
+
+
+def test_or_soma_grupos():
+    pontuacao = _indice().buscar("banco or distribuidos")
+    assert pontuacao[1] > pontuacao[2]
+
+
+def test_remover_limpa_posicoes():
+    indice = _indice()
+    indice.remover(1)
+    assert set(indice.buscar('"banco de dados"')) == set()
+    assert set(indice.buscar("-banco")) == {3}
+
+
+def test_analisar_consulta():
+    # OR separa conjunções, em qualquer caixa; sobrando nas pontas, é ignorado
+    assert len(analisar_consulta("a b or c")) == 2
+    assert analisar_consulta("b OR c") == analisar_consulta("or b or c or")
+    grupos = analisar_consulta('sistema "banco de dados" or -"redes neurais"')
+    assert [[(item.termos, item.negado) for item in grupo] for grupo in grupos] == [
+        [((("sistema", 0),), False), ((("banco", 0), ("dados", 2)), False)],
+        [((("redes", 0), ("neurais", 1)), True)],
+    ]
+
+
+TEXTO = "Este trabalho estuda bancos de dados relacionais. Depois, compara redes neurais profundas."
+
+
+def test_conteudo_frase_e_or():
+    total, trecho = pontuar_conteudo(TEXTO, '"banco de dados"')
+    assert total == 1 and "<mark>bancos de dados</mark>" in trecho
+    assert pontuar_conteudo(TEXTO, '"dados de banco"') == (0, None)
+    total, trecho = pontuar_conteudo(TEXTO, "xyz or neurais")
+    assert total == 1 and "<mark>neurais</mark>" in trecho
+    total, _ = pontuar_conteudo(TEXTO, "relacionais or profundas")
+    assert total == 2
+
+
+def test_conteudo_exclusao():
+    assert pontuar_conteudo(TEXTO, 'dados -"redes neurais"') == (0, None)
+    total, trecho = pontuar_conteudo(TEXTO, 'dados -"neurais redes"')
+    assert total == 1 and "<mark>dados</mark>" in trecho
+    assert pontuar_conteudo(TEXTO, "-xyz")[0] == 1
+
+
+def test_endpoint_buscar(cliente, enviar_documento):
+    # o mesmo resultado do tsvector no Postgres
+    primeiro = enviar_documento(titprinc="Fallback banco de dados")
+    segundo = enviar_documento(titprinc="Fallback dados de banco")
+    r = cliente.get("/documentos/buscar", params={"q": '"fallback banco de dados"'})
+    assert r.status_code == 200, r.text
+    ids = {doc["id"] for doc in r.json()}
+    assert primeiro in ids and segundo not in ids
+    r = cliente.get("/documentos/buscar", params={"q": '"fallback banco de dados" or "fallback dados de banco"'})
+    ids = {doc["id"] for doc in r.json()}
+    assert {primeiro, segundo} <= ids
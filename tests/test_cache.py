@@ -0,0 +1,113 @@
+# tests/test_cache.py
+#
+# Cache de metadados (app.cache): invalidar escopos só recarrega as chaves
+# lidas com eles, invalidar tudo recarrega todas, e com backend compartilhado
+# um hit local não vai ao backend enquanto a geração e as versões lidas dele
+# valem (CACHE_VERSOES_TTL); invalidações de outro worker valem depois disso.
+
+import asyncio
+
+from pydantic import TypeAdapter
+
+from app.cache import BackendMemoria, Cache, LRUComTTL
+
+ADAPTADOR = TypeAdapter(str)
+
+
+class BackendContado(BackendMemoria):
+    def __init__(self):
+        super().__init__()
+        self.idas = 0
+
+    async def get(self, chave):
+        self.idas += 1
+        return await super().get(chave)
+
+    async def get_muitos(self, chaves):
+        self.idas += 1
+        return [await BackendMemoria.get(self, chave) for chave in chaves]
+
+
+def _cache(compartilhado=None, ttl_versoes: float = 60) -> Cache:
+    return Cache(LRUComTTL(100, 30), compartilhado, ttl=30, ttl_versoes=ttl_versoes)
+
+
+class Carregador:
+    # conta quantas vezes cada chave foi ao "banco"
+    def __init__(self):
+        self.cargas: dict[str, int] = {}
+
+    async def obter(self, cache: Cache, nome: str, escopo: str | None = None) -> str:
+        async def carregar():
+            self.cargas[nome] = self.cargas.get(nome, 0) + 1
+            return f"{nome}#{self.cargas[nome]}"
+        return await cache.obter(nome, carregar, ADAPTADOR, escopo=escopo)
+
+
+async def _ler_tudo(cache: Cache, carregador: Carregador) -> None:
+    await carregador.obter(cache, "documento", escopo="documento:1")
+    await carregador.obter(cache, "outro", escopo="documento:2")
+    await carregador.obter(cache, "lista", escopo="listagens")
+    await carregador.obter(cache, "facetas")
+
+
+def _invalidacao_por_escopo(compartilhado) -> dict[str, int]:
+    async def cenario():
+        cache, carregador = _cache(compartilhado), Carregador()
+        await _ler_tudo(cache, carregador)
+        await cache.invalidar("documento:1", "listagens")
+        await _ler_tudo(cache, carregador)
+        return carregador.cargas
+    return asyncio.run(cenario())
+
+
+def test_invalidar_escopos_local():
+    assert _invalidacao_por_escopo(None) == {"documento": 2, "outro": 1, "lista": 2, "facetas": 1}
+
+
+def test_invalidar_escopos_compartilhado():
+    assert _invalidacao_por_escopo(BackendMemoria()) == {"documento": 2, "outro": 1, "lista": 2, "facetas": 1}
+
+
+def test_invalidar_tudo():
+    async def cenario():
+        cache, carregador = _cache(BackendMemoria()), Carregador()
+        await _ler_tudo(cache, carregador)
+        await cache.invalidar()
+        await _ler_tudo(cache, carregador)
+        return carregador.cargas
+    assert asyncio.run(cenario()) == {"documento": 2, "outro": 2, "lista": 2, "facetas": 2}
+
+
+def test_hit_local_sem_ida_ao_backend():
+    async def cenario():
+        compartilhado = BackendContado()
+        cache, carregador = _cache(compartilhado), Carregador()
+        await carregador.obter(cache, "lista", escopo="listagens")
+        idas = compartilhado.idas
+        for _ in range(10):
+            assert await carregador.obter(cache, "lista", escopo="listagens") == "lista#1"
+        return compartilhado.idas - idas
+    assert asyncio.run(cenario()) == 0
+
+
+def test_invalidacao_de_outro_worker_vale_depois_do_ttl_das_versoes():
+    async def cenario():
+        compartilhado = BackendMemoria()
+        worker_1, worker_2 = _cache(compartilhado, ttl_versoes=0.2), _cache(compartilhado, ttl_versoes=0.2)
+        carregador = Carregador()
+        await carregador.obter(worker_1, "lista", escopo="listagens")
+        await carregador.obter(worker_2, "lista", escopo="listagens")
+        await worker_1.invalidar("listagens")
+        # no próprio worker, na hora; no outro, depois do prazo
+        depois_1 = await carregador.obter(worker_1, "lista", escopo="listagens")
+        antes_2 = await carregador.obter(worker_2, "lista", escopo="listagens")
+        await asyncio.sleep(0.25)
+        depois_2 = await carregador.obter(worker_2, "lista", escopo="listagens")
+        return depois_1, antes_2, depois_2
+    depois_1, antes_2, depois_2 = asyncio.run(cenario())
+    assert depois_1 == "lista#2"
+    # o worker 2 ainda tinha a versão antiga no LRU local
+    assert antes_2 == "lista#1"
+    # com a versão nova, acha no backend compartilhado a carga do worker 1
+    assert depois_2 == "lista#2"
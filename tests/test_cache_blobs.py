@@ -0,0 +1,70 @@
+# tests/test_cache_blobs.py
+#
+# Cache de PDFs em memória (app.cache_blobs): um GET inteiro carrega o blob
+# uma vez para todos, e um Range num blob frio lê da origem só o intervalo,
+# sem carregar o arquivo inteiro.
+
+import asyncio
+
+from app.cache_blobs import CacheBlobs
+
+CONTEUDO = bytes(range(256)) * 40
+BLOCO = 1000
+
+
+class Origem:
+    def __init__(self):
+        self.leituras: list[tuple[int, int]] = []
+
+    async def ler(self, inicio: int, fim: int):
+        self.leituras.append((inicio, fim))
+        for posicao in range(inicio, fim + 1, BLOCO):
+            await asyncio.sleep(0)
+            yield CONTEUDO[posicao:min(posicao + BLOCO, fim + 1)]
+
+
+async def _baixar(cache: CacheBlobs, origem: Origem, inicio: int = 0, fim: int = len(CONTEUDO) - 1) -> bytes:
+    ler = cache.leitor("blob", len(CONTEUDO), origem.ler, BLOCO)
+    return b"".join([bytes(bloco) async for bloco in ler(inicio, fim)])
+
+
+def _cache() -> CacheBlobs:
+    return CacheBlobs(maximo_bytes=10 * len(CONTEUDO), item_maximo=len(CONTEUDO))
+
+
+def test_range_em_blob_frio_le_so_o_intervalo():
+    async def cenario():
+        cache, origem = _cache(), Origem()
+        parte = await _baixar(cache, origem, 100, 199)
+        return cache, origem, parte
+    cache, origem, parte = asyncio.run(cenario())
+    assert parte == CONTEUDO[100:200]
+    assert origem.leituras == [(100, 199)]
+    assert cache.resumo()["entradas"] == 0
+    assert cache.resumo()["parciais"] == 1
+
+
+def test_get_inteiro_carrega_e_range_sai_da_memoria():
+    async def cenario():
+        cache, origem = _cache(), Origem()
+        inteiros = await asyncio.gather(*(_baixar(cache, origem) for _ in range(5)))
+        parte = await _baixar(cache, origem, 5000, 5999)
+        return cache, origem, inteiros, parte
+    cache, origem, inteiros, parte = asyncio.run(cenario())
+    assert all(inteiro == CONTEUDO for inteiro in inteiros)
+    assert parte == CONTEUDO[5000:6000]
+    assert origem.leituras == [(0, len(CONTEUDO) - 1)]
+    resumo = cache.resumo()
+    assert (resumo["misses"], resumo["coalescidos"], resumo["hits"], resumo["parciais"]) == (1, 4, 1, 0)
+
+
+def test_range_durante_carga_espera_a_carga():
+    async def cenario():
+        cache, origem = _cache(), Origem()
+        inteiro = asyncio.create_task(_baixar(cache, origem))
+        await asyncio.sleep(0)
+        parte = await _baixar(cache, origem, 0, 99)
+        return origem, await inteiro, parte
+    origem, inteiro, parte = asyncio.run(cenario())
+    assert (inteiro, parte) == (CONTEUDO, CONTEUDO[:100])
+    assert origem.leituras == [(0, len(CONTEUDO) - 1)]
@@ -0,0 +1,31 @@
+# tests/test_config.py
+#
+# Configuração (app.config): fora de dev, o que não tem padrão seguro precisa
+# vir do ambiente; em dev, o banco padrão é um SQLite local.
+
+import os
+import subprocess
+import sys
+
+
+def _importar(**variaveis) -> subprocess.CompletedProcess:
+    ambiente = {k: v for k, v in os.environ.items() if k not in ("DATABASE_URL", "AMBIENTE")}
+    ambiente.update(variaveis)
+    codigo = "import app.config as c; print(c.DATABASE_URL)"
+    return subprocess.run([sys.executable, "-c", codigo], env=ambiente, capture_output=True, text=True)
+
+
+def test_database_url_obrigatorio_fora_de_dev():
+    r = _importar(AMBIENTE="producao", AUTH_SECRET="segredo", CACHE_BACKEND="redis")
+    assert r.returncode != 0
+    assert "DATABASE_URL é obrigatório" in r.stderr
+    r = _importar(AMBIENTE="producao", AUTH_SECRET="segredo", CACHE_BACKEND="redis",
+                  DATABASE_URL="postgresql+asyncpg://u@banco/db")
+    assert r.returncode == 0, r.stderr
+    assert r.stdout.strip() == "postgresql+asyncpg://u@banco/db"
+
+
+def test_dev_usa_sqlite_local():
+    r = _importar()
+    assert r.returncode == 0, r.stderr
+    assert r.stdout.strip().startswith("sqlite+aiosqlite:///")
@@ -0,0 +1,99 @@
+# tests/test_download.py
+#
+# Download (app.download): interpretação do Range, 206/416, If-Range e 304
+# por ETag e por Last-Modified.
+
+import pytest
+
+from app.download import IntervaloInvalido, parse_range
+
+from conftest import PDF
+
+
+@pytest.mark.parametrize("valor, esperado", [
+    ("bytes=0-99", (0, 99)),
+    ("bytes=100-", (100, 999)),
+    ("bytes=-100", (900, 999)),
+    ("bytes=-5000", (0, 999)),
+    ("bytes=900-5000", (900, 999)),
+    # ignorados: a resposta é o arquivo inteiro
+    (None, None),
+    ("items=0-10", None),
+    ("bytes=0-10,20-30", None),
+    ("bytes=abc-", None),
+    ("bytes=10", None),
+    ("bytes=50-10", None),
+])
+def test_parse_range(valor, esperado):
+    assert parse_range(valor, 1000) == esperado
+
+
+@pytest.mark.parametrize("valor", ["bytes=1000-", "bytes=5000-6000", "bytes=-0"])
+def test_parse_range_insatisfazivel(valor):
+    with pytest.raises(IntervaloInvalido):
+        parse_range(valor, 1000)
+
+
+@pytest.fixture(scope="module")
+def documento(enviar_documento):
+    return enviar_documento()
+
+
+def _baixar(cliente, documento_id: int, **headers):
+    return cliente.get(f"/documentos/{documento_id}/download", headers=headers)
+
+
+def test_download_inteiro(cliente, documento):
+    r = _baixar(cliente, documento)
+    assert r.status_code == 200
+    assert r.content == PDF
+    assert r.headers["content-length"] == str(len(PDF))
+    assert r.headers["accept-ranges"] == "bytes"
+    assert r.headers["etag"].startswith('"')
+
+
+def test_download_parcial(cliente, documento):
+    r = _baixar(cliente, documento, range="bytes=5-14")
+    assert r.status_code == 206
+    assert r.content == PDF[5:15]
+    assert r.headers["content-range"] == f"bytes 5-14/{len(PDF)}"
+    assert r.headers["content-length"] == "10"
+
+
+def test_range_insatisfazivel(cliente, documento):
+    r = _baixar(cliente, documento, range=f"bytes={len(PDF)}-")
+    assert r.status_code == 416
+    assert r.headers["content-range"] == f"bytes */{len(PDF)}"
+
+
+def test_if_range(cliente, documento):
+    etag = _baixar(cliente, documento).headers["etag"]
+    # ETag ainda vale: só o intervalo
+    r = _baixar(cliente, documento, range="bytes=0-9", **{"if-range": etag})
+    assert r.status_code == 206
+    assert r.content == PDF[:10]
+    # ETag diferente: o arquivo mudou, vai inteiro
+    r = _baixar(cliente, documento, range="bytes=0-9", **{"if-range": '"outro"'})
+    assert r.status_code == 200
+    assert r.content == PDF
+    # data diferente de Last-Modified também ignora o Range
+    r = _baixar(cliente, documento, range="bytes=0-9", **{"if-range": "Mon, 01 Jan 2001 00:00:00 GMT"})
+    assert r.status_code == 200
+
+
+def test_nao_modificado(cliente, documento):
+    primeira = _baixar(cliente, documento)
+    etag, modificado = primeira.headers["etag"], primeira.headers["last-modified"]
+
+    r = _baixar(cliente, documento, **{"if-none-match": etag})
+    assert r.status_code == 304
+    assert r.content == b""
+    assert r.headers["etag"] == etag
+    assert _baixar(cliente, documento, **{"if-none-match": f'W/{etag}, "outro"'}).status_code == 304
+    assert _baixar(cliente, documento, **{"if-none-match": '"outro"'}).status_code == 200
+
+    assert _baixar(cliente, documento, **{"if-modified-since": modificado}).status_code == 304
+    assert _baixar(cliente, documento, **{"if-modified-since": "Mon, 01 Jan 2001 00:00:00 GMT"}).status_code == 200
+    # If-None-Match tem precedência sobre If-Modified-Since
+    r = _baixar(cliente, documento, **{"if-none-match": '"outro"', "if-modified-since": modificado})
+    assert r.status_code == 200
@@ -0,0 +1,111 @@
+# tests/test_escritas.py
+#
+# Idas ao banco por escrita (app.crud): cada INSERT/UPDATE/DELETE de
+# documento ou usuário é um único statement com RETURNING, sem SELECT antes
+# nem refresh depois. No Postgres, as contagens de app.facetas e o job de
+# app.jobs vão no mesmo statement, como CTEs de escrita. O SQLite não tem
+# CTEs de escrita: lá eles são statements à parte na mesma transação.
+
+import re
+
+from conftest import METADADOS
+
+
+def resumir(statements: list[str]) -> list[str]:
+    # "INSERT documentos", "SELECT usuarios"...: o primeiro comando de escrita
+    # e sua tabela (ignorando o SELECT da CTE de update_documento)
+    resumo = []
+    for sql in statements:
+        escrita = re.search(r"\b(INSERT INTO|UPDATE|DELETE FROM)\s+(\w+)", sql)
+        if escrita:
+            resumo.append(f"{escrita[1].split()[0]} {escrita[2]}")
+        else:
+            resumo.append("SELECT " + re.search(r"FROM\s+(\w+)", sql)[1])
+    return resumo
+
+
+# ------------------------
+# Documentos
+# ------------------------
+
+def test_upload_documento(enviar_documento, comandos, postgres):
+    enviar_documento()
+    if postgres:
+        assert resumir(comandos) == ["INSERT documentos"]
+    else:
+        assert resumir(comandos) == ["INSERT documentos", "INSERT documentos_facetas", "INSERT jobs"]
+
+
+def test_update_documento(cliente, enviar_documento, comandos, postgres):
+    documento_id = enviar_documento()
+    comandos.clear()
+    r = cliente.put(f"/documentos/{documento_id}", json={**METADADOS, "ano": 1999})
+    assert r.status_code == 200, r.text
+    assert r.json()["ano"] == 1999
+    # valores antigos das facetas vêm do próprio UPDATE
+    if postgres:
+        assert resumir(comandos) == ["UPDATE documentos"]
+    else:
+        assert resumir(comandos) == ["UPDATE documentos", "INSERT documentos_facetas"]
+
+
+def test_update_documento_inexistente(cliente, comandos):
+    r = cliente.put("/documentos/999999", json=METADADOS)
+    assert r.status_code == 404
+    assert resumir(comandos) == ["UPDATE documentos"]
+
+
+def test_delete_documento(cliente, enviar_documento, comandos, postgres):
+    documento_id = enviar_documento()
+    comandos.clear()
+    r = cliente.delete(f"/documentos/{documento_id}")
+    assert r.status_code == 200, r.text
+    # documento_texto sai pelo ON DELETE CASCADE
+    if postgres:
+        # a contagem de referências ao blob vem no RETURNING do DELETE
+        assert resumir(comandos) == ["DELETE documentos"]
+    else:
+        # ... e no SQLite é um SELECT à parte, depois do commit
+        assert resumir(comandos) == ["DELETE documentos", "INSERT documentos_facetas", "SELECT documentos"]
+
+
+def test_delete_documento_inexistente(cliente, comandos):
+    r = cliente.delete("/documentos/999999")
+    assert r.status_code == 404
+    assert resumir(comandos) == ["DELETE documentos"]
+
+
+# ------------------------
+# Usuários
+# ------------------------
+
+def test_create_usuario(criar_usuario, comandos):
+    criar_usuario("nova@exemplo.com")
+    assert resumir(comandos) == ["INSERT usuarios"]
+
+
+def test_create_usuario_email_repetido(cliente, criar_usuario, comandos):
+    criar_usuario("repetido@exemplo.com")
+    comandos.clear()
+    r = cliente.post("/usuarios/", json={"nome": "Outra", "email": "repetido@exemplo.com", "senha": "segredo123"})
+    assert r.status_code == 400
+    # o ON CONFLICT substitui a consulta prévia por e-mail
+    assert resumir(comandos) == ["INSERT usuarios"]
+
+
+def test_update_usuario(cliente, criar_usuario, comandos):
+    usuario_id = criar_usuario("alterar@exemplo.com")
+    comandos.clear()
+    r = cliente.put(f"/usuarios/{usuario_id}", json={"nome": "Ana Alterada"})
+    assert r.status_code == 200, r.text
+    assert r.json()["nome"] == "Ana Alterada"
+    assert resumir(comandos) == ["UPDATE usuarios"]
+
+
+def test_delete_usuario(cliente, criar_usuario, comandos):
+    usuario_id = criar_usuario("remover@exemplo.com")
+    comandos.clear()
+    r = cliente.delete(f"/usuarios/{usuario_id}")
+    assert r.status_code == 200, r.text
+    assert resumir(comandos) == ["DELETE usuarios"]
+    assert cliente.get(f"/usuarios/{usuario_id}").status_code == 404
@@ -0,0 +1,45 @@
+# tests/test_facetas.py
+#
+# Contagens de /documentos/facetas (app.facetas, servidas pelo cache): cada
+# escrita de documento ajusta as contagens e invalida o cache, então a
+# leitura seguinte já vê o upload, a mudança de valor e a exclusão.
+
+from conftest import METADADOS
+
+
+def _contagens(cliente, faceta: str) -> dict:
+    r = cliente.get("/documentos/facetas", params={"faceta": faceta, "limite": 1000})
+    assert r.status_code == 200, r.text
+    return {item["valor"]: item["total"] for item in r.json()["facetas"][faceta]}
+
+
+def test_facetas_acompanham_escritas(cliente, enviar_documento):
+    # lido antes, para a contagem estar no cache
+    assert "Facetas A" not in _contagens(cliente, "departamento")
+
+    primeiro = enviar_documento(arcurdepto="Facetas A")
+    segundo = enviar_documento(arcurdepto="Facetas A", ano=1901)
+    contagens = _contagens(cliente, "departamento")
+    assert contagens["Facetas A"] == 2
+    assert _contagens(cliente, "ano")["1901"] == 1
+
+    r = cliente.put(f"/documentos/{segundo}", json={**METADADOS, "arcurdepto": "Facetas B", "ano": 1902})
+    assert r.status_code == 200, r.text
+    contagens = _contagens(cliente, "departamento")
+    assert (contagens["Facetas A"], contagens["Facetas B"]) == (1, 1)
+    anos = _contagens(cliente, "ano")
+    assert "1901" not in anos and anos["1902"] == 1
+
+    assert cliente.delete(f"/documentos/{primeiro}").status_code == 200
+    contagens = _contagens(cliente, "departamento")
+    # valor sem documentos sai da lista
+    assert "Facetas A" not in contagens
+    assert contagens["Facetas B"] == 1
+
+
+def test_total_acompanha_escritas(cliente, enviar_documento):
+    antes = cliente.get("/documentos/facetas", params={"faceta": "ano"}).json()["total"]
+    documento_id = enviar_documento()
+    assert cliente.get("/documentos/facetas", params={"faceta": "ano"}).json()["total"] == antes + 1
+    assert cliente.delete(f"/documentos/{documento_id}").status_code == 200
+    assert cliente.get("/documentos/facetas", params={"faceta": "ano"}).json()["total"] == antes
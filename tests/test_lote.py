@@ -0,0 +1,86 @@
+# tests/test_lote.py
+#
+# Importação em lote (app.lote) de pacotes com entradas corrompidas: o erro
+# fica no item, os outros documentos entram e nenhum blob fica órfão.
+
+import hashlib
+import io
+import json
+import tarfile
+import zipfile
+
+import pytest
+
+from conftest import METADADOS, PDF
+
+
+def _pdf(marca: str) -> bytes:
+    return PDF.replace(b"%%EOF", f"% {marca}\n%%EOF".encode())
+
+
+def _manifesto(arquivos: dict[str, bytes]) -> bytes:
+    return json.dumps([{**METADADOS, "arquivo": nome, "chave": nome} for nome in arquivos]).encode()
+
+
+def _zip(arquivos: dict[str, bytes], compressao: int) -> bytes:
+    saida = io.BytesIO()
+    with zipfile.ZipFile(saida, "w", compression=compressao) as pacote:
+        pacote.writestr("manifesto.json", _manifesto(arquivos))
+        for nome, conteudo in arquivos.items():
+            pacote.writestr(nome, conteudo)
+    return saida.getvalue()
+
+
+def _tar(arquivos: dict[str, bytes]) -> bytes:
+    saida = io.BytesIO()
+    with tarfile.open(fileobj=saida, mode="w") as pacote:
+        for nome, conteudo in {"manifesto.json": _manifesto(arquivos), **arquivos}.items():
+            info = tarfile.TarInfo(nome)
+            info.size = len(conteudo)
+            pacote.addfile(info, io.BytesIO(conteudo))
+    return saida.getvalue()
+
+
+def _importar(cliente, pacote: bytes, nome: str) -> dict:
+    r = cliente.post("/documentos/lote", files={"pacote": (nome, pacote, "application/octet-stream")})
+    assert r.status_code == 200, r.text
+    return {item["arquivo"]: item for item in r.json()["itens"]}
+
+
+def _blob_existe(rodar, conteudo: bytes) -> bool:
+    from app.storage import get_blob_store
+
+    return rodar(get_blob_store().existe, hashlib.sha256(conteudo).hexdigest())
+
+
+@pytest.mark.parametrize("compressao", [zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED])
+def test_zip_com_entrada_corrompida(cliente, rodar, compressao):
+    marca = f"zip-{compressao}"
+    arquivos = {f"{marca}-a.pdf": _pdf(f"{marca}-a"), f"{marca}-b.pdf": _pdf(f"{marca}-b")}
+    pacote = bytearray(_zip(arquivos, compressao))
+    # estraga o meio dos dados da primeira entrada (CRC ou stream deflate),
+    # depois do cabeçalho local de 30 bytes + nome
+    info = zipfile.ZipFile(io.BytesIO(pacote)).getinfo(f"{marca}-a.pdf")
+    dados = info.header_offset + 30 + len(info.filename) + len(info.extra)
+    pacote[dados + 10:dados + 18] = b"\xff" * 8
+
+    itens = _importar(cliente, bytes(pacote), "pacote.zip")
+    assert itens[f"{marca}-a.pdf"]["status"] == "erro"
+    assert "corrompida" in itens[f"{marca}-a.pdf"]["erro"]
+    assert itens[f"{marca}-b.pdf"]["status"] == "criado"
+    assert not _blob_existe(rodar, arquivos[f"{marca}-a.pdf"])
+
+
+def test_tar_truncado(cliente, rodar):
+    arquivos = {f"tar-{i}.pdf": _pdf(f"tar-{i}") for i in range(4)}
+    pacote = _tar(arquivos)
+    # corta no meio dos dados da terceira entrada
+    corte = pacote.find(arquivos["tar-2.pdf"]) + len(arquivos["tar-2.pdf"]) // 2
+
+    itens = _importar(cliente, pacote[:corte], "pacote.tar")
+    # o que foi lido antes do corte é gravado
+    assert [itens[f"tar-{i}.pdf"]["status"] for i in range(4)] == ["criado", "criado", "erro", "erro"]
+    assert "corrompid" in itens["tar-2.pdf"]["erro"]
+    assert "corrompido" in itens["tar-3.pdf"]["erro"]
+    assert _blob_existe(rodar, arquivos["tar-1.pdf"])
+    assert not _blob_existe(rodar, arquivos["tar-2.pdf"])
@@ -0,0 +1,77 @@
+# tests/test_metricas.py
+#
+# Métricas (app.metricas): bytes lidos do banco por requisição, estimados
+# pelo tamanho dos valores do resultado (texto em UTF-8).
+
+import asyncio
+import threading
+from types import SimpleNamespace
+
+from app import metricas
+
+
+def test_tamanho_resultado():
+    cursor = SimpleNamespace(_rows=[("ação", b"ab", 5, None), ("abc", None, 1.5, b"")])
+    # 6 bytes de "ação" em UTF-8, 2 do binário, 8 por número
+    assert metricas.tamanho_resultado(cursor) == 6 + 2 + 8 + 3 + 8
+
+
+def test_cursor_sem_buffer_conta_zero():
+    assert metricas.tamanho_resultado(SimpleNamespace()) == 0
+
+
+def test_bytes_banco_por_rota(cliente, enviar_documento):
+    enviar_documento()
+    antes = metricas.bytes_banco.valores.get(("GET", "/documentos/"), 0)
+    assert cliente.get("/documentos/", params={"limit": 1000}).status_code == 200
+    assert metricas.bytes_banco.valores[("GET", "/documentos/")] > antes
+
+
+def test_monitoramento_exige_token(cliente, monkeypatch):
+    from app import config
+
+    monkeypatch.setattr(config, "MONITORAMENTO_TOKEN", "segredo")
+    for rota in ("/metrics", "/pool", "/cache/blobs", "/admissao"):
+        assert cliente.get(rota).status_code == 401
+        assert cliente.get(rota, headers={"Authorization": "Bearer outro"}).status_code == 401
+        assert cliente.get(rota, headers={"Authorization": "Bearer segredo"}).status_code == 200
+
+
+def test_monitoramento_desligado_fora_de_dev(cliente, monkeypatch):
+    from app import config
+
+    monkeypatch.setattr(config, "AMBIENTE", "producao")
+    monkeypatch.setattr(config, "MONITORAMENTO_TOKEN", "")
+    assert cliente.get("/metrics").status_code == 404
+    assert cliente.get("/jobs").status_code == 404
+
+
+def test_amostrador_nao_conta_depois_de_terminar():
+    async def cenario():
+        amostrador = metricas.Amostrador(limiar=0, intervalo=60, guardados=5)
+        amostrador._thread = threading.current_thread()  # sem a thread: as amostras vêm de _amostrar
+        amostrador._id_loop = threading.get_ident()
+        req = metricas._Requisicao("GET")
+        req.rota = "/x"
+        amostrador.comecar(req)
+        amostrador._pilha_frames = lambda frame: "cpu;a"
+        # a thread amostrando enquanto o loop fecha o perfil (most_common)
+        parar = threading.Event()
+
+        def amostrar():
+            while not parar.is_set():
+                amostrador._amostrar()
+
+        thread = threading.Thread(target=amostrar)
+        thread.start()
+        await asyncio.sleep(0.01)
+        amostrador.terminar(req, 1.0)
+        contadas = sum(req.amostras.values())
+        await asyncio.sleep(0.01)
+        parar.set()
+        thread.join()
+        return contadas, sum(req.amostras.values()), amostrador.perfis()
+
+    contadas, depois, perfis = asyncio.run(cenario())
+    assert contadas > 0 and depois == contadas
+    assert perfis[0]["pilhas"][0]["pilha"] == "cpu;a"
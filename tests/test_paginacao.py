@@ -0,0 +1,62 @@
+# tests/test_paginacao.py
+#
+# Paginação por cursor (app.paginacao): o cursor vai e volta sem perder
+# precisão, cursores malformados dão 400 e documentos com o mesmo
+# published_at não se repetem nem somem entre páginas (desempate por id).
+
+import base64
+from datetime import datetime
+
+import pytest
+
+from app.paginacao import CursorInvalido, codificar_cursor, decodificar_cursor
+
+EMPATADOS = datetime(2100, 1, 1, 12, 0, 0, 123456)
+
+
+def test_cursor_ida_e_volta():
+    cursor = codificar_cursor(EMPATADOS, 42)
+    assert "=" not in cursor
+    assert decodificar_cursor(cursor) == (EMPATADOS, 42)
+
+
+@pytest.mark.parametrize("cursor", [
+    "nao-e-base64!",
+    base64.urlsafe_b64encode(b'{"a":1}').decode(),
+    base64.urlsafe_b64encode(b'["ontem",1]').decode(),
+    base64.urlsafe_b64encode(b'["2020-01-01T00:00:00",1,2]').decode(),
+    base64.urlsafe_b64encode(b'["2020-01-01T00:00:00","x"]').decode(),
+])
+def test_cursor_invalido(cliente, cursor):
+    with pytest.raises(CursorInvalido):
+        decodificar_cursor(cursor)
+    r = cliente.get("/documentos/", params={"cursor": cursor})
+    assert r.status_code == 400
+
+
+async def _empatar(ids: list[int]) -> None:
+    from sqlalchemy import update
+
+    from app import cache
+    from app.database import AsyncSessionLocal
+    from app.models import Documento
+
+    async with AsyncSessionLocal() as db:
+        await db.execute(update(Documento).where(Documento.id.in_(ids)).values(published_at=EMPATADOS))
+        await db.commit()
+    await cache.documentos.invalidar()
+
+
+def test_empate_em_published_at(cliente, enviar_documento, rodar):
+    # no futuro, os empatados são os primeiros da listagem
+    ids = [enviar_documento() for _ in range(5)]
+    rodar(_empatar, ids)
+
+    r = cliente.get("/documentos/", params={"limit": 2})
+    vistos = [doc["id"] for doc in r.json()]
+    while len(vistos) < len(ids) and "x-next-cursor" in r.headers:
+        assert r.headers["link"].endswith('rel="next"')
+        r = cliente.get("/documentos/", params={"limit": 2, "cursor": r.headers["x-next-cursor"]})
+        assert r.status_code == 200
+        vistos += [doc["id"] for doc in r.json()]
+    assert vistos[:len(ids)] == sorted(ids, reverse=True)
@@ -0,0 +1,112 @@
+# tests/test_texto.py
+#
+# Texto extraído dos PDFs (documento_texto): sai junto com o documento e o
+# backfill (app.indexar_texto) registra a falha de um PDF e segue com os outros.
+
+import os
+
+from sqlalchemy import select
+
+from conftest import PDF
+
+
+async def _texto(documento_id: int):
+    from app.database import AsyncSessionLocal
+    from app.models import DocumentoTexto
+
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(select(DocumentoTexto).where(DocumentoTexto.documento_id == documento_id))
+        return result.scalars().first()
+
+
+async def _salvar_texto(documento_id: int) -> None:
+    from app import crud
+    from app.database import AsyncSessionLocal
+
+    async with AsyncSessionLocal() as db:
+        analise = {"texto": "conteúdo do tcc", "paginas": 1, "erro": None}
+        await crud.salvar_texto_documento(db, documento_id, analise)
+        await db.commit()
+
+
+async def _limpar_textos() -> None:
+    from sqlalchemy import delete
+
+    from app.database import AsyncSessionLocal
+    from app.models import DocumentoTexto
+
+    async with AsyncSessionLocal() as db:
+        await db.execute(delete(DocumentoTexto))
+        await db.commit()
+
+
+def test_texto_sai_com_o_documento(cliente, enviar_documento, rodar):
+    documento_id = enviar_documento()
+    rodar(_salvar_texto, documento_id)
+    assert rodar(_texto, documento_id) is not None
+
+    assert cliente.delete(f"/documentos/{documento_id}").status_code == 200
+    assert rodar(_texto, documento_id) is None
+
+
+def test_texto_de_documento_excluido_nao_e_gravado(cliente, enviar_documento, rodar):
+    # worker que termina a extração depois do DELETE
+    from sqlalchemy.exc import IntegrityError
+
+    documento_id = enviar_documento()
+    assert cliente.delete(f"/documentos/{documento_id}").status_code == 200
+    try:
+        rodar(_salvar_texto, documento_id)
+    except IntegrityError:
+        pass
+    assert rodar(_texto, documento_id) is None
+
+
+def test_backfill_segue_depois_de_um_pdf_ausente(enviar_documento, rodar):
+    from app import indexar_texto
+    from app.storage import get_blob_store
+
+    rodar(_limpar_textos)
+    ausente = enviar_documento(PDF + b"ausente")
+    presente = enviar_documento(_pdf_valido())
+    caminho = get_blob_store().caminho_local(_blob_key(rodar, ausente))
+    os.remove(caminho)
+
+    resultado = rodar(indexar_texto.indexar, 32, 1)
+
+    assert resultado["erros"] >= 1
+    assert "FileNotFoundError" in rodar(_texto, ausente).erro
+    assert rodar(_texto, presente).erro is None
+
+
+def test_grupos_limitados_por_bytes():
+    from types import SimpleNamespace
+
+    from app.indexar_texto import _grupos
+
+    linhas = [SimpleNamespace(blob_key=None, tamanho=tamanho) for tamanho in (60, 60, 200, 10, 10)]
+    grupos = _grupos(linhas, 100)
+    assert [[linha.tamanho for linha in grupo] for grupo in grupos] == [[60], [60], [200], [10, 10]]
+
+
+def _pdf_valido() -> bytes:
+    import io
+
+    import pypdf
+
+    escritor = pypdf.PdfWriter()
+    escritor.add_blank_page(width=200, height=200)
+    saida = io.BytesIO()
+    escritor.write(saida)
+    return saida.getvalue()
+
+
+def _blob_key(rodar, documento_id: int) -> str:
+    from app import crud
+    from app.database import AsyncSessionLocal
+
+    async def buscar():
+        async with AsyncSessionLocal() as db:
+            return (await crud.get_documento_download(db, documento_id)).blob_key
+
+    return rodar(buscar)
@@ -0,0 +1,82 @@
+# tests/test_tokens.py
+#
+# Tokens de acesso (app.auth): assinatura, validade, revogação com limite de
+# entradas (o piso recusa o que não dá mais para lembrar), folga entre
+# relógios de workers e a exigência de backend compartilhado fora de dev.
+
+import asyncio
+import os
+import subprocess
+import sys
+
+import pytest
+
+from app import auth
+
+
+def _validar(token: str) -> auth.UsuarioToken:
+    return asyncio.run(auth.validar_token(token))
+
+
+def _motivo(token: str) -> str:
+    with pytest.raises(auth.TokenInvalido) as exc:
+        _validar(token)
+    return str(exc.value)
+
+
+def test_token_valido():
+    usuario = _validar(auth.emitir_token(7, "admin"))
+    assert (usuario.id, usuario.tipo) == (7, "admin")
+
+
+def test_assinatura_adulterada():
+    corpo, _, assinatura = auth.emitir_token(7, "user").partition(".")
+    outro_corpo = auth.emitir_token(8, "admin").partition(".")[0]
+    assert _motivo(f"{outro_corpo}.{assinatura}") == "assinatura"
+    assert _motivo(f"{corpo}.{assinatura[:-2]}AA") == "assinatura"
+    assert _motivo(corpo) == "assinatura"
+
+
+def test_token_expirado():
+    assert _motivo(auth.emitir_token(7, "user", ttl=0)) == "expirado"
+
+
+def test_revogacao_vale_para_tokens_anteriores():
+    revogacoes = auth.Revogacoes(ttl=60, maximo=10, folga=0)
+    asyncio.run(revogacoes.revogar(1))
+    revogado_em = revogacoes._entradas[1]
+    assert asyncio.run(revogacoes.revogado(1, revogado_em - 1))
+    assert not asyncio.run(revogacoes.revogado(1, revogado_em))
+    assert not asyncio.run(revogacoes.revogado(2, revogado_em - 1))
+
+
+def test_revogacoes_acima_do_limite_viram_piso():
+    revogacoes = auth.Revogacoes(ttl=60, maximo=2, folga=0)
+    for usuario_id in (1, 2, 3):
+        asyncio.run(revogacoes.revogar(usuario_id))
+    # a revogação de 1 saiu do registro, mas o instante dela virou piso:
+    # qualquer token emitido antes dele é recusado, de qualquer usuário
+    assert 1 not in revogacoes._entradas
+    assert revogacoes.piso > 0
+    assert asyncio.run(revogacoes.revogado(1, revogacoes.piso - 1))
+    assert asyncio.run(revogacoes.revogado(99, revogacoes.piso - 1))
+    assert not asyncio.run(revogacoes.revogado(99, revogacoes.piso))
+
+
+def test_folga_entre_relogios():
+    # token emitido "depois" da revogação por um worker de relógio adiantado
+    revogacoes = auth.Revogacoes(ttl=60, maximo=10, folga=1)
+    asyncio.run(revogacoes.revogar(1))
+    revogado_em = revogacoes._entradas[1]
+    assert asyncio.run(revogacoes.revogado(1, revogado_em + 500))
+    assert not asyncio.run(revogacoes.revogado(1, revogado_em + 1000))
+
+
+def test_fora_de_dev_exige_backend_compartilhado():
+    ambiente = {**os.environ, "AMBIENTE": "producao", "AUTH_SECRET": "segredo", "CACHE_BACKEND": ""}
+    r = subprocess.run([sys.executable, "-c", "import app.config"], env=ambiente, capture_output=True, text=True)
+    assert r.returncode != 0
+    assert "CACHE_BACKEND=redis é obrigatório" in r.stderr
+    ambiente["CACHE_BACKEND"] = "redis"
+    r = subprocess.run([sys.executable, "-c", "import app.config"], env=ambiente, capture_output=True, text=True)
+    assert r.returncode == 0, r.stderr
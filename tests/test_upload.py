@@ -0,0 +1,101 @@
+# tests/test_upload.py
+#
+# Recebimento de uploads (app.upload): 413 pelo Content-Length ou pela
+# contagem dos bytes recebidos, 415 pela assinatura do PDF no começo do
+# multipart (InicioMultipart), antes de o corpo ser lido inteiro.
+
+from fastapi import FastAPI, File, UploadFile
+from fastapi.testclient import TestClient
+
+from app.upload import FOLGA_MULTIPART, InicioMultipart, LimiteUploadMiddleware
+
+from conftest import METADADOS, PDF
+
+LIMITE = 1000
+
+
+def _multipart(*partes: bytes) -> bytes:
+    return b"".join(b"--limite\r\n" + parte for parte in partes) + b"--limite--\r\n"
+
+
+def _campo(nome: str, valor: bytes) -> bytes:
+    return f'Content-Disposition: form-data; name="{nome}"\r\n\r\n'.encode() + valor + b"\r\n"
+
+
+def _arquivo(conteudo: bytes) -> bytes:
+    return b'Content-Disposition: form-data; name="file"; filename="a.pdf"\r\n\r\n' + conteudo + b"\r\n"
+
+
+def test_inicio_multipart_pdf():
+    assert InicioMultipart(b"limite").alimentar(_multipart(_campo("ano", b"2020"), _arquivo(PDF)))
+
+
+def test_inicio_multipart_nao_pdf():
+    assert not InicioMultipart(b"limite").alimentar(_multipart(_arquivo(b"GIF89a...")))
+
+
+def test_inicio_multipart_em_blocos():
+    corpo = _multipart(_arquivo(PDF))
+    inicio = InicioMultipart(b"limite")
+    # a assinatura chega partida entre blocos: decide só quando há bytes suficientes
+    corte = corpo.index(b"%PDF") + 2
+    assert inicio.alimentar(corpo[:corte]) and not inicio.concluido
+    assert not InicioMultipart(b"limite").alimentar(corpo[:corte] + b"XX-")
+    assert inicio.alimentar(corpo[corte:]) and inicio.concluido
+
+
+def test_inicio_multipart_arquivo_vazio_fica_para_receber_pdf():
+    inicio = InicioMultipart(b"limite")
+    assert inicio.alimentar(_multipart(_arquivo(b"")))
+    assert inicio.concluido
+
+
+def test_inicio_multipart_desiste_depois_do_limite():
+    inicio = InicioMultipart(b"limite")
+    assert inicio.alimentar(_multipart(_campo("texto", b"x" * (InicioMultipart.LIMITE + 1))))
+    assert inicio.concluido
+
+
+def _cliente() -> TestClient:
+    app = FastAPI()
+
+    @app.post("/upload")
+    async def upload(file: UploadFile = File(...)):
+        return {"tamanho": len(await file.read())}
+
+    return TestClient(LimiteUploadMiddleware(app, limites={"/upload": LIMITE}, pdf=("/upload",)))
+
+
+def test_limite_pelo_content_length():
+    r = _cliente().post("/upload", files={"file": ("a.pdf", b"%PDF-" + b"x" * (LIMITE + FOLGA_MULTIPART))})
+    assert r.status_code == 413
+    assert r.headers["connection"] == "close"
+
+
+def test_limite_contando_bytes_sem_content_length():
+    corpo = _multipart(_arquivo(b"%PDF-" + b"x" * (LIMITE + FOLGA_MULTIPART)))
+
+    def blocos():
+        for i in range(0, len(corpo), 4096):
+            yield corpo[i:i + 4096]
+
+    r = _cliente().post("/upload", content=blocos(), headers={"content-type": "multipart/form-data; boundary=limite"})
+    assert r.status_code == 413
+
+
+def test_assinatura_recusada_no_inicio_do_corpo():
+    r = _cliente().post("/upload", files={"file": ("a.pdf", b"GIF89a" + b"x" * 100)})
+    assert r.status_code == 415
+
+
+def test_dentro_do_limite():
+    r = _cliente().post("/upload", files={"file": ("a.pdf", PDF[:LIMITE])})
+    assert r.status_code == 200
+    assert r.json() == {"tamanho": LIMITE}
+
+
+def test_endpoint_recusa_nao_pdf_e_vazio(cliente):
+    r = cliente.post("/documentos/upload", params=METADADOS, files={"file": ("a.pdf", b"GIF89a", "application/pdf")})
+    assert r.status_code == 415
+    r = cliente.post("/documentos/upload", params=METADADOS, files={"file": ("a.pdf", b"", "application/pdf")})
+    assert r.status_code == 400